@@ -10,7 +10,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 import os
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -22,6 +22,8 @@ load_dotenv()
 
 # Importa o assistente existente
 from src.assistant import AssistenteSebrae
+from src.knowledge_base.facetas import montar_filtro
+from src.knowledge_base.monitor_documentos import MonitorDocumentos
 
 # Importa autenticação
 from src.auth import get_current_user, get_current_active_user
@@ -65,6 +67,12 @@ assistente = None
 # Flag para controlar se documentos foram carregados
 documentos_carregados = False
 
+# Monitor que mantém a base sincronizada com DIRETORIO_DOCS
+monitor_documentos = None
+
+# Estado da última reconstrução da base (executada em background)
+reconstrucao_base = {"em_andamento": False, "iniciada_em": None, "resultado": None, "erro": None}
+
 # Armazena histórico de conversas (em produção, usar banco de dados)
 conversas = {}
 
@@ -79,6 +87,8 @@ MAX_MENSAGENS_CONTEXTO = 10  # Máximo de mensagens no contexto (evita estouro d
 class ChatMessage(BaseModel):
     mensagem: str
     session_id: Optional[str] = "default"
+    # Facetas para restringir a busca: categoria, tipo_documento, codigo_produto, carga_horaria
+    filtros: Optional[Dict[str, Any]] = None
 
 class ChatResponse(BaseModel):
     resposta: str
@@ -87,6 +97,11 @@ class ChatResponse(BaseModel):
     confianca: Optional[float] = 0.0
     fonte: str
     usado_internet: bool = False
+    # Tokens do prompt por parte (sistema, consulta, chunks, histórico) e orçamento do modelo
+    orcamento_tokens: Optional[Dict[str, int]] = None
+    # Compressão do contexto (COMPRESSAO_CONTEXTO=true) e tempo de resposta do LLM
+    compressao_contexto: Optional[Dict[str, float]] = None
+    tempo_llm_ms: Optional[float] = None
 
 class StatusResponse(BaseModel):
     status: str
@@ -113,19 +128,35 @@ async def startup_event():
     # Carrega documentos em background thread para não bloquear startup
     import threading
     def carregar_docs_background():
-        global documentos_carregados
+        global documentos_carregados, monitor_documentos
         if os.path.exists(DIRETORIO_DOCS):
-            print("� Carregando documentos em background...")
             try:
-                assistente.carregar_documentos(DIRETORIO_DOCS)
+                # Carga completa só na primeira execução; depois o monitor
+                # sincroniza apenas os arquivos adicionados, modificados ou removidos
+                if not assistente.base_conhecimento.documentos_processados:
+                    print("📚 Carregando documentos em background...")
+                    assistente.carregar_documentos(DIRETORIO_DOCS)
                 documentos_carregados = True
                 print("✅ Documentos carregados com sucesso!")
+                
+                monitor_documentos = MonitorDocumentos(
+                    DIRETORIO_DOCS,
+                    assistente.base_conhecimento,
+                    assistente.processador_documentos
+                )
+                monitor_documentos.iniciar()
             except Exception as e:
                 print(f"⚠️ Erro ao carregar documentos: {e}")
     
     threading.Thread(target=carregar_docs_background, daemon=True).start()
     print("💡 Carregamento de documentos iniciado em background...")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Interrompe o monitoramento do diretório de documentos."""
+    if monitor_documentos:
+        monitor_documentos.parar()
+
 @app.get("/")
 async def root():
     """Serve a página de login."""
@@ -220,35 +251,34 @@ def limitar_contexto_sessao(session_id: str):
         return True
     return False
 
-def obter_historico_formatado(session_id: str, limite: int = 5) -> str:
+def obter_historico_formatado(session_id: str, limite: int = 5) -> List[str]:
     """
     Retorna o histórico de conversas formatado para incluir no contexto do LLM.
     
+    O assistente inclui as mensagens no prompt depois dos documentos, das
+    mais recentes para as mais antigas, enquanto couberem no orçamento de tokens.
+    
     Args:
         session_id: ID da sessão
         limite: Número de mensagens recentes a incluir (padrão: 5)
         
     Returns:
-        String formatada com o histórico
+        Mensagens formatadas, da mais antiga para a mais recente
     """
     global conversas
     
     if session_id not in conversas or not conversas[session_id]:
-        return ""
+        return []
     
     # Pega as últimas N mensagens
     mensagens_recentes = conversas[session_id][-limite:]
     
-    historico_formatado = "### HISTÓRICO DA CONVERSA (Mensagens anteriores):\n\n"
-    
-    for i, msg in enumerate(mensagens_recentes, 1):
-        historico_formatado += f"**Mensagem {i}:**\n"
-        historico_formatado += f"👤 Usuário: {msg['usuario']}\n"
-        historico_formatado += f"🤖 Assistente: {msg['assistente'][:200]}...\n\n"  # Resumo
-    
-    historico_formatado += "### FIM DO HISTÓRICO\n\n"
-    
-    return historico_formatado
+    return [
+        f"**Mensagem {i}:**\n"
+        f"👤 Usuário: {msg['usuario']}\n"
+        f"🤖 Assistente: {msg['assistente'][:200]}...\n"  # Resumo
+        for i, msg in enumerate(mensagens_recentes, 1)
+    ]
 
 def carregar_documentos_se_necessario():
     """Carrega documentos sob demanda (lazy loading) apenas na primeira vez."""
@@ -264,6 +294,12 @@ def carregar_documentos_se_necessario():
             print(f"⚠️ Erro ao carregar documentos: {e}")
             # Continua mesmo com erro - assistente pode responder sem documentos
 
+def contar_documentos_catalogo() -> int:
+    """Conta os documentos indexados pelo catálogo da base (sem percorrer o diretório)."""
+    if not assistente:
+        return 0
+    return assistente.base_conhecimento.resumo_documentos()["total_documentos"]
+
 @app.post("/api/carregar-documentos")
 async def carregar_documentos_manual():
     """Endpoint para carregar/recarregar documentos manualmente."""
@@ -280,14 +316,9 @@ async def carregar_documentos_manual():
         assistente.carregar_documentos(DIRETORIO_DOCS)
         documentos_carregados = True
         
-        # Conta documentos carregados
-        num_docs = 0
-        for root, dirs, files in os.walk(DIRETORIO_DOCS):
-            num_docs += len([f for f in files if f.endswith(('.pdf', '.docx', '.xlsx'))])
-        
         return {
             "mensagem": "Documentos carregados com sucesso",
-            "total_documentos": num_docs,
+            "total_documentos": contar_documentos_catalogo(),
             "status": "success"
         }
     except Exception as e:
@@ -299,15 +330,9 @@ async def get_status():
     if not assistente:
         raise HTTPException(status_code=503, detail="Assistente não inicializado")
     
-    # Conta documentos no diretório
-    num_docs = 0
-    if os.path.exists(DIRETORIO_DOCS):
-        for root, dirs, files in os.walk(DIRETORIO_DOCS):
-            num_docs += len([f for f in files if f.endswith(('.pdf', '.docx', '.xlsx'))])
-    
     return StatusResponse(
         status="online",
-        documentos_carregados=num_docs,
+        documentos_carregados=contar_documentos_catalogo(),
         documentos_em_memoria=documentos_carregados,  # Indica se já foram processados
         consultores_disponiveis=3465,  # Da base de consultores
         modelo=assistente.model_name
@@ -328,6 +353,12 @@ async def chat(
     if not assistente:
         raise HTTPException(status_code=503, detail="Assistente não inicializado")
     
+    # Valida os filtros de facetas antes de processar a consulta
+    try:
+        montar_filtro(message.filtros)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # REMOVIDO: Não bloqueia mais esperando documentos
     # A função carregar_documentos_se_necessario() foi removida daqui
     # Os documentos são carregados em background no startup
@@ -367,26 +398,13 @@ async def chat(
         )
     
     try:
-        # Obtém histórico formatado para incluir no contexto
+        # Histórico vai separado da pergunta: a busca usa só a pergunta e o
+        # histórico entra no prompt no que sobrar do orçamento de tokens
         historico_contexto = obter_historico_formatado(session_id, limite=5)
         
-        # Monta a consulta com contexto histórico
-        consulta_com_contexto = message.mensagem
-        if historico_contexto:
-            consulta_com_contexto = f"""{historico_contexto}
-
-### NOVA PERGUNTA DO USUÁRIO:
-{message.mensagem}
-
-**INSTRUÇÕES:**
-- Considere o histórico acima ao responder
-- Se a pergunta se referir a algo mencionado anteriormente ("isso", "aquilo", "a anterior"), use o contexto
-- Mantenha a coerência com respostas anteriores
-- Se for um novo assunto, responda normalmente
-"""
-        
-        # Processa consulta com contexto
-        resultado = assistente.processar_consulta(consulta_com_contexto)
+        resultado = assistente.processar_consulta(
+            message.mensagem, filtros=message.filtros, historico=historico_contexto
+        )
         
         # Extrai informações da resposta
         resposta_texto = resultado.get("resposta", "")
@@ -421,7 +439,10 @@ async def chat(
             documentos=fontes,
             confianca=confianca,
             fonte="base_local",
-            usado_internet=False
+            usado_internet=False,
+            orcamento_tokens=resultado.get("orcamento_tokens"),
+            compressao_contexto=resultado.get("compressao_contexto"),
+            tempo_llm_ms=resultado.get("tempo_llm_ms")
         )
         
     except Exception as e:
@@ -552,13 +573,10 @@ async def upload_documentos(
         
         for doc_info in documentos_salvos:
             try:
-                # Processa o documento
-                chunks = processador.processar_arquivo(doc_info["caminho"])
-                
-                # Adiciona incrementalmente (verifica hash internamente)
-                assistente.base_conhecimento.adicionar_documentos_incrementalmente(
-                    chunks,
-                    caminho_arquivo=doc_info["caminho"]
+                # Processa e atualiza os chunks do documento na base (um erro de
+                # extração é propagado e mantém os chunks anteriores)
+                doc_info["chunks"] = processador.indexar_arquivo(
+                    doc_info["caminho"], assistente.base_conhecimento
                 )
                 documentos_adicionados += 1
                 
@@ -615,18 +633,12 @@ async def processar_diretorio_incremental(
                     continue
                 
                 try:
-                    # Processa o arquivo
-                    chunks = processador.processar_arquivo(file_path)
-                    
-                    # Adiciona à base
-                    assistente.base_conhecimento.adicionar_documentos_incrementalmente(
-                        chunks,
-                        caminho_arquivo=file_path
-                    )
+                    # Processa o arquivo e atualiza seus chunks na base
+                    num_chunks = processador.indexar_arquivo(file_path, assistente.base_conhecimento)
                     
                     arquivos_processados.append({
                         "arquivo": file,
-                        "chunks": len(chunks),
+                        "chunks": num_chunks,
                         "caminho": file_path
                     })
                     
@@ -667,9 +679,8 @@ async def obter_estatisticas_base(
         "total_chunks": stats["total_chunks"],
         "total_arquivos": stats["total_arquivos"],
         "arquivos": stats["arquivos"],
-        "ultima_atualizacao": max(
-            [a["data"] for a in stats["arquivos"]] + ["N/A"]
-        ) if stats["arquivos"] else "N/A"
+        "ultima_atualizacao": stats["ultima_atualizacao"],
+        "cache_consultas": stats["cache_consultas"]
     }
 
 @app.delete("/api/base/limpar")
@@ -698,13 +709,72 @@ async def limpar_base_conhecimento(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao limpar base: {str(e)}")
 
+@app.post("/api/base/reconstruir")
+async def reconstruir_base_conhecimento(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Reconstrói a base em uma nova versão, em background e sem indisponibilidade.
+    
+    As consultas continuam na versão atual até a nova ficar pronta; a troca é
+    atômica. Acompanhe o andamento em /api/base/versoes.
+    
+    Requer autenticação de administrador.
+    """
+    if not assistente:
+        raise HTTPException(status_code=503, detail="Assistente não inicializado")
+    
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Apenas administradores podem reconstruir a base")
+    
+    if reconstrucao_base["em_andamento"]:
+        raise HTTPException(status_code=409, detail="Já existe uma reconstrução em andamento")
+    
+    reconstrucao_base.update(em_andamento=True, iniciada_em=datetime.now().isoformat(), resultado=None, erro=None)
+    
+    import threading
+    def reconstruir_background():
+        try:
+            reconstrucao_base["resultado"] = assistente.base_conhecimento.reconstruir(
+                DIRETORIO_DOCS, assistente.processador_documentos
+            )
+        except Exception as e:
+            print(f"❌ Erro na reconstrução da base: {e}")
+            reconstrucao_base["erro"] = str(e)
+        finally:
+            reconstrucao_base["em_andamento"] = False
+    
+    threading.Thread(target=reconstruir_background, daemon=True).start()
+    return JSONResponse(status_code=202, content={
+        "mensagem": "Reconstrução iniciada em background",
+        "versao_atual": assistente.base_conhecimento.versao.nome
+    })
+
+@app.get("/api/base/versoes")
+async def listar_versoes_base(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Lista as versões da base em disco e o estado da última reconstrução.
+    
+    Requer autenticação.
+    """
+    if not assistente:
+        raise HTTPException(status_code=503, detail="Assistente não inicializado")
+    
+    return {
+        "versao_atual": assistente.base_conhecimento.versao.nome,
+        "versoes": assistente.base_conhecimento.listar_versoes(),
+        "reconstrucao": reconstrucao_base
+    }
+
 @app.delete("/api/base/arquivo/{nome_arquivo}")
 async def remover_arquivo_base(
     nome_arquivo: str,
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Remove um arquivo específico do controle da base de conhecimento.
+    Remove um arquivo específico da base de conhecimento (chunks, índice e controle).
     
     Requer autenticação de administrador.
     """
@@ -714,61 +784,123 @@ async def remover_arquivo_base(
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Apenas administradores podem remover arquivos")
     
-    # Busca o arquivo no diretório
-    file_path = None
-    for root, dirs, files in os.walk(DIRETORIO_DOCS):
-        if nome_arquivo in files:
-            file_path = os.path.join(root, nome_arquivo)
-            break
+    # Busca o arquivo no controle (funciona mesmo se já foi apagado do diretório)
+    base = assistente.base_conhecimento
+    file_path = next(
+        (caminho for caminho in base.controle.keys() if os.path.basename(caminho) == nome_arquivo),
+        None
+    )
+    if not file_path:
+        for root, dirs, files in os.walk(DIRETORIO_DOCS):
+            if nome_arquivo in files:
+                file_path = os.path.join(root, nome_arquivo)
+                break
     
     if not file_path:
         raise HTTPException(status_code=404, detail="Arquivo não encontrado")
     
     try:
-        assistente.base_conhecimento.remover_arquivo(file_path)
+        chunks_removidos = base.remover_arquivo(file_path)
         
-        return {
-            "mensagem": f"Arquivo '{nome_arquivo}' removido do controle",
-            "aviso": "Para remover completamente, limpe e reconstrua a base sem este arquivo"
+        resposta = {
+            "mensagem": f"Arquivo '{nome_arquivo}' removido da base",
+            "chunks_removidos": chunks_removidos
         }
+        if os.path.exists(file_path):
+            resposta["aviso"] = "O arquivo continua no diretório de documentos e será indexado novamente na próxima sincronização; apague-o da pasta para excluí-lo de vez"
+        return resposta
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao remover arquivo: {str(e)}")
 
 @app.get("/api/documentos")
-async def listar_documentos():
-    """Lista todos os documentos na base de conhecimento."""
-    if not os.path.exists(DIRETORIO_DOCS):
-        return {"documentos": []}
+async def listar_documentos(
+    categoria: Optional[str] = None,
+    tipo_documento: Optional[str] = None,
+    codigo_produto: Optional[str] = None,
+    extensao: Optional[str] = None,
+    busca: Optional[str] = None,
+    ordenar_por: str = "nome",
+    ordem: str = "asc",
+    pagina: int = 1,
+    tamanho_pagina: int = 100
+):
+    """
+    Lista os documentos da base de conhecimento a partir do catálogo.
     
-    documentos = []
+    Filtros (valores separados por vírgula): categoria, tipo_documento,
+    codigo_produto e extensao; `busca` procura um trecho do nome do arquivo.
+    Ordenação por nome, categoria, tipo_documento, codigo_produto, tamanho,
+    paginas, num_chunks ou data_processamento, e paginação com `pagina` e
+    `tamanho_pagina` (até 1000).
+    """
+    if not assistente:
+        raise HTTPException(status_code=503, detail="Assistente não inicializado")
     
-    for root, dirs, files in os.walk(DIRETORIO_DOCS):
-        for file in files:
-            if file.endswith(('.pdf', '.docx', '.xlsx')):
-                file_path = os.path.join(root, file)
-                tamanho = os.path.getsize(file_path)
-                
-                documentos.append({
-                    "nome": file,
-                    "tipo": file.split('.')[-1],
-                    "tamanho": tamanho,
-                    "pasta": os.path.basename(root)
-                })
+    if ordem not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Ordem deve ser 'asc' ou 'desc'")
+    if pagina < 1 or not 1 <= tamanho_pagina <= 1000:
+        raise HTTPException(status_code=400, detail="Use pagina >= 1 e tamanho_pagina entre 1 e 1000")
+    
+    filtros = {
+        campo: valor.split(",")
+        for campo, valor in {
+            "categoria": categoria,
+            "tipo_documento": tipo_documento,
+            "codigo_produto": codigo_produto,
+            "extensao": extensao
+        }.items() if valor
+    }
     
-    return {"documentos": documentos, "total": len(documentos)}
+    try:
+        catalogo = assistente.base_conhecimento.listar_documentos(
+            filtros=filtros,
+            busca=busca,
+            ordenar_por=ordenar_por,
+            decrescente=ordem == "desc",
+            limite=tamanho_pagina,
+            deslocamento=(pagina - 1) * tamanho_pagina
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    documentos = [
+        {
+            "nome": doc["nome"],
+            "tipo": doc["extensao"],
+            "tamanho": doc.get("tamanho", 0),
+            "pasta": doc["categoria"],
+            "caminho": doc["caminho"],
+            "tipo_documento": doc["tipo_documento"],
+            "codigo_produto": doc["codigo_produto"],
+            "paginas": doc.get("paginas"),
+            "num_chunks": doc.get("num_chunks", 0),
+            "hash": doc.get("hash"),
+            "data_processamento": doc.get("data_processamento")
+        }
+        for doc in catalogo["documentos"]
+    ]
+    
+    return {
+        "documentos": documentos,
+        "total": catalogo["total"],
+        "pagina": pagina,
+        "tamanho_pagina": tamanho_pagina,
+        "total_paginas": (catalogo["total"] + tamanho_pagina - 1) // tamanho_pagina
+    }
 
 @app.get("/api/metricas")
 async def get_metricas():
     """Retorna métricas do sistema."""
-    num_docs = 0
-    if os.path.exists(DIRETORIO_DOCS):
-        for root, dirs, files in os.walk(DIRETORIO_DOCS):
-            num_docs += len([f for f in files if f.endswith(('.pdf', '.docx', '.xlsx'))])
+    resumo = assistente.base_conhecimento.resumo_documentos() if assistente else {}
     
     total_conversas = sum(len(conv) for conv in conversas.values())
     
     return {
-        "documentos_carregados": num_docs,
+        "documentos_carregados": resumo.get("total_documentos", 0),
+        "documentos_por_categoria": resumo.get("categoria", {}),
+        "documentos_por_tipo": resumo.get("tipo_documento", {}),
+        "total_paginas": resumo.get("total_paginas", 0),
+        "total_chunks": resumo.get("total_chunks", 0),
         "consultores_disponiveis": 3465,
         "consultas_hoje": total_conversas,
         "sessoes_ativas": len(conversas)
@@ -32,6 +32,7 @@ def exibir_menu():
     print(f"{Cores.VERDE}4.{Cores.RESET} ➕ Adicionar arquivo único")
     print(f"{Cores.VERDE}5.{Cores.RESET} 🗑️  Limpar base completamente")
     print(f"{Cores.VERDE}6.{Cores.RESET} 📋 Listar arquivos processados")
+    print(f"{Cores.VERDE}7.{Cores.RESET} 🏗️  Reconstruir base em nova versão (sem interromper a API)")
     print(f"{Cores.VERDE}0.{Cores.RESET} ❌ Sair\n")
 
 def processar_diretorio_incremental(base: BaseConhecimento, processador: ProcessadorDocumentos, diretorio: str):
@@ -60,13 +61,10 @@ def processar_diretorio_incremental(base: BaseConhecimento, processador: Process
                 try:
                     print(f"{Cores.AZUL}⏳ Processando: {file}...{Cores.RESET}", end=" ")
                     
-                    # Processa o arquivo
-                    chunks = processador.processar_arquivo(file_path)
+                    # Processa o arquivo e atualiza seus chunks na base
+                    num_chunks = processador.indexar_arquivo(file_path, base)
                     
-                    # Adiciona à base
-                    base.adicionar_documentos_incrementalmente(chunks, file_path)
-                    
-                    print(f"{Cores.VERDE}✅ ({len(chunks)} chunks){Cores.RESET}")
+                    print(f"{Cores.VERDE}✅ ({num_chunks} chunks){Cores.RESET}")
                     novos += 1
                     
                 except Exception as e:
@@ -135,17 +133,12 @@ def adicionar_arquivo_unico(base: BaseConhecimento, processador: ProcessadorDocu
     try:
         print(f"\n{Cores.AZUL}⏳ Processando: {nome}...{Cores.RESET}")
         
-        # Processa o arquivo
-        chunks = processador.processar_arquivo(caminho)
-        
-        # Adiciona à base (força reprocessamento removendo do controle antes)
-        if caminho in base.documentos_processados:
-            del base.documentos_processados[caminho]
-        
-        base.adicionar_documentos_incrementalmente(chunks, caminho)
+        # Processa o arquivo e atualiza seus chunks na base (sempre reprocessa;
+        # em caso de erro os chunks anteriores são mantidos)
+        num_chunks = processador.indexar_arquivo(caminho, base)
         
         print(f"{Cores.VERDE}✅ Arquivo processado com sucesso!{Cores.RESET}")
-        print(f"   Chunks gerados: {len(chunks)}\n")
+        print(f"   Chunks gerados: {num_chunks}\n")
         
     except Exception as e:
         print(f"{Cores.VERMELHO}❌ Erro ao processar arquivo: {str(e)}{Cores.RESET}\n")
@@ -165,6 +158,19 @@ def limpar_base(base: BaseConhecimento):
     except Exception as e:
         print(f"{Cores.VERMELHO}❌ Erro ao limpar base: {str(e)}{Cores.RESET}\n")
 
+def reconstruir_base(base: BaseConhecimento, processador: ProcessadorDocumentos, diretorio: str):
+    """Reconstrói a base em uma nova versão e a ativa ao final."""
+    print(f"\n{Cores.AZUL}🏗️  Reconstruindo base a partir de: {diretorio}{Cores.RESET}")
+    print(f"{Cores.AMARELO}A versão atual continua respondendo até a nova ficar pronta.{Cores.RESET}\n")
+    
+    try:
+        resultado = base.reconstruir(diretorio, processador)
+        print(f"\n{Cores.VERDE}✅ Versão {resultado['versao']} ativa com {resultado['total_chunks']} chunks{Cores.RESET}")
+        if resultado["versoes_removidas"]:
+            print(f"   Versões antigas removidas: {', '.join(resultado['versoes_removidas'])}")
+    except Exception as e:
+        print(f"{Cores.VERMELHO}❌ Erro ao reconstruir base: {str(e)}{Cores.RESET}\n")
+
 def listar_arquivos_processados(base: BaseConhecimento):
     """Lista todos os arquivos que foram processados."""
     print(f"\n{Cores.AZUL}{Cores.NEGRITO}📋 ARQUIVOS PROCESSADOS{Cores.RESET}\n")
@@ -217,6 +223,9 @@ def main():
         elif opcao == "6":
             listar_arquivos_processados(base)
             
+        elif opcao == "7":
+            reconstruir_base(base, processador, DIRETORIO_DOCS)
+            
         elif opcao == "0":
             print(f"\n{Cores.AZUL}👋 Até logo!{Cores.RESET}\n")
             break
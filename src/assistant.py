@@ -2,15 +2,31 @@ from typing import Optional, Dict, List
 from .knowledge_base.base_conhecimento import BaseConhecimento
 from .knowledge_base.processador_documentos import ProcessadorDocumentos
 from .knowledge_base.gerenciador_consultores import GerenciadorConsultores
+from .knowledge_base.indice_codigos import extrair_codigos
+from .knowledge_base.orcamento_tokens import empacotar_contexto, orcamento_modelo
 import openai
 import os
 import random
+import time
 from datetime import datetime
 
 # Configure a API Key do GitHub Copilot/OpenAI
 # É uma boa prática usar variáveis de ambiente para chaves de API
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Cabeçalho e instruções que acompanham o histórico da conversa no prompt
+MOLDURA_HISTORICO = """### HISTÓRICO DA CONVERSA (Mensagens anteriores):
+
+{interacoes}
+### FIM DO HISTÓRICO
+
+**INSTRUÇÕES SOBRE O HISTÓRICO:**
+- Se a pergunta se referir a algo mencionado anteriormente ("isso", "aquilo", "a anterior"), use o histórico
+- Mantenha a coerência com respostas anteriores
+- Se for um novo assunto, responda normalmente
+
+"""
+
 class AssistenteSebrae:
     def __init__(self, diretorio_base: str = ".chromadb", model_name: str = "gpt-3.5-turbo"):
         """
@@ -21,6 +37,11 @@ class AssistenteSebrae:
             model_name: O nome do modelo OpenAI a ser usado (ex: 'gpt-3.5-turbo', 'gpt-4', 'gpt-4-turbo').
         """
         self.model_name = model_name
+        # Orçamento de tokens do prompt (None = padrão do modelo, ver orcamento_tokens)
+        orcamento_tokens = os.getenv("ORCAMENTO_TOKENS_PROMPT")
+        self.orcamento_tokens_prompt = int(orcamento_tokens) if orcamento_tokens else None
+        # Compressão do contexto por sentenças relevantes à consulta (ver compressao_contexto)
+        self.compressao_contexto = os.getenv("COMPRESSAO_CONTEXTO", "false").lower() == "true"
         self.client = openai.OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
         
         # Histórico de conversação (últimas 3 perguntas e respostas)
@@ -44,8 +65,18 @@ class AssistenteSebrae:
         }
         
         # Inicializa componentes da base de conhecimento
-        self.base_conhecimento = BaseConhecimento(diretorio_base)
-        self.processador_documentos = ProcessadorDocumentos()
+        num_threads_embeddings = os.getenv("NUM_THREADS_EMBEDDINGS")
+        self.base_conhecimento = BaseConhecimento(
+            diretorio_base,
+            tamanho_lote_embeddings=int(os.getenv("TAMANHO_LOTE_EMBEDDINGS", "32")),
+            num_threads_embeddings=int(num_threads_embeddings) if num_threads_embeddings else None,
+            backend_embeddings=os.getenv("BACKEND_EMBEDDINGS", "torch"),
+            arquivo_cache_consultas=os.getenv("ARQUIVO_CACHE_CONSULTAS") or None,
+            backend_vetorial=os.getenv("BACKEND_VETORIAL", "chroma")
+        )
+        self.processador_documentos = ProcessadorDocumentos(
+            extrator_palavras_chave=os.getenv("EXTRATOR_PALAVRAS_CHAVE", "yake")
+        )
         
         # Gerenciador de consultores especializados
         self.gerenciador_consultores = GerenciadorConsultores()
@@ -68,23 +99,60 @@ class AssistenteSebrae:
         if len(self.historico_conversacao) > 3:
             self.historico_conversacao = self.historico_conversacao[-3:]
     
-    def _obter_contexto_historico(self) -> str:
+    def _obter_contexto_historico(self) -> List[str]:
         """
         Retorna o histórico de conversação formatado para contexto do LLM.
         
         Returns:
-            String com o histórico formatado
+            Interações formatadas, da mais antiga para a mais recente
         """
-        if not self.historico_conversacao:
-            return ""
-        
-        contexto = "\n\n**Histórico recente da conversa:**\n"
-        for i, interacao in enumerate(self.historico_conversacao, 1):
-            contexto += f"\nInteração {i}:\n"
-            contexto += f"Usuário: {interacao['pergunta']}\n"
-            contexto += f"Assistente: {interacao['resposta'][:200]}...\n"  # Resumo
+        return [
+            f"Interação {i}:\n"
+            f"Usuário: {interacao['pergunta']}\n"
+            f"Assistente: {interacao['resposta'][:200]}...\n"  # Resumo
+            for i, interacao in enumerate(self.historico_conversacao, 1)
+        ]
+    
+    def _empacotar_prompt(self, prompt_sistema: str, mensagem_usuario: str, resultados: List[Dict],
+                          historico: Optional[List[str]], max_tokens_resposta: int,
+                          formatar_chunk=None) -> Dict:
+        """
+        Escolhe os chunks e o histórico que cabem no orçamento de tokens do modelo.
         
-        return contexto
+        Args:
+            prompt_sistema: Mensagem de sistema
+            mensagem_usuario: Mensagem do usuário sem contexto e histórico
+            resultados: Chunks em ordem de prioridade
+            historico: Interações formatadas (None = histórico interno do assistente)
+            max_tokens_resposta: Tokens reservados para a resposta
+            formatar_chunk: Função (posição, chunk) -> texto do chunk no prompt
+            
+        Returns:
+            Dicionário com os chunks escolhidos, o bloco de histórico ("" se
+            vazio) e a contagem de tokens (ver orcamento_tokens.empacotar_contexto)
+        """
+        if historico is None:
+            historico = self._obter_contexto_historico()
+        
+        pacote = empacotar_contexto(
+            prompt_sistema,
+            mensagem_usuario,
+            resultados,
+            historico,
+            orcamento_modelo(self.model_name, max_tokens_resposta, self.orcamento_tokens_prompt),
+            formatar_chunk or (lambda posicao, resultado: resultado["texto"]),
+            moldura_historico=MOLDURA_HISTORICO.format(interacoes="")
+        )
+        pacote["bloco_historico"] = (
+            MOLDURA_HISTORICO.format(interacoes="\n".join(pacote["historico"])) if pacote["historico"] else ""
+        )
+        
+        tokens = pacote["tokens"]
+        print(f"🧮 Prompt: {tokens['total']}/{tokens['orcamento']} tokens "
+              f"(sistema {tokens['sistema']}, consulta {tokens['consulta']}, chunks {tokens['chunks']}, "
+              f"histórico {tokens['historico']}; descartados {tokens['chunks_descartados']} chunks e "
+              f"{tokens['historico_descartado']} interações)")
+        return pacote
     
     def _apresentacao_inicial(self) -> Dict[str, any]:
         """
@@ -124,18 +192,26 @@ Sou o **Consultor IA Sebrae**, seu assistente especializado em empreendedorismo
             "usou_base": False
         }
         
-    def carregar_documentos(self, diretorio_docs: str):
+    def carregar_documentos(self, diretorio_docs: str, num_workers: Optional[int] = None):
         """
         Carrega documentos de um diretório para a base de conhecimento.
 
         Args:
             diretorio_docs: Caminho do diretório com os documentos
+            num_workers: Número de processos para a ingestão paralela
+                (padrão: variável de ambiente NUM_WORKERS_INGESTAO ou 1)
         """
+        if num_workers is None:
+            num_workers = int(os.getenv("NUM_WORKERS_INGESTAO", "1"))
+        
         print("Processando documentos...")
-        chunks = self.processador_documentos.processar_diretorio(diretorio_docs)
-        if chunks:
-            print(f"Adicionando {len(chunks)} chunks à base de conhecimento...")
-            self.base_conhecimento.adicionar_documentos(chunks)
+        total_chunks = self.processador_documentos.indexar_diretorio(
+            diretorio_docs,
+            self.base_conhecimento,
+            num_workers=num_workers
+        )
+        if total_chunks:
+            print(f"{total_chunks} chunks adicionados à base de conhecimento.")
             print("Documentos carregados com sucesso!")
         else:
             print("Nenhum documento válido encontrado para processar.")
@@ -426,13 +502,19 @@ Estarei aqui sempre que precisar de informações do Sebrae. **Bom trabalho!** 
 
 **Como posso te ajudar?** 💡"""
         
-    def processar_consulta(self, consulta: str) -> Dict[str, Optional[str]]:
+    def processar_consulta(self, consulta: str, filtros: Optional[Dict] = None,
+                           historico: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
         """
         Processa consultas de forma conversacional e inteligente.
         O assistente decide automaticamente se deve buscar na base de dados ou responder diretamente.
         
         Args:
             consulta: A pergunta ou mensagem do usuário
+            filtros: Facetas para restringir a busca na base (ex.: {"tipo_documento": "FT"});
+                quando informados, a consulta é sempre respondida com a base
+            historico: Interações anteriores já formatadas, da mais antiga para a mais
+                recente (ex.: histórico da sessão na API); None usa o histórico interno.
+                Entra no prompt depois dos chunks, no que sobrar do orçamento de tokens
 
         Returns:
             Dict[str, Optional[str]]: Resposta contendo texto, fontes e metadados
@@ -451,6 +533,17 @@ Estarei aqui sempre que precisar de informações do Sebrae. **Bom trabalho!** 
         if not consulta_limpa:
             return self._apresentacao_inicial()
         
+        # CÓDIGO DE PRODUTO (ex.: GQ13029-3) - lê os chunks das fichas cujo nome traz
+        # o código direto do índice de códigos, sem classificação, embedding da
+        # consulta ou busca vetorial; os 8 chunks são repartidos entre os códigos
+        resultados_codigo = self.base_conhecimento.buscar_por_codigo(consulta_limpa, num_resultados=8, filtros=filtros)
+        if resultados_codigo:
+            print(f"🏷️ Código de produto encontrado no índice: {', '.join(extrair_codigos(consulta_limpa))}")
+            resultado = self._processar_consulta_base_dados(consulta_limpa, filtros, resultados=resultados_codigo,
+                                                           historico=historico)
+            self._adicionar_ao_historico(consulta_limpa, resultado.get('resposta', ''))
+            return resultado
+        
         # Classifica a intenção da consulta
         classificacao = self.classificar_intencao(consulta_limpa)
         
@@ -479,22 +572,28 @@ Estarei aqui sempre que precisar de informações do Sebrae. **Bom trabalho!** 
             }
         
         # CONSULTAS À BASE - busca documentos + consultores
-        if classificacao['deve_buscar_base']:
-            resultado = self._processar_consulta_base_dados(consulta_limpa)
+        if classificacao['deve_buscar_base'] or filtros:
+            resultado = self._processar_consulta_base_dados(consulta_limpa, filtros, historico=historico)
             self._adicionar_ao_historico(consulta_limpa, resultado.get('resposta', ''))
             return resultado
         
         # FALLBACK - resposta geral do LLM
-        resultado = self._processar_consulta_llm_livre(consulta_limpa)
+        resultado = self._processar_consulta_llm_livre(consulta_limpa, historico)
         self._adicionar_ao_historico(consulta_limpa, resultado.get('resposta', ''))
         return resultado
     
-    def _processar_consulta_base_dados(self, consulta: str) -> Dict[str, Optional[str]]:
+    def _processar_consulta_base_dados(self, consulta: str, filtros: Optional[Dict] = None,
+                                       resultados: Optional[List[Dict]] = None,
+                                       historico: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
         """
         Processa consulta buscando na base de dados Sebrae e indicando consultores.
         
         Args:
             consulta: Pergunta do usuário
+            filtros: Facetas para restringir a busca (categoria, tipo_documento, ...)
+            resultados: Chunks já encontrados (ex.: pela busca por código de produto);
+                se None, é feita a busca híbrida com seleção adaptativa do contexto
+            historico: Interações anteriores formatadas (None = histórico interno)
             
         Returns:
             Dict com resposta, fontes, consultores e metadados
@@ -505,19 +604,38 @@ Estarei aqui sempre que precisar de informações do Sebrae. **Bom trabalho!** 
         analise = self._analisar_consulta(consulta)
         
         # PASSO 2: Busca prioritária na base interna (Regra de Ouro)
-        resultados = self.base_conhecimento.buscar(analise["termos_busca"], num_resultados=8)
+        # Sem resultados prontos: busca híbrida e seleção adaptativa do contexto
+        # (corte por relevância, sem quase duplicatas, diversificado por MMR)
+        busca_por_codigo = resultados is not None
+        selecao = None
+        if not busca_por_codigo:
+            resultados, selecao = self.base_conhecimento.buscar_contexto(
+                analise["termos_busca"], num_maximo=8, filtros=filtros
+            )
+            print(f"🧩 Contexto: {selecao['selecionados']} de {selecao['candidatos']} chunks "
+                  f"({selecao['descartados_corte']} abaixo do corte, "
+                  f"{selecao['descartados_redundancia']} redundantes)")
+        
+        # PASSO 2.1: Compressão opcional, mantendo as sentenças relevantes de cada chunk
+        # (a busca por código não passa por ela: traz o documento do produto na íntegra)
+        compressao = None
+        if self.compressao_contexto and resultados and not busca_por_codigo:
+            resultados, compressao = self.base_conhecimento.comprimir_contexto(analise["termos_busca"], resultados)
+            print(f"✂️ Compressão: {compressao['caracteres_comprimidos']}/{compressao['caracteres_originais']} "
+                  f"caracteres ({compressao['taxa_compressao']:.0%}), {compressao['sentencas_mantidas']} de "
+                  f"{compressao['sentencas']} sentenças em {compressao['tempo_ms']:.0f} ms")
         
         # PASSO 3: Busca consultores especializados
         print("👨‍💼 Buscando consultores relacionados...")
         consultores_encontrados = self._buscar_consultores_relacionados(consulta, analise)
         
         if resultados:
-            resposta_final = self._processar_resposta_base_interna(consulta, resultados, analise)
+            resposta_final = self._processar_resposta_base_interna(consulta, resultados, analise, historico)
         else:
             # PASSO 4: Busca ampla como fallback
-            resultados_amplos = self.base_conhecimento.buscar_ampla(consulta)
+            resultados_amplos = self.base_conhecimento.buscar_ampla(consulta, filtros=filtros)
             if resultados_amplos:
-                resposta_final = self._processar_resposta_busca_ampla(consulta, resultados_amplos, analise)
+                resposta_final = self._processar_resposta_busca_ampla(consulta, resultados_amplos, analise, historico)
             else:
                 # PASSO 5: Resposta quando não encontra informações
                 resposta_final = {
@@ -545,16 +663,24 @@ Estarei aqui sempre que precisar de informações do Sebrae. **Bom trabalho!** 
         # Marca que usou a base de dados
         resposta_final["modo_consulta"] = "base_dados"
         resposta_final["usou_base"] = True
+        if busca_por_codigo:
+            resposta_final["codigos_produto"] = extrair_codigos(consulta)
+        if selecao:
+            resposta_final["selecao_contexto"] = selecao
+        if compressao:
+            resposta_final["compressao_contexto"] = compressao
         
         return resposta_final
     
-    def _processar_consulta_llm_livre(self, consulta: str) -> Dict[str, Optional[str]]:
+    def _processar_consulta_llm_livre(self, consulta: str,
+                                      historico: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
         """
         Processa consulta usando o LLM com contexto do histórico de conversação.
         Responde como assistente de IA especializado em empreendedorismo.
         
         Args:
             consulta: Pergunta do usuário
+            historico: Interações anteriores formatadas (None = histórico interno)
             
         Returns:
             Dict com resposta do LLM e metadados
@@ -562,11 +688,8 @@ Estarei aqui sempre que precisar de informações do Sebrae. **Bom trabalho!** 
         print(f"💬 Respondendo com IA: '{consulta}'")
         
         try:
-            # Contexto do histórico
-            contexto_historico = self._obter_contexto_historico()
-            
             # Prompt para o LLM com contexto de empreendedorismo
-            prompt_sistema = f"""Você é o Consultor IA Sebrae, um assistente especializado em empreendedorismo e pequenos negócios.
+            prompt_sistema = """Você é o Consultor IA Sebrae, um assistente especializado em empreendedorismo e pequenos negócios.
 
 Seu papel é ajudar empreendedores com:
 - Dicas práticas de gestão empresarial
@@ -586,15 +709,21 @@ Características da sua resposta:
 
 Responda à pergunta do usuário de forma completa, útil e considerando o contexto da conversa anterior (se houver)."""
 
+            # Histórico no que sobrar do orçamento de tokens
+            max_tokens = 1000
+            pacote = self._empacotar_prompt(
+                prompt_sistema.format(contexto_historico=""), consulta, [], historico, max_tokens
+            )
+
             # Chama o modelo LLM
             response = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=[
-                    {"role": "system", "content": prompt_sistema},
+                    {"role": "system", "content": prompt_sistema.format(contexto_historico=pacote["bloco_historico"])},
                     {"role": "user", "content": consulta}
                 ],
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=max_tokens
             )
             
             resposta_llm = response.choices[0].message.content
@@ -606,7 +735,8 @@ Responda à pergunta do usuário de forma completa, útil e considerando o conte
                 "palavras_chave": [],
                 "modo_consulta": "llm_livre",
                 "usou_base": False,
-                "raciocinio": "Resposta gerada pelo modelo de IA com contexto do histórico"
+                "raciocinio": "Resposta gerada pelo modelo de IA com contexto do histórico",
+                "orcamento_tokens": pacote["tokens"]
             }
             
         except Exception as e:
@@ -648,7 +778,8 @@ Responda à pergunta do usuário de forma completa, útil e considerando o conte
             print(f"Erro ao buscar consultores: {str(e)}")
             return []
     
-    def _processar_resposta_base_interna(self, consulta: str, resultados: List[Dict], analise: Dict) -> Dict:
+    def _processar_resposta_base_interna(self, consulta: str, resultados: List[Dict], analise: Dict,
+                                         historico: Optional[List[str]] = None) -> Dict:
         """
         Processa resposta usando informações da base interna (Cenário A - Sucesso).
         
@@ -656,34 +787,21 @@ Responda à pergunta do usuário de forma completa, útil e considerando o conte
             consulta: Pergunta original
             resultados: Resultados da busca interna
             analise: Análise Chain of Thought
+            historico: Interações anteriores formatadas (None = histórico interno)
             
         Returns:
             Dict com resposta baseada na base interna
         """
         # Organiza o contexto com identificação das fontes
-        contextos_organizados = []
-        fontes_unicas = set()
-        
-        for i, resultado in enumerate(resultados):
+        def formatar_chunk(i: int, resultado: Dict) -> str:
             fonte = resultado["metadados"]["fonte"]
-            fontes_unicas.add(fonte)
             chunk_id = resultado["metadados"].get("chunk_id", "")
-            
-            contexto_formatado = f"""[DOCUMENTO OFICIAL SEBRAE {i+1}: {fonte} - Seção {chunk_id}]
+            return f"""[DOCUMENTO OFICIAL SEBRAE {i+1}: {fonte} - Seção {chunk_id}]
 {resultado["texto"]}
 [FIM DO DOCUMENTO {i+1}]"""
-            
-            contextos_organizados.append(contexto_formatado)
-        
-        contexto_completo = "\n\n".join(contextos_organizados)
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"""Você é o "{self.nome}" - {self.especialidade}.
+            prompt_sistema = f"""Você é o "{self.nome}" - {self.especialidade}.
                         
 Sua função: {self.funcao_principal}
 Missão: {self.missao}
@@ -720,15 +838,14 @@ IMPORTANTE:
 - Concentre-se APENAS nas seções 1 e 2
 - NÃO crie seções de consultores ou documentos
 - Seja objetivo e prático"""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"""ANÁLISE INICIAL: {analise['raciocinio']}
+            
+            def montar_mensagem(contexto_completo: str, bloco_historico: str) -> str:
+                return f"""ANÁLISE INICIAL: {analise['raciocinio']}
 
 CONTEXTO DOS DOCUMENTOS OFICIAIS SEBRAE:
 {contexto_completo}
 
-PERGUNTA DO ANALISTA: "{consulta}"
+{bloco_historico}PERGUNTA DO ANALISTA: "{consulta}"
 
 INSTRUÇÕES ESPECÍFICAS:
 - Inicie com apresentação como Consultor IA Sebrae e sua missão
@@ -739,11 +856,30 @@ INSTRUÇÕES ESPECÍFICAS:
 - NÃO liste documentos (será adicionado automaticamente)
 
 RESPOSTA PROFISSIONAL:"""
-                    }
+            
+            # Sistema, pergunta, chunks e histórico, nessa ordem, dentro do orçamento de tokens
+            max_tokens = 2500
+            pacote = self._empacotar_prompt(
+                prompt_sistema, montar_mensagem("", ""), resultados, historico, max_tokens, formatar_chunk
+            )
+            contexto_completo = "\n\n".join(
+                formatar_chunk(i, resultado) for i, resultado in enumerate(pacote["chunks"])
+            )
+            fontes_unicas = {resultado["metadados"]["fonte"] for resultado in pacote["chunks"]}
+            
+            inicio_llm = time.perf_counter()
+            response = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "system", "content": prompt_sistema},
+                    {"role": "user", "content": montar_mensagem(contexto_completo, pacote["bloco_historico"])}
                 ],
-                max_tokens=2500,
+                max_tokens=max_tokens,
                 temperature=0.2  # Ainda mais preciso para informações oficiais
             )
+            # Tempo de resposta do LLM, para comparar prompts com e sem compressão do contexto
+            tempo_llm_ms = round((time.perf_counter() - inicio_llm) * 1000, 1)
+            print(f"⏱️ Resposta do LLM em {tempo_llm_ms:.0f} ms ({pacote['tokens']['total']} tokens no prompt)")
             
             resposta_gerada = response.choices[0].message.content
             return {
@@ -752,7 +888,9 @@ RESPOSTA PROFISSIONAL:"""
                 "palavras_chave": [],
                 "num_documentos_consultados": len(fontes_unicas),
                 "estrategia_usada": "base_interna_oficial",
-                "raciocinio": analise["raciocinio"]
+                "raciocinio": analise["raciocinio"],
+                "orcamento_tokens": pacote["tokens"],
+                "tempo_llm_ms": tempo_llm_ms
             }
             
         except Exception as e:
@@ -763,7 +901,8 @@ RESPOSTA PROFISSIONAL:"""
                 "estrategia_usada": "erro_processamento"
             }
     
-    def _processar_resposta_busca_ampla(self, consulta: str, resultados: List[Dict], analise: Dict) -> Dict:
+    def _processar_resposta_busca_ampla(self, consulta: str, resultados: List[Dict], analise: Dict,
+                                        historico: Optional[List[str]] = None) -> Dict:
         """
         Processa resposta usando busca ampla (Cenário B - Fallback).
         
@@ -771,6 +910,7 @@ RESPOSTA PROFISSIONAL:"""
             consulta: Pergunta original
             resultados: Resultados da busca ampla
             analise: Análise Chain of Thought
+            historico: Interações anteriores formatadas (None = histórico interno)
             
         Returns:
             Dict com resposta baseada em busca ampla
@@ -783,24 +923,11 @@ RESPOSTA PROFISSIONAL:"""
                 "estrategia_usada": "busca_ampla_sem_resultados"
             }
         
-        # Organiza contexto dos resultados amplos
-        contextos = []
-        fontes = set()
-        
-        for i, resultado in enumerate(resultados[:5]):  # Limita a 5 resultados
-            fonte = resultado["metadados"]["fonte"]
-            fontes.add(fonte)
-            contextos.append(f"[DOCUMENTO PARCIAL {i+1}: {fonte}]\n{resultado['texto']}")
-        
-        contexto_amplo = "\n\n".join(contextos)
+        def formatar_chunk(i: int, resultado: Dict) -> str:
+            return f"[DOCUMENTO PARCIAL {i+1}: {resultado['metadados']['fonte']}]\n{resultado['texto']}"
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"""Você é o "{self.nome}" do Sebrae.
+            prompt_sistema = f"""Você é o "{self.nome}" do Sebrae.
                         
 SITUAÇÃO: A informação específica não foi encontrada em nossa base principal, 
 mas encontramos algumas referências parciais em documentos.
@@ -810,22 +937,36 @@ INSTRUÇÕES:
 - Use o que conseguiu encontrar de forma responsável
 - Sugira próximos passos práticos
 - Mantenha tom profissional e solícito"""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"""ANÁLISE: {analise['raciocinio']}
+            
+            def montar_mensagem(contexto_amplo: str, bloco_historico: str) -> str:
+                return f"""ANÁLISE: {analise['raciocinio']}
 
 A busca específica não retornou resultados completos, mas encontrei algumas referências parciais:
 
 {contexto_amplo}
 
-Pergunta: "{consulta}"
+{bloco_historico}Pergunta: "{consulta}"
 
 Responda baseado nas informações limitadas disponíveis, seja transparente sobre as limitações 
 e forneça orientações práticas:"""
-                    }
+            
+            # Até 5 resultados, dentro do orçamento de tokens, antes do histórico
+            max_tokens = 1500
+            pacote = self._empacotar_prompt(
+                prompt_sistema, montar_mensagem("", ""), resultados[:5], historico, max_tokens, formatar_chunk
+            )
+            contexto_amplo = "\n\n".join(
+                formatar_chunk(i, resultado) for i, resultado in enumerate(pacote["chunks"])
+            )
+            fontes = {resultado["metadados"]["fonte"] for resultado in pacote["chunks"]}
+            
+            response = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "system", "content": prompt_sistema},
+                    {"role": "user", "content": montar_mensagem(contexto_amplo, pacote["bloco_historico"])}
                 ],
-                max_tokens=1500,
+                max_tokens=max_tokens,
                 temperature=0.4
             )
             
@@ -835,7 +976,8 @@ e forneça orientações práticas:"""
                 "palavras_chave": [],
                 "busca_ampla": True,
                 "estrategia_usada": "busca_ampla_com_resultados_parciais",
-                "raciocinio": analise["raciocinio"]
+                "raciocinio": analise["raciocinio"],
+                "orcamento_tokens": pacote["tokens"]
             }
             
         except Exception as e:
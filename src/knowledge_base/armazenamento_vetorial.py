@@ -0,0 +1,727 @@
+"""
+Armazenamento dos vetores dos chunks, com backends intercambiáveis.
+
+A BaseConhecimento usa apenas o subconjunto da API de coleções do ChromaDB
+definido em ArmazenamentoVetorial (add, upsert, update, delete, get, query e
+count), com os mesmos argumentos e o mesmo formato de retorno. Há dois backends:
+- "chroma": coleção persistente do ChromaDB (índice HNSW aproximado);
+- "numpy": índice plano exato, com os vetores em uma matriz float16 mapeada em
+  memória (np.memmap) e textos e metadados em SQLite. Com algumas dezenas de
+  milhares de chunks, a busca por força bruta é exata, tem latência estável e
+  a base abre sem carregar o ChromaDB.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+BACKENDS_VETORIAIS = ("chroma", "numpy")
+NOME_COLECAO_PADRAO = "documentos_sebrae"
+
+INCLUDE_GET_PADRAO = ("documents", "metadatas")
+INCLUDE_QUERY_PADRAO = ("documents", "metadatas", "distances")
+
+# Metadados com índice invertido no backend numpy (filtros de igualdade e $in)
+CAMPOS_INDEXADOS = ("caminho", "categoria", "tipo_documento", "codigo_produto")
+
+
+class ArmazenamentoVetorial(ABC):
+    """Interface comum dos backends de armazenamento vetorial."""
+
+    nome_backend = ""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Retorna o número de chunks armazenados."""
+
+    @abstractmethod
+    def add(self, ids: List[str], embeddings=None, metadatas: Optional[List[Dict]] = None,
+            documents: Optional[List[str]] = None):
+        """
+        Adiciona chunks novos (IDs já existentes são ignorados).
+
+        Args:
+            ids: IDs dos chunks
+            embeddings: Vetores dos chunks (None = gerados pela função de embeddings)
+            metadatas: Metadados de cada chunk
+            documents: Texto de cada chunk
+        """
+
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings=None, metadatas: Optional[List[Dict]] = None,
+               documents: Optional[List[str]] = None):
+        """Adiciona chunks ou substitui os já existentes (mesmos argumentos de add)."""
+
+    @abstractmethod
+    def update(self, ids: List[str], embeddings=None, metadatas: Optional[List[Dict]] = None,
+               documents: Optional[List[str]] = None):
+        """Atualiza apenas os campos informados de chunks existentes (mesmos argumentos de add)."""
+
+    @abstractmethod
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        """
+        Remove chunks por ID e/ou por filtro de metadados.
+
+        Args:
+            ids: IDs dos chunks
+            where: Cláusula where no formato do ChromaDB
+        """
+
+    @abstractmethod
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Sequence[str] = INCLUDE_GET_PADRAO) -> Dict[str, Any]:
+        """
+        Lê chunks por ID e/ou filtro de metadados.
+
+        Args:
+            ids: IDs dos chunks (None = todos)
+            where: Cláusula where no formato do ChromaDB
+            limit: Número máximo de chunks
+            offset: Chunks ignorados no início (paginação)
+            include: Campos retornados ("documents", "metadatas", "embeddings")
+
+        Returns:
+            Dicionário com "ids" e os campos pedidos, como no ChromaDB
+        """
+
+    @abstractmethod
+    def query(self, query_embeddings=None, n_results: int = 10, where: Optional[Dict] = None,
+              include: Sequence[str] = INCLUDE_QUERY_PADRAO, query_texts: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Busca os chunks mais próximos de cada consulta (distância L2 ao quadrado).
+
+        Args:
+            query_embeddings: Vetores das consultas
+            n_results: Número de resultados por consulta
+            where: Cláusula where no formato do ChromaDB
+            include: Campos retornados ("documents", "metadatas", "distances", "embeddings")
+            query_texts: Textos das consultas, se os vetores não forem informados
+
+        Returns:
+            Dicionário com uma lista de resultados por consulta para cada campo
+        """
+
+    @abstractmethod
+    def limpar(self):
+        """Remove todos os chunks."""
+
+    def fechar(self):
+        """Libera conexões e arquivos abertos; o armazenamento não é mais usado depois."""
+
+
+class ArmazenamentoChroma(ArmazenamentoVetorial):
+    """Coleção persistente do ChromaDB."""
+
+    nome_backend = "chroma"
+
+    def __init__(self, diretorio: str, nome_colecao: str = NOME_COLECAO_PADRAO, embedding_function=None):
+        """
+        Abre (ou cria) a coleção.
+
+        Args:
+            diretorio: Diretório de persistência do ChromaDB
+            nome_colecao: Nome da coleção
+            embedding_function: Função de embeddings usada quando os vetores não são informados
+        """
+        import chromadb
+
+        self.nome_colecao = nome_colecao
+        self.embedding_function = embedding_function
+        self.client = chromadb.PersistentClient(path=diretorio)
+        self.colecao = self.client.get_or_create_collection(nome_colecao, embedding_function=embedding_function)
+
+    def count(self) -> int:
+        return self.colecao.count()
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None):
+        self.colecao.add(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None):
+        self.colecao.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def update(self, ids, embeddings=None, metadatas=None, documents=None):
+        self.colecao.update(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def delete(self, ids=None, where=None):
+        self.colecao.delete(ids=ids, where=where)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=INCLUDE_GET_PADRAO):
+        return self.colecao.get(ids=ids, where=where, limit=limit, offset=offset, include=list(include))
+
+    def query(self, query_embeddings=None, n_results=10, where=None, include=INCLUDE_QUERY_PADRAO,
+              query_texts=None):
+        return self.colecao.query(
+            query_embeddings=query_embeddings,
+            query_texts=query_texts,
+            n_results=n_results,
+            where=where,
+            include=list(include)
+        )
+
+    def limpar(self):
+        self.client.delete_collection(self.nome_colecao)
+        self.colecao = self.client.get_or_create_collection(
+            self.nome_colecao, embedding_function=self.embedding_function
+        )
+
+    def fechar(self):
+        # Client.close só existe nas versões mais recentes do ChromaDB
+        fechar_cliente = getattr(self.client, "close", None)
+        if fechar_cliente is not None:
+            fechar_cliente()
+
+
+def _comparar(valor: Any, operador: str, operando: Any) -> bool:
+    """Aplica um operador de filtro do ChromaDB a um valor de metadado."""
+    try:
+        if operador == "$eq":
+            return valor == operando
+        if operador == "$ne":
+            return valor != operando
+        if operador == "$gt":
+            return valor > operando
+        if operador == "$gte":
+            return valor >= operando
+        if operador == "$lt":
+            return valor < operando
+        if operador == "$lte":
+            return valor <= operando
+        if operador == "$in":
+            return valor in operando
+        if operador == "$nin":
+            return valor not in operando
+        if operador == "$contains":
+            return isinstance(valor, (str, list)) and operando in valor
+        if operador == "$not_contains":
+            return isinstance(valor, (str, list)) and operando not in valor
+    except TypeError:
+        return False
+    raise ValueError(f"Operador de filtro não suportado: {operador}")
+
+
+def atende_filtro(metadados: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """
+    Avalia uma cláusula where do ChromaDB sobre os metadados de um chunk.
+
+    Args:
+        metadados: Metadados do chunk
+        where: Cláusula where ($and, $or e operadores de comparação)
+
+    Returns:
+        True se o chunk atende ao filtro (campos ausentes nunca atendem)
+    """
+    for campo, condicao in where.items():
+        if campo == "$and":
+            if not all(atende_filtro(metadados, clausula) for clausula in condicao):
+                return False
+        elif campo == "$or":
+            if not any(atende_filtro(metadados, clausula) for clausula in condicao):
+                return False
+        elif campo not in metadados:
+            return False
+        elif isinstance(condicao, dict):
+            if not all(_comparar(metadados[campo], operador, operando) for operador, operando in condicao.items()):
+                return False
+        elif metadados[campo] != condicao:
+            return False
+    return True
+
+
+class ArmazenamentoNumpy(ArmazenamentoVetorial):
+    """
+    Índice plano exato sobre uma matriz float16 mapeada em memória.
+
+    Vários processos podem gravar no mesmo diretório (ex.: a API e o
+    gerenciar_base.py): cada gravação escolhe as linhas da matriz dentro da
+    transação de escrita do SQLite, que é exclusiva entre processos, e as
+    leituras recarregam o estado quando outro processo confirma uma gravação.
+    """
+
+    nome_backend = "numpy"
+
+    def __init__(self, diretorio: str, embedding_function=None, em_memoria: bool = True,
+                 tamanho_bloco: int = 8192):
+        """
+        Abre (ou cria) o armazenamento.
+
+        Args:
+            diretorio: Diretório dos arquivos do índice (vetores.bin e registros.sqlite3)
+            embedding_function: Função de embeddings usada quando os vetores não são informados
+            em_memoria: Mantém uma cópia float32 dos vetores em RAM para as buscas
+                (mais rápido); se False, as buscas leem a matriz float16 do disco em blocos
+            tamanho_bloco: Linhas convertidas por vez quando em_memoria é False
+        """
+        self.diretorio = diretorio
+        self.embedding_function = embedding_function
+        self.em_memoria = em_memoria
+        self.tamanho_bloco = tamanho_bloco
+        os.makedirs(diretorio, exist_ok=True)
+        self.arquivo_vetores = os.path.join(diretorio, "vetores.bin")
+        open(self.arquivo_vetores, "ab").close()
+
+        self._trava = threading.RLock()
+        self._conexao = sqlite3.connect(
+            os.path.join(diretorio, "registros.sqlite3"), check_same_thread=False, isolation_level=None
+        )
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS registros (
+                id TEXT PRIMARY KEY,
+                linha INTEGER NOT NULL UNIQUE,
+                documento TEXT,
+                metadados TEXT
+            );
+            CREATE TABLE IF NOT EXISTS info (
+                chave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL
+            );
+        """)
+        self._carregar()
+
+    # ------------------------------------------------------------------
+    # Estado em memória
+    # ------------------------------------------------------------------
+
+    def _carregar(self):
+        """Lê registros e vetores gravados (também após gravações de outro processo)."""
+        self._versao_dados = self._conexao.execute("PRAGMA data_version").fetchone()[0]
+        linha_dimensao = self._conexao.execute("SELECT valor FROM info WHERE chave = 'dimensao'").fetchone()
+        self.dimensao: Optional[int] = int(linha_dimensao[0]) if linha_dimensao else None
+
+        registros = self._conexao.execute("SELECT id, linha, documento, metadados FROM registros").fetchall()
+        capacidade = 0
+        if self.dimensao:
+            capacidade = max(
+                os.path.getsize(self.arquivo_vetores) // (self.dimensao * 2),
+                max((linha for _, linha, _, _ in registros), default=-1) + 1
+            )
+
+        self._ids: List[Optional[str]] = [None] * capacidade
+        self._documentos: List[Optional[str]] = [None] * capacidade
+        self._metadados: List[Optional[Dict]] = [None] * capacidade
+        self._linha_por_id: Dict[str, int] = {}
+        self._indice_metadados: Dict[str, Dict[Any, set]] = {campo: {} for campo in CAMPOS_INDEXADOS}
+        self._ativos = np.zeros(capacidade, dtype=bool)
+        self._fim = 0  # linhas a partir daqui nunca foram ocupadas
+        for chunk_id, linha, documento, metadados in registros:
+            self._definir_registro(linha, chunk_id, documento, json.loads(metadados) if metadados else None,
+                                   substituir=False)
+
+        self._abrir_matriz(capacidade)
+        self._livres = [linha for linha in range(capacidade - 1, -1, -1) if not self._ativos[linha]]
+
+    def _abrir_matriz(self, capacidade: int):
+        """Mapeia o arquivo de vetores e recalcula a cópia float32 e as normas."""
+        self._matriz = None
+        self._vetores = None
+        self._normas = np.zeros(capacidade, dtype=np.float32)
+        if not self.dimensao or not capacidade:
+            return
+
+        tamanho = capacidade * self.dimensao * 2
+        if os.path.getsize(self.arquivo_vetores) < tamanho:
+            os.truncate(self.arquivo_vetores, tamanho)
+        self._matriz = np.memmap(self.arquivo_vetores, dtype=np.float16, mode="r+",
+                                 shape=(capacidade, self.dimensao))
+        if self.em_memoria:
+            self._vetores = np.zeros((capacidade, self.dimensao), dtype=np.float32)
+            self._vetores[:self._fim] = self._matriz[:self._fim]
+        for inicio in range(0, self._fim, self.tamanho_bloco):
+            bloco = self._bloco(inicio, min(inicio + self.tamanho_bloco, self._fim))
+            self._normas[inicio:inicio + len(bloco)] = np.einsum("ij,ij->i", bloco, bloco)
+
+    def _bloco(self, inicio: int, fim: int) -> np.ndarray:
+        if self._vetores is not None:
+            return self._vetores[inicio:fim]
+        return np.asarray(self._matriz[inicio:fim], dtype=np.float32)
+
+    def _definir_registro(self, linha: int, chunk_id: str, documento: Optional[str], metadados: Optional[Dict],
+                          substituir: bool = True):
+        if substituir:
+            self._desindexar(linha)
+        self._ids[linha] = chunk_id
+        self._documentos[linha] = documento
+        self._metadados[linha] = metadados
+        self._linha_por_id[chunk_id] = linha
+        self._ativos[linha] = True
+        self._fim = max(self._fim, linha + 1)
+        for campo in CAMPOS_INDEXADOS:
+            if metadados and isinstance(metadados.get(campo), (str, int, float)):
+                self._indice_metadados[campo].setdefault(metadados[campo], set()).add(linha)
+
+    def _desindexar(self, linha: int):
+        metadados = self._metadados[linha] or {}
+        for campo in CAMPOS_INDEXADOS:
+            if isinstance(metadados.get(campo), (str, int, float)):
+                self._indice_metadados[campo].get(metadados[campo], set()).discard(linha)
+
+    def _sincronizar(self):
+        """Recarrega o estado se outro processo gravou no armazenamento."""
+        if self._conexao.execute("PRAGMA data_version").fetchone()[0] != self._versao_dados:
+            self._carregar()
+
+    def _crescer(self, capacidade_minima: int):
+        """Aumenta (dobrando) a capacidade da matriz em disco e das estruturas em memória."""
+        atual = len(self._ids)
+        if capacidade_minima <= atual:
+            return
+        nova = max(capacidade_minima, atual * 2, 1024)
+        self._matriz = None
+        os.truncate(self.arquivo_vetores, nova * self.dimensao * 2)
+        self._matriz = np.memmap(self.arquivo_vetores, dtype=np.float16, mode="r+", shape=(nova, self.dimensao))
+
+        extra = nova - atual
+        self._ids.extend([None] * extra)
+        self._documentos.extend([None] * extra)
+        self._metadados.extend([None] * extra)
+        self._ativos = np.concatenate([self._ativos, np.zeros(extra, dtype=bool)])
+        self._normas = np.concatenate([self._normas, np.zeros(extra, dtype=np.float32)])
+        if self.em_memoria:
+            vetores = np.zeros((nova, self.dimensao), dtype=np.float32)
+            if self._vetores is not None:
+                vetores[:atual] = self._vetores
+            self._vetores = vetores
+        self._livres = list(range(nova - 1, atual - 1, -1)) + self._livres
+
+    # ------------------------------------------------------------------
+    # Gravação
+    # ------------------------------------------------------------------
+
+    def _vetores_informados(self, embeddings, documents, quantidade: int) -> Optional[np.ndarray]:
+        if embeddings is None:
+            if documents is None or self.embedding_function is None:
+                return None
+            embeddings = self.embedding_function(list(documents))
+        vetores = np.asarray(embeddings, dtype=np.float32).reshape(quantidade, -1)
+        if self.dimensao is None:
+            self.dimensao = vetores.shape[1]
+            self._conexao.execute("INSERT OR REPLACE INTO info (chave, valor) VALUES ('dimensao', ?)",
+                                  (str(self.dimensao),))
+            self._abrir_matriz(0)
+        elif vetores.shape[1] != self.dimensao:
+            raise ValueError(f"Dimensão do vetor ({vetores.shape[1]}) difere da do índice ({self.dimensao})")
+        return vetores
+
+    def _gravar(self, ids: List[str], vetores: Optional[np.ndarray], metadatas, documents, somente_existentes: bool):
+        """
+        Grava chunks: vetores novos vão para linhas livres e só então os registros
+        são confirmados no SQLite, de modo que um registro sempre aponta para um
+        vetor completo mesmo após uma interrupção.
+        
+        Tudo acontece dentro da transação de escrita do SQLite (BEGIN IMMEDIATE),
+        que é exclusiva entre processos: o estado é relido depois de adquiri-la
+        e as linhas livres escolhidas não podem ser ocupadas por outro processo
+        antes do COMMIT.
+        """
+        with self._trava:
+            novas_linhas = {}
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                self._sincronizar()
+                gravacoes = {}
+                for posicao, chunk_id in enumerate(ids):
+                    linha_anterior = self._linha_por_id.get(chunk_id)
+                    if somente_existentes and linha_anterior is None:
+                        continue
+                    documento = documents[posicao] if documents is not None else None
+                    metadados = metadatas[posicao] if metadatas is not None else None
+                    if linha_anterior is not None:
+                        documento = documento if documents is not None else self._documentos[linha_anterior]
+                        metadados = metadados if metadatas is not None else self._metadados[linha_anterior]
+                    elif vetores is None:
+                        raise ValueError(f"Chunk {chunk_id} sem embedding nem função de embeddings")
+                    # Um ID repetido na mesma chamada fica com os dados da última ocorrência
+                    gravacoes[chunk_id] = (posicao, chunk_id, linha_anterior, documento, metadados)
+                gravacoes = list(gravacoes.values())
+                
+                if vetores is not None and gravacoes:
+                    self._crescer(len(self._ids) - len(self._livres) + len(gravacoes))
+                    for posicao, chunk_id, _, _, _ in gravacoes:
+                        linha = self._livres.pop()
+                        novas_linhas[chunk_id] = linha
+                        self._matriz[linha] = vetores[posicao]
+                    self._matriz.flush()
+                
+                liberadas = []
+                for _, chunk_id, linha_anterior, documento, metadados in gravacoes:
+                    linha = novas_linhas.get(chunk_id, linha_anterior)
+                    self._conexao.execute(
+                        "INSERT OR REPLACE INTO registros (id, linha, documento, metadados) VALUES (?, ?, ?, ?)",
+                        (chunk_id, linha, documento, json.dumps(metadados, ensure_ascii=False) if metadados else None)
+                    )
+                    if linha_anterior is not None and linha_anterior != linha:
+                        liberadas.append(linha_anterior)
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                self._livres.extend(novas_linhas.values())
+                raise
+            self._versao_dados = self._conexao.execute("PRAGMA data_version").fetchone()[0]
+
+            for posicao, chunk_id, _, documento, metadados in gravacoes:
+                linha = novas_linhas.get(chunk_id, self._linha_por_id.get(chunk_id))
+                if chunk_id in novas_linhas:
+                    vetor = np.asarray(self._matriz[linha], dtype=np.float32)
+                    if self._vetores is not None:
+                        self._vetores[linha] = vetor
+                    self._normas[linha] = vetor @ vetor
+                self._definir_registro(linha, chunk_id, documento, metadados)
+            for linha in liberadas:
+                self._liberar_linha(linha)
+
+    def _liberar_linha(self, linha: int):
+        self._desindexar(linha)
+        self._ids[linha] = None
+        self._documentos[linha] = None
+        self._metadados[linha] = None
+        self._ativos[linha] = False
+        self._livres.append(linha)
+
+    def count(self) -> int:
+        with self._trava:
+            self._sincronizar()
+            return len(self._linha_por_id)
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None):
+        with self._trava:
+            self._sincronizar()
+            novos = [posicao for posicao, chunk_id in enumerate(ids) if chunk_id not in self._linha_por_id]
+            if not novos:
+                return
+            if len(novos) < len(ids):
+                ids = [ids[posicao] for posicao in novos]
+                embeddings = None if embeddings is None else [embeddings[posicao] for posicao in novos]
+                metadatas = None if metadatas is None else [metadatas[posicao] for posicao in novos]
+                documents = None if documents is None else [documents[posicao] for posicao in novos]
+            self.upsert(ids, embeddings, metadatas, documents)
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None):
+        if not ids:
+            return
+        with self._trava:
+            vetores = self._vetores_informados(embeddings, documents, len(ids))
+            self._gravar(list(ids), vetores, metadatas, documents, somente_existentes=False)
+
+    def update(self, ids, embeddings=None, metadatas=None, documents=None):
+        if not ids:
+            return
+        with self._trava:
+            vetores = None
+            if embeddings is not None or documents is not None:
+                vetores = self._vetores_informados(embeddings, documents, len(ids))
+            self._gravar(list(ids), vetores, metadatas, documents, somente_existentes=True)
+
+    def delete(self, ids=None, where=None):
+        with self._trava:
+            # Como em _gravar, as linhas a remover são calculadas já com a trava de escrita
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                self._sincronizar()
+                linhas = self._linhas_filtradas(ids, where)
+                self._conexao.executemany(
+                    "DELETE FROM registros WHERE id = ?", [(self._ids[linha],) for linha in linhas]
+                )
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+            self._versao_dados = self._conexao.execute("PRAGMA data_version").fetchone()[0]
+            for linha in linhas:
+                del self._linha_por_id[self._ids[linha]]
+                self._liberar_linha(int(linha))
+
+    def limpar(self):
+        with self._trava:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                self._conexao.execute("DELETE FROM registros")
+                self._conexao.execute("DELETE FROM info")
+                self._matriz = None
+                os.truncate(self.arquivo_vetores, 0)
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+            self._carregar()
+
+    def fechar(self):
+        with self._trava:
+            self._conexao.close()
+            self._matriz = None
+            self._vetores = None
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def _candidatos_indice(self, where: Dict) -> Optional[set]:
+        """Restringe, pelo índice invertido, as linhas que podem atender ao filtro (None = sem restrição)."""
+        candidatos = None
+        for campo, condicao in where.items():
+            if campo == "$and":
+                conjuntos = [self._candidatos_indice(clausula) for clausula in condicao]
+            elif campo in self._indice_metadados:
+                if isinstance(condicao, dict) and list(condicao) in (["$eq"], ["$in"]):
+                    valores = condicao.get("$in", [condicao.get("$eq")])
+                elif not isinstance(condicao, dict):
+                    valores = [condicao]
+                else:
+                    continue
+                indice = self._indice_metadados[campo]
+                conjuntos = [set().union(*(indice.get(valor, ()) for valor in valores))]
+            else:
+                continue
+            for conjunto in conjuntos:
+                if conjunto is not None:
+                    candidatos = conjunto if candidatos is None else candidatos & conjunto
+        return candidatos
+
+    def _linhas_filtradas(self, ids: Optional[Iterable[str]], where: Optional[Dict]) -> np.ndarray:
+        """Retorna as linhas ativas que atendem aos IDs e ao filtro, em ordem de linha (ou dos IDs)."""
+        if ids is not None:
+            linhas = [self._linha_por_id[chunk_id] for chunk_id in dict.fromkeys(ids) if chunk_id in self._linha_por_id]
+        else:
+            candidatos = self._candidatos_indice(where) if where else None
+            linhas = np.flatnonzero(self._ativos) if candidatos is None else sorted(candidatos)
+            if not where:
+                return linhas
+        if where:
+            linhas = [linha for linha in linhas if atende_filtro(self._metadados[linha] or {}, where)]
+        return np.asarray(linhas, dtype=np.int64)
+
+    def _resultado(self, linhas: Sequence[int], include: Sequence[str]) -> Dict[str, Any]:
+        resultado: Dict[str, Any] = {"ids": [self._ids[linha] for linha in linhas]}
+        resultado["documents"] = [self._documentos[linha] for linha in linhas] if "documents" in include else None
+        resultado["metadatas"] = [self._metadados[linha] for linha in linhas] if "metadatas" in include else None
+        resultado["embeddings"] = self._vetores_linhas(linhas) if "embeddings" in include else None
+        return resultado
+
+    def _vetores_linhas(self, linhas: Sequence[int]) -> np.ndarray:
+        if not len(linhas):
+            return np.zeros((0, self.dimensao or 0), dtype=np.float32)
+        if self._vetores is not None:
+            return self._vetores[linhas]
+        return np.asarray(self._matriz[linhas], dtype=np.float32)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=INCLUDE_GET_PADRAO):
+        with self._trava:
+            self._sincronizar()
+            linhas = self._linhas_filtradas(ids, where)
+            inicio = offset or 0
+            linhas = linhas[inicio:inicio + limit] if limit is not None else linhas[inicio:]
+            return self._resultado(linhas, include)
+
+    def _distancias(self, consultas: np.ndarray, linhas: Optional[np.ndarray]) -> np.ndarray:
+        """Distâncias L2 ao quadrado (||c||² + ||v||² - 2 c·v) das consultas até as linhas."""
+        normas_consultas = np.einsum("ij,ij->i", consultas, consultas)[:, None]
+        if linhas is not None:
+            produtos = consultas @ self._vetores_linhas(linhas).T
+            normas = self._normas[linhas]
+        elif self._vetores is not None:
+            produtos = consultas @ self._vetores[:self._fim].T
+            normas = self._normas[:self._fim]
+        else:
+            produtos = np.hstack([
+                consultas @ self._bloco(inicio, min(inicio + self.tamanho_bloco, self._fim)).T
+                for inicio in range(0, self._fim, self.tamanho_bloco)
+            ])
+            normas = self._normas[:self._fim]
+        return np.maximum(normas_consultas + normas[None, :] - 2 * produtos, 0.0)
+
+    def query(self, query_embeddings=None, n_results=10, where=None, include=INCLUDE_QUERY_PADRAO,
+              query_texts=None):
+        if query_embeddings is None:
+            if query_texts is None or self.embedding_function is None:
+                raise ValueError("Informe query_embeddings ou query_texts (com função de embeddings)")
+            query_embeddings = self.embedding_function(list(query_texts))
+        consultas = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+
+        with self._trava:
+            self._sincronizar()
+            campos = ("ids", "documents", "metadatas", "distances", "embeddings")
+            resultado: Dict[str, Any] = {campo: [] for campo in campos}
+            candidatos = self._linhas_filtradas(None, where) if where else None
+            total = len(self._linha_por_id) if candidatos is None else len(candidatos)
+            k = min(n_results, total)
+            if k <= 0 or self.dimensao is None:
+                for campo in campos:
+                    resultado[campo] = [[] for _ in consultas] if campo == "ids" or campo in include else None
+                return resultado
+
+            distancias = self._distancias(consultas, candidatos)
+            if candidatos is None:
+                # Sem filtro a matriz inteira é usada; linhas livres nunca são escolhidas
+                distancias[:, ~self._ativos[:self._fim]] = np.inf
+                total = self._fim
+            # Seleção parcial dos k menores (O(n)) e ordenação apenas deles
+            if k < total:
+                melhores = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+            else:
+                melhores = np.tile(np.arange(total), (len(consultas), 1))
+            for indice_consulta, posicoes in enumerate(melhores):
+                posicoes = posicoes[np.argsort(distancias[indice_consulta, posicoes], kind="stable")]
+                linhas = posicoes if candidatos is None else candidatos[posicoes]
+                parcial = self._resultado(linhas, include)
+                for campo in ("ids", "documents", "metadatas", "embeddings"):
+                    resultado[campo].append(parcial[campo])
+                resultado["distances"].append(distancias[indice_consulta, posicoes].tolist())
+
+            for campo in campos:
+                if campo != "ids" and campo not in include:
+                    resultado[campo] = None
+            return resultado
+
+
+def criar_armazenamento(backend: str, diretorio: str, embedding_function=None,
+                        nome_colecao: str = NOME_COLECAO_PADRAO) -> ArmazenamentoVetorial:
+    """
+    Cria o armazenamento vetorial do backend escolhido.
+
+    Args:
+        backend: "chroma" ou "numpy"
+        diretorio: Diretório de persistência da base (o backend numpy usa o
+            subdiretório "vetores_numpy")
+        embedding_function: Função de embeddings usada quando os vetores não são informados
+        nome_colecao: Nome da coleção (backend chroma)
+
+    Returns:
+        Instância do armazenamento
+    """
+    if backend == "chroma":
+        return ArmazenamentoChroma(diretorio, nome_colecao, embedding_function)
+    if backend == "numpy":
+        return ArmazenamentoNumpy(os.path.join(diretorio, "vetores_numpy"), embedding_function)
+    raise ValueError(f"Backend vetorial não suportado: {backend} (use {', '.join(BACKENDS_VETORIAIS)})")
+
+
+def copiar_armazenamento(origem: ArmazenamentoVetorial, destino: ArmazenamentoVetorial,
+                         tamanho_pagina: int = 1000) -> int:
+    """
+    Copia todos os chunks (textos, metadados e vetores) de um backend para outro.
+
+    Args:
+        origem: Armazenamento lido
+        destino: Armazenamento gravado
+        tamanho_pagina: Chunks copiados por vez
+
+    Returns:
+        Número de chunks copiados
+    """
+    total = origem.count()
+    for inicio in range(0, total, tamanho_pagina):
+        pagina = origem.get(offset=inicio, limit=tamanho_pagina,
+                            include=["documents", "metadatas", "embeddings"])
+        destino.upsert(
+            ids=pagina["ids"],
+            embeddings=pagina["embeddings"],
+            metadatas=pagina["metadatas"],
+            documents=pagina["documents"]
+        )
+    return total
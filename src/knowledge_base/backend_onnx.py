@@ -0,0 +1,232 @@
+"""
+Backend ONNX Runtime para os modelos de embeddings SentenceTransformer.
+
+Exporta o transformer do modelo para ONNX (opcionalmente quantizado em int8
+dinâmico) e reproduz em NumPy as camadas seguintes do SentenceTransformer
+(pooling, Dense e normalização). A exportação acontece uma única vez e fica
+em disco; depois disso a inferência não usa PyTorch.
+"""
+
+import inspect
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+ENTRADAS_SUPORTADAS = ("input_ids", "attention_mask", "token_type_ids")
+ATIVACOES = {
+    "torch.nn.modules.activation.Tanh": np.tanh,
+    "torch.nn.modules.linear.Identity": lambda x: x,
+}
+
+
+class ModeloOnnx:
+    """Modelo de embeddings executado pelo ONNX Runtime, com a interface de encode do SentenceTransformer."""
+
+    def __init__(self, nome_modelo: str, diretorio: str = ".cache_onnx", quantizar: bool = False,
+                 num_threads: Optional[int] = None):
+        """
+        Carrega o modelo exportado, exportando-o na primeira vez.
+
+        Args:
+            nome_modelo: Nome (ou caminho) do modelo SentenceTransformer
+            diretorio: Diretório onde os modelos exportados são guardados
+            quantizar: Usa a versão com pesos quantizados em int8
+            num_threads: Threads de CPU do ONNX Runtime (None mantém o padrão)
+        """
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        self.nome_modelo = nome_modelo
+        self.diretorio = os.path.join(diretorio, re.sub(r"[^\w.-]", "_", nome_modelo))
+        if not os.path.exists(os.path.join(self.diretorio, "info.json")):
+            self.exportar(nome_modelo, self.diretorio)
+
+        arquivo_onnx = os.path.join(self.diretorio, "modelo.onnx")
+        if quantizar:
+            arquivo_onnx = self.quantizar(arquivo_onnx)
+
+        with open(os.path.join(self.diretorio, "info.json"), "r", encoding="utf-8") as f:
+            self.info = json.load(f)
+        self.max_seq_length = self.info["max_seq_length"]
+        self.entradas = self.info["entradas"]
+        self.camadas = self._carregar_camadas()
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.join(self.diretorio, "tokenizador"))
+
+        opcoes = onnxruntime.SessionOptions()
+        if num_threads:
+            opcoes.intra_op_num_threads = num_threads
+        self.sessao = onnxruntime.InferenceSession(
+            arquivo_onnx, sess_options=opcoes, providers=["CPUExecutionProvider"]
+        )
+
+    @staticmethod
+    def exportar(nome_modelo: str, destino: str):
+        """
+        Exporta o transformer do modelo para ONNX e salva os pesos das camadas seguintes.
+
+        Args:
+            nome_modelo: Nome (ou caminho) do modelo SentenceTransformer
+            destino: Diretório de destino
+        """
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        print(f"📦 Exportando {nome_modelo} para ONNX...")
+        os.makedirs(destino, exist_ok=True)
+        modelo = SentenceTransformer(nome_modelo, device="cpu")
+        modelo.eval()
+
+        transformer = modelo[0].auto_model
+        tokenizador = modelo.tokenizer
+        parametros = inspect.signature(transformer.forward).parameters
+        entradas = [
+            nome for nome in tokenizador.model_input_names
+            if nome in ENTRADAS_SUPORTADAS and nome in parametros
+        ]
+        exemplo = tokenizador(["exemplo de texto", "exemplo"], padding=True, return_tensors="pt")
+        eixos = {nome: {0: "lote", 1: "tokens"} for nome in entradas}
+        eixos["ultimo_estado"] = {0: "lote", 1: "tokens"}
+
+        class _Transformer(torch.nn.Module):
+            def __init__(self, modelo_base):
+                super().__init__()
+                self.modelo_base = modelo_base
+
+            def forward(self, *tensores):
+                return self.modelo_base(**dict(zip(entradas, tensores)))[0]
+
+        with torch.no_grad():
+            torch.onnx.export(
+                _Transformer(transformer),
+                tuple(exemplo[nome] for nome in entradas),
+                os.path.join(destino, "modelo.onnx"),
+                input_names=entradas,
+                output_names=["ultimo_estado"],
+                dynamic_axes=eixos,
+                opset_version=17,
+                dynamo=False
+            )
+
+        camadas, pesos = [], {}
+        for indice, modulo in enumerate(list(modelo)[1:]):
+            tipo = type(modulo).__name__
+            if tipo == "Pooling":
+                config = modulo.get_config_dict()
+                modo = config.get("pooling_mode") or next(
+                    modo for modo, chave in (("mean", "pooling_mode_mean_tokens"), ("cls", "pooling_mode_cls_token"),
+                                             ("max", "pooling_mode_max_tokens"))
+                    if config.get(chave)
+                )
+                camadas.append({"tipo": "pooling", "modo": modo})
+            elif tipo == "Dense":
+                ativacao = modulo.get_config_dict()["activation_function"]
+                if ativacao not in ATIVACOES:
+                    raise ValueError(f"Ativação não suportada no backend ONNX: {ativacao}")
+                pesos[f"peso_{indice}"] = modulo.linear.weight.detach().numpy()
+                if modulo.linear.bias is not None:
+                    pesos[f"vies_{indice}"] = modulo.linear.bias.detach().numpy()
+                camadas.append({"tipo": "dense", "indice": indice, "ativacao": ativacao})
+            elif tipo == "Normalize":
+                camadas.append({"tipo": "normalizar"})
+            else:
+                raise ValueError(f"Camada não suportada no backend ONNX: {tipo}")
+
+        np.savez(os.path.join(destino, "camadas.npz"), **pesos)
+        tokenizador.save_pretrained(os.path.join(destino, "tokenizador"))
+        with open(os.path.join(destino, "info.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "modelo": nome_modelo,
+                "max_seq_length": modelo.max_seq_length,
+                "entradas": entradas,
+                "camadas": camadas
+            }, f, indent=2)
+
+    @staticmethod
+    def quantizar(arquivo_onnx: str) -> str:
+        """
+        Gera (uma única vez) a versão do modelo com pesos int8 dinâmicos.
+
+        Args:
+            arquivo_onnx: Modelo ONNX em float32
+
+        Returns:
+            Caminho do modelo quantizado
+        """
+        destino = arquivo_onnx.replace(".onnx", "_int8.onnx")
+        if not os.path.exists(destino):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            print("📦 Quantizando modelo ONNX para int8...")
+            quantize_dynamic(arquivo_onnx, destino, weight_type=QuantType.QInt8)
+        return destino
+
+    def _carregar_camadas(self) -> List[Dict]:
+        """Associa a cada camada exportada os pesos salvos."""
+        pesos = np.load(os.path.join(self.diretorio, "camadas.npz"))
+        camadas = []
+        for camada in self.info["camadas"]:
+            camada = dict(camada)
+            if camada["tipo"] == "dense":
+                camada["peso"] = pesos[f"peso_{camada['indice']}"].T
+                vies = f"vies_{camada['indice']}"
+                camada["vies"] = pesos[vies] if vies in pesos.files else 0.0
+                camada["funcao"] = ATIVACOES[camada["ativacao"]]
+            camadas.append(camada)
+        return camadas
+
+    def _aplicar_camadas(self, estados: np.ndarray, mascara: np.ndarray) -> np.ndarray:
+        """Reproduz pooling, Dense e normalização do SentenceTransformer."""
+        vetores = estados
+        for camada in self.camadas:
+            if camada["tipo"] == "pooling":
+                if camada["modo"] == "cls":
+                    vetores = estados[:, 0]
+                elif camada["modo"] == "max":
+                    vetores = np.where(mascara[..., None] > 0, estados, -1e9).max(axis=1)
+                else:
+                    soma = (estados * mascara[..., None]).sum(axis=1)
+                    vetores = soma / np.clip(mascara.sum(axis=1, keepdims=True), 1e-9, None)
+            elif camada["tipo"] == "dense":
+                vetores = camada["funcao"](vetores @ camada["peso"] + camada["vies"])
+            elif camada["tipo"] == "normalizar":
+                vetores = vetores / np.clip(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12, None)
+        return vetores
+
+    def encode(self, textos, batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, normalize_embeddings: bool = False, **_) -> np.ndarray:
+        """
+        Gera embeddings com a mesma interface do SentenceTransformer.encode.
+
+        Args:
+            textos: Texto ou lista de textos
+            batch_size: Textos por inferência
+            convert_to_numpy: Mantido por compatibilidade (o retorno é sempre NumPy)
+            show_progress_bar: Mantido por compatibilidade
+            normalize_embeddings: Normaliza os vetores (norma L2 = 1)
+
+        Returns:
+            Matriz de embeddings (ou vetor, se um único texto foi passado)
+        """
+        unico = isinstance(textos, str)
+        textos = [textos] if unico else list(textos)
+
+        lotes = []
+        for inicio in range(0, len(textos), batch_size):
+            tokens = self.tokenizer(
+                textos[inicio:inicio + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            entradas = {nome: tokens[nome].astype(np.int64) for nome in self.entradas}
+            estados = self.sessao.run(None, entradas)[0]
+            lotes.append(self._aplicar_camadas(estados, tokens["attention_mask"].astype(np.float32)))
+
+        vetores = np.vstack(lotes).astype(np.float32) if lotes else np.zeros((0, 0), dtype=np.float32)
+        if normalize_embeddings and len(vetores):
+            vetores = vetores / np.clip(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12, None)
+        return vetores[0] if unico else vetores
@@ -1,35 +1,345 @@
-from typing import List, Dict, Optional
-import chromadb
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-import json
+from typing import List, Dict, Optional, Iterable, Tuple
+import copy
+from contextlib import contextmanager
 import os
+import threading
 from datetime import datetime
 import hashlib
+import numpy as np
+from .armazenamento_vetorial import copiar_armazenamento, criar_armazenamento
+from .cache_consultas import CacheEmbeddingsConsulta
+from .cache_embeddings import CacheEmbeddings
+from .cache_extracao import calcular_hash_arquivo
+from .compressao_contexto import comprimir_sentencas
+from .controle_documentos import ControleDocumentos, contar_paginas
+from .facetas import extrair_facetas, montar_filtro
+from .indice_codigos import IndiceCodigos, distribuir_por_codigo, extrair_codigos
+from .indice_lexico import IndiceBM25
+from .modelos import (
+    MODELO_EMBEDDINGS_PADRAO, TAMANHO_LOTE_EMBEDDINGS, FuncaoEmbeddingCompartilhada, GeradorEmbeddings
+)
+from .orcamento_tokens import contar_tokens
+from .selecao_contexto import NUM_MAXIMO_CONTEXTO, selecionar_contexto
+from .versoes_base import (
+    VersaoBase, ativar_versao, diretorio_versao, ler_alteracoes, ler_versao_atual, listar_versoes,
+    preparar_versao, registrar_alteracao, remover_versoes_antigas, trava_escrita
+)
 
 class BaseConhecimento:
-    """Gerencia o armazenamento e recuperação de documentos usando ChromaDB."""
+    """Gerencia o armazenamento e recuperação de documentos (ChromaDB ou índice NumPy)."""
     
-    def __init__(self, diretorio_persistencia: str = ".chromadb"):
+    def __init__(self, diretorio_persistencia: str = ".chromadb", nome_modelo: str = MODELO_EMBEDDINGS_PADRAO,
+                 tamanho_lote_embeddings: int = TAMANHO_LOTE_EMBEDDINGS,
+                 num_threads_embeddings: Optional[int] = None,
+                 diretorio_cache_embeddings: Optional[str] = ".cache_embeddings",
+                 backend_embeddings: str = "torch",
+                 capacidade_cache_consultas: int = 1024,
+                 ttl_cache_consultas: Optional[float] = 3600,
+                 arquivo_cache_consultas: Optional[str] = None,
+                 backend_vetorial: str = "chroma"):
         """
-        Inicializa a base de conhecimento com ChromaDB.
+        Inicializa a base de conhecimento.
         
         Args:
             diretorio_persistencia: Diretório para persistir o banco de dados vetorial
+            nome_modelo: Modelo de embeddings (carregado sob demanda pelo registro compartilhado)
+            tamanho_lote_embeddings: Textos por micro-lote na geração de embeddings da ingestão
+            num_threads_embeddings: Threads de CPU do modelo na ingestão (None mantém o padrão)
+            diretorio_cache_embeddings: Cache persistente de embeddings por texto (None desativa)
+            backend_embeddings: "torch" (PyTorch), "onnx" (ONNX Runtime) ou "onnx-int8"
+                (ONNX Runtime com quantização dinâmica int8)
+            capacidade_cache_consultas: Consultas guardadas no cache LRU de embeddings
+            ttl_cache_consultas: Validade, em segundos, de cada embedding de consulta
+            arquivo_cache_consultas: Arquivo .npz para manter o cache entre reinícios (opcional)
+            backend_vetorial: "chroma" (coleção do ChromaDB, busca aproximada HNSW) ou
+                "numpy" (índice plano exato em matriz float16 mapeada em memória)
         """
         self.diretorio_persistencia = diretorio_persistencia
-        self.client = chromadb.PersistentClient(
-            path=diretorio_persistencia
+        self.nome_modelo = nome_modelo
+        self.backend_vetorial = backend_vetorial
+        self.backend_embeddings = backend_embeddings
+        self.embedding_function = FuncaoEmbeddingCompartilhada(nome_modelo, backend_embeddings)
+        
+        # Vetores de backends diferentes (ex.: int8) não são misturados no cache
+        nome_cache = nome_modelo if backend_embeddings == "torch" else f"{nome_modelo}-{backend_embeddings}"
+        self.gerador_embeddings = GeradorEmbeddings(
+            nome_modelo,
+            tamanho_lote=tamanho_lote_embeddings,
+            num_threads=num_threads_embeddings,
+            cache=CacheEmbeddings(diretorio_cache_embeddings, nome_cache) if diretorio_cache_embeddings else None,
+            backend=backend_embeddings
         )
-        self.embedding_function = SentenceTransformerEmbeddingFunction(model_name='distiluse-base-multilingual-cased-v2')
-        self.collection = self.client.get_or_create_collection(
-            "documentos_sebrae",
-            embedding_function=self.embedding_function
+        self.cache_consultas = CacheEmbeddingsConsulta(
+            capacidade=capacidade_cache_consultas,
+            ttl_segundos=ttl_cache_consultas,
+            arquivo=arquivo_cache_consultas
         )
         
-        # Arquivo de controle de documentos processados
-        self.arquivo_controle = os.path.join(diretorio_persistencia, "documentos_processados.json")
-        self.documentos_processados = self._carregar_controle()
+        # Versão ativa da base (ver versoes_base); uma reconstrução grava em
+        # outra versão e troca a referência só ao final
+        self._trava_versao = threading.Lock()
+        self._trava_reconstrucao = threading.Lock()
+        self._versao_fixa = False
+        self.versao = self._abrir_versao(ler_versao_atual(diretorio_persistencia))
+    
+    def _abrir_versao(self, nome: Optional[str]) -> VersaoBase:
+        """Abre (ou cria) os armazenamentos de uma versão da base."""
+        diretorio = diretorio_versao(self.diretorio_persistencia, nome)
+        collection = criar_armazenamento(self.backend_vetorial, diretorio, self.embedding_function)
+        
+        # Controle transacional de documentos processados (importa o JSON antigo, se houver)
+        controle = ControleDocumentos(
+            os.path.join(diretorio, "controle_documentos.sqlite3"),
+            arquivo_json_legado=os.path.join(diretorio, "documentos_processados.json")
+        )
+        
+        # Troca de backend: aproveita os chunks já gravados na coleção do ChromaDB
+        if self.backend_vetorial != "chroma" and not collection.count() and len(controle) \
+                and os.path.exists(os.path.join(diretorio, "chroma.sqlite3")):
+            print(f"📦 Copiando chunks do ChromaDB para o backend {self.backend_vetorial}...")
+            origem = criar_armazenamento("chroma", diretorio, self.embedding_function)
+            copiados = copiar_armazenamento(origem, collection)
+            origem.fechar()
+            print(f"✅ {copiados} chunks copiados")
+        
+        # Índices lexical (BM25) e de códigos de produto, mantidos junto com a coleção
+        versao = VersaoBase(nome, diretorio, collection, controle,
+                            IndiceBM25(os.path.join(diretorio, "indice_bm25.sqlite3")),
+                            IndiceCodigos(os.path.join(diretorio, "indice_codigos.sqlite3")))
+        if not len(versao.indice_lexico) and collection.count():
+            self.reconstruir_indice_lexico(versao=versao)
+        if not versao.indice_codigos.construido and collection.count():
+            self.reconstruir_indice_codigos(versao=versao)
+        return versao
+    
+    @property
+    def collection(self):
+        """Armazenamento vetorial da versão ativa."""
+        return self.versao.collection
+    
+    @property
+    def controle(self) -> ControleDocumentos:
+        """Controle de documentos processados da versão ativa."""
+        return self.versao.controle
+    
+    @property
+    def documentos_processados(self) -> ControleDocumentos:
+        return self.versao.controle
+    
+    @property
+    def indice_lexico(self) -> IndiceBM25:
+        """Índice lexical da versão ativa."""
+        return self.versao.indice_lexico
+    
+    @property
+    def indice_codigos(self) -> IndiceCodigos:
+        """Índice de códigos de produto da versão ativa."""
+        return self.versao.indice_codigos
+    
+    @property
+    def arquivo_controle(self) -> str:
+        return self.versao.controle.caminho_banco
+    
+    def _atualizar_versao(self):
+        """Passa para a versão ativa se outro processo a trocou, fechando a anterior."""
+        if self._versao_fixa:
+            return
+        nome = ler_versao_atual(self.diretorio_persistencia)
+        if nome != self.versao.nome:
+            with self._trava_versao:
+                if nome != self.versao.nome:
+                    print(f"🔀 Usando a versão {nome} da base")
+                    anterior, self.versao = self.versao, self._abrir_versao(nome)
+                    anterior.fechar()
+    
+    @contextmanager
+    def _versao_consulta(self):
+        """
+        Fornece a versão usada por uma consulta do início ao fim, passando antes
+        para a versão ativa se outro processo a trocou. Uma versão substituída
+        só é fechada depois que as consultas que a usam terminam.
+        """
+        self._atualizar_versao()
+        with self._trava_versao:
+            versao = self.versao
+            versao.reter()
+        try:
+            yield versao
+        finally:
+            versao.liberar()
+    
+    @contextmanager
+    def _versao_escrita(self, caminho_arquivo: str, removido: bool = False):
+        """
+        Envolve uma escrita incremental de um arquivo na versão ativa.
+        
+        A trava de escrita compartilhada impede que a versão seja trocada no
+        meio da escrita; se houver uma reconstrução em andamento (neste ou em
+        outro processo), o arquivo é anotado para ser reaplicado na nova versão
+        antes da troca. As escritas da própria reconstrução não passam por aqui.
+        
+        Args:
+            caminho_arquivo: Caminho do arquivo alterado
+            removido: O arquivo está sendo removido da base
+        """
+        if self._versao_fixa:
+            yield
+            return
+        with trava_escrita(self.diretorio_persistencia):
+            self._atualizar_versao()
+            registrar_alteracao(self.diretorio_persistencia, caminho_arquivo, removido)
+            yield
+    
+    @contextmanager
+    def versao_ingestao(self):
+        """
+        Fixa a versão ativa durante uma ingestão de diretório.
         
+        A trava de escrita compartilhada fica com o job do início ao fim, então
+        a versão não é trocada nem fechada entre um arquivo e outro: chunks,
+        controle e checkpoints do job ficam sempre na mesma versão. Uma
+        reconstrução iniciada nesse meio tempo espera o fim do job para criar
+        ou ativar a nova versão.
+        
+        Yields:
+            Versão em que o job grava
+        """
+        if self._versao_fixa:
+            yield self.versao
+            return
+        with trava_escrita(self.diretorio_persistencia):
+            self._atualizar_versao()
+            yield self.versao
+    
+    def reconstruir(self, diretorio_documentos: str, processador, versoes_mantidas: int = 1) -> Dict:
+        """
+        Reconstrói a base inteira em uma nova versão, sem interromper as consultas.
+        
+        Os documentos são indexados em um diretório de versão separado (os
+        embeddings já calculados vêm do cache persistente) enquanto as consultas
+        continuam na versão ativa. Arquivos indexados ou removidos na versão
+        ativa nesse meio tempo (monitor, API, outro processo) são reaplicados
+        na nova versão. Ao final, o ponteiro da versão ativa é trocado de forma
+        atômica, a versão anterior é fechada e as versões antigas que nenhum
+        processo usa são apagadas. Uma reconstrução interrompida é retomada na
+        próxima chamada.
+        
+        Args:
+            diretorio_documentos: Diretório com os documentos
+            processador: Instância de ProcessadorDocumentos
+            versoes_mantidas: Versões anteriores à nova que são mantidas em disco
+            
+        Returns:
+            Dicionário com a versão criada, total de chunks e versões removidas
+            
+        Raises:
+            RuntimeError: Se já houver uma reconstrução em andamento
+        """
+        if not self._trava_reconstrucao.acquire(blocking=False):
+            raise RuntimeError("Já existe uma reconstrução da base em andamento")
+        try:
+            # Com a trava exclusiva, uma escrita incremental ou termina antes da
+            # criação da versão (e a construção lê o arquivo já alterado) ou é anotada nela
+            with trava_escrita(self.diretorio_persistencia, exclusiva=True):
+                nome = preparar_versao(self.diretorio_persistencia)
+            print(f"🏗️ Reconstruindo a base na versão {nome} (consultas seguem na versão atual)...")
+            
+            # Mesma configuração e mesmo gerador de embeddings, gravando na nova versão
+            construtora = copy.copy(self)
+            construtora._versao_fixa = True
+            construtora.versao = self._abrir_versao(nome)
+            try:
+                processador.indexar_diretorio(diretorio_documentos, construtora)
+                posicao = self._reaplicar_alteracoes(construtora, processador)
+                
+                # Últimas alterações e troca sem escritas em andamento
+                with trava_escrita(self.diretorio_persistencia, exclusiva=True):
+                    self._reaplicar_alteracoes(construtora, processador, posicao)
+                    total_chunks = construtora.collection.count()
+                    ativar_versao(self.diretorio_persistencia, nome, {
+                        "total_chunks": total_chunks,
+                        "total_arquivos": len(construtora.controle)
+                    })
+                    with self._trava_versao:
+                        anterior, self.versao = self.versao, construtora.versao
+            except BaseException:
+                construtora.versao.fechar()
+                raise
+            
+            anterior.fechar()
+            removidas = remover_versoes_antigas(self.diretorio_persistencia, versoes_mantidas)
+            print(f"✅ Versão {nome} ativa: {total_chunks} chunks"
+                  + (f" ({len(removidas)} versões antigas removidas)" if removidas else ""))
+            
+            return {"versao": nome, "total_chunks": total_chunks, "versoes_removidas": removidas}
+        finally:
+            self._trava_reconstrucao.release()
+    
+    def _reaplicar_alteracoes(self, construtora: "BaseConhecimento", processador, posicao: int = 0) -> int:
+        """
+        Reaplica na versão em construção os arquivos alterados ou removidos na
+        versão ativa durante a construção (ver versoes_base.registrar_alteracao).
+        
+        Args:
+            construtora: Base gravando na versão em construção
+            processador: Instância de ProcessadorDocumentos
+            posicao: Posição do registro de alterações já reaplicada
+            
+        Returns:
+            Nova posição do registro de alterações
+        """
+        while True:
+            alteracoes, posicao = ler_alteracoes(self.diretorio_persistencia, construtora.versao.nome, posicao)
+            if not alteracoes:
+                return posicao
+            print(f"🔁 Reaplicando {len(alteracoes)} arquivos alterados durante a reconstrução...")
+            for caminho, removido in alteracoes.items():
+                if removido or not os.path.exists(caminho):
+                    if caminho in construtora.controle:
+                        construtora.remover_arquivo(caminho)
+                elif not construtora.arquivo_ja_processado(caminho):
+                    try:
+                        processador.indexar_arquivo(caminho, construtora)
+                    except Exception as e:
+                        print(f"⚠️ {os.path.basename(caminho)} não foi reindexado na nova versão: {e}")
+    
+    def listar_versoes(self) -> List[Dict]:
+        """Lista as versões da base em disco (ver versoes_base.listar_versoes)."""
+        return listar_versoes(self.diretorio_persistencia)
+        
+    def reconstruir_indice_lexico(self, tamanho_pagina: int = 1000, versao: Optional[VersaoBase] = None):
+        """
+        Reconstrói o índice BM25 a partir dos chunks já gravados na coleção.
+        
+        Args:
+            tamanho_pagina: Chunks lidos da coleção por vez
+            versao: Versão da base (padrão: a ativa)
+        """
+        versao = versao or self.versao
+        print("🔤 Construindo índice lexical (BM25) a partir da coleção...")
+        versao.indice_lexico.limpar()
+        total = versao.collection.count()
+        for inicio in range(0, total, tamanho_pagina):
+            pagina = versao.collection.get(offset=inicio, limit=tamanho_pagina, include=["documents"])
+            versao.indice_lexico.indexar(pagina["ids"], pagina["documents"])
+        print(f"✅ Índice lexical pronto: {len(versao.indice_lexico)} chunks")
+    
+    def reconstruir_indice_codigos(self, tamanho_pagina: int = 1000, versao: Optional[VersaoBase] = None):
+        """
+        Reconstrói o índice de códigos de produto a partir dos chunks já gravados na coleção.
+        
+        Args:
+            tamanho_pagina: Chunks lidos da coleção por vez
+            versao: Versão da base (padrão: a ativa)
+        """
+        versao = versao or self.versao
+        print("🏷️ Construindo índice de códigos de produto a partir da coleção...")
+        versao.indice_codigos.limpar()
+        total = versao.collection.count()
+        for inicio in range(0, total, tamanho_pagina):
+            pagina = versao.collection.get(offset=inicio, limit=tamanho_pagina, include=["documents", "metadatas"])
+            versao.indice_codigos.indexar(pagina["ids"], pagina["documents"], pagina["metadatas"])
+    
     def adicionar_documentos(self, documentos: List[Dict[str, any]]):
         """
         Adiciona chunks de documentos à base de conhecimento.
@@ -37,40 +347,177 @@ class BaseConhecimento:
         Args:
             documentos: Lista de chunks de documentos com metadados
         """
-        import hashlib
-
         textos = [doc["texto"] for doc in documentos]
-        metadados = [doc["metadados"] for doc in documentos]
-        
-        # Gera IDs únicos para cada chunk usando um hash do caminho e do ID do chunk
-        ids = [
-            hashlib.sha256(
-                f"{meta['caminho']}_{meta['chunk_id']}".encode()
-            ).hexdigest()
-            for meta in metadados
-        ]
+        metadados = [self._preparar_metadados(doc) for doc in documentos]
+        ids = [self._gerar_id_chunk(meta) for meta in metadados]
         
+        self.gerador_embeddings.reiniciar_contadores()
         self.collection.add(
             documents=textos,
+            embeddings=self.gerador_embeddings.gerar(textos),
             metadatas=metadados,
             ids=ids
         )
+        self.indice_lexico.indexar(ids, textos)
+        self.indice_codigos.indexar(ids, textos, metadados)
+        self.exibir_desempenho_embeddings()
+    
+    def exibir_desempenho_embeddings(self):
+        """Exibe a taxa de geração de embeddings acumulada pela etapa de ingestão."""
+        desempenho = self.gerador_embeddings.desempenho()
+        if desempenho["chunks"]:
+            print(f"⚡ Embeddings: {desempenho['chunks']} chunks em {desempenho['segundos']:.1f}s "
+                  f"({desempenho['chunks_por_segundo']:.1f} chunks/s, "
+                  f"{desempenho['acertos_cache']} do cache)")
+    
+    @staticmethod
+    def _gerar_id_chunk(metadados: Dict) -> str:
+        """Gera o ID único do chunk usando um hash do caminho e do ID do chunk."""
+        return hashlib.sha256(
+            f"{metadados['caminho']}_{metadados['chunk_id']}".encode()
+        ).hexdigest()
+    
+    @staticmethod
+    def _preparar_metadados(documento: Dict[str, any]) -> Dict:
+        """Copia os metadados do chunk acrescentando o hash e o número de tokens do seu texto."""
+        metadados = dict(documento["metadados"])
+        metadados["hash_chunk"] = hashlib.sha256(documento["texto"].encode()).hexdigest()
+        metadados["num_tokens"] = contar_tokens(documento["texto"])
+        return metadados
+    
+    def reindexar_arquivo(self, documentos: List[Dict[str, any]], caminho_arquivo: str) -> Dict[str, int]:
+        """
+        Atualiza na base os chunks de um arquivo, gerando embeddings apenas
+        para os chunks cujo texto mudou.
+        
+        Args:
+            documentos: Lista completa de chunks do arquivo
+            caminho_arquivo: Caminho do arquivo de origem
+            
+        Returns:
+            Contadores da reindexação (ver reindexar_arquivo_em_lotes)
+        """
+        return self.reindexar_arquivo_em_lotes([documentos], caminho_arquivo)
+    
+    def reindexar_arquivo_em_lotes(self, lotes: Iterable[List[Dict[str, any]]], caminho_arquivo: str) -> Dict[str, int]:
+        """
+        Atualiza na base os chunks de um arquivo recebidos em lotes.
+        
+        Cada chunk é comparado, pelo hash do texto, com os chunks já gravados
+        para o mesmo caminho:
+        - texto igual na mesma posição: mantém o embedding (só os metadados são atualizados);
+        - texto que já existia em outra posição: reaproveita o embedding existente;
+        - texto novo: gera o embedding (em micro-lotes ordenados por tamanho).
+        Chunks antigos que não existem mais na nova versão são removidos, o que
+        só acontece depois que todos os lotes foram recebidos: se a iteração dos
+        lotes levantar uma exceção (extração interrompida), ela é propagada sem
+        remover nada, e os chunks das posições não lidas continuam na base.
+        
+        Args:
+            lotes: Lotes consecutivos de chunks do arquivo, na ordem de chunk_id
+            caminho_arquivo: Caminho do arquivo de origem
+            
+        Returns:
+            Dicionário com quantidades de chunks inalterados, reaproveitados,
+            embedados e removidos
+        """
+        with self._versao_escrita(caminho_arquivo):
+            existentes = self.collection.get(
+                where={"caminho": caminho_arquivo},
+                include=["metadatas", "embeddings"]
+            )
+            metadados_existentes = dict(zip(existentes["ids"], existentes["metadatas"]))
+            embeddings_existentes = {}
+            if existentes.get("embeddings") is not None:
+                embeddings_existentes = dict(zip(existentes["ids"], existentes["embeddings"]))
+            id_por_hash = {
+                meta.get("hash_chunk"): chunk_id
+                for chunk_id, meta in metadados_existentes.items()
+                if meta.get("hash_chunk")
+            }
+            
+            contadores = {"inalterados": 0, "reaproveitados": 0, "embedados": 0, "removidos": 0}
+            ids_atuais = set()
+            
+            for lote in lotes:
+                atualizar = {"ids": [], "metadatas": []}
+                reaproveitar = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+                embedar = {"ids": [], "documents": [], "metadatas": []}
+                
+                for documento in lote:
+                    metadados = self._preparar_metadados(documento)
+                    chunk_id = self._gerar_id_chunk(metadados)
+                    ids_atuais.add(chunk_id)
+                    hash_chunk = metadados["hash_chunk"]
+                    anterior = metadados_existentes.get(chunk_id)
+                    
+                    if anterior is not None and anterior.get("hash_chunk") == hash_chunk:
+                        contadores["inalterados"] += 1
+                        if anterior != metadados:
+                            atualizar["ids"].append(chunk_id)
+                            atualizar["metadatas"].append(metadados)
+                    elif hash_chunk in id_por_hash and id_por_hash[hash_chunk] in embeddings_existentes:
+                        contadores["reaproveitados"] += 1
+                        reaproveitar["ids"].append(chunk_id)
+                        reaproveitar["documents"].append(documento["texto"])
+                        reaproveitar["metadatas"].append(metadados)
+                        reaproveitar["embeddings"].append(list(embeddings_existentes[id_por_hash[hash_chunk]]))
+                    else:
+                        contadores["embedados"] += 1
+                        embedar["ids"].append(chunk_id)
+                        embedar["documents"].append(documento["texto"])
+                        embedar["metadatas"].append(metadados)
+                
+                if atualizar["ids"]:
+                    self.collection.update(**atualizar)
+                if reaproveitar["ids"]:
+                    self.collection.upsert(**reaproveitar)
+                    self.indice_lexico.indexar(reaproveitar["ids"], reaproveitar["documents"])
+                    self.indice_codigos.indexar(
+                        reaproveitar["ids"], reaproveitar["documents"], reaproveitar["metadatas"]
+                    )
+                if embedar["ids"]:
+                    embedar["embeddings"] = self.gerador_embeddings.gerar(embedar["documents"])
+                    self.collection.upsert(**embedar)
+                    self.indice_lexico.indexar(embedar["ids"], embedar["documents"])
+                    self.indice_codigos.indexar(embedar["ids"], embedar["documents"], embedar["metadatas"])
+            
+            obsoletos = [chunk_id for chunk_id in metadados_existentes if chunk_id not in ids_atuais]
+            if obsoletos:
+                self.collection.delete(ids=obsoletos)
+                self.indice_lexico.remover(obsoletos)
+                self.indice_codigos.remover(obsoletos)
+                contadores["removidos"] = len(obsoletos)
+            
+            return contadores
+    
+    def _embeddings_consultas(self, consultas: List[str]) -> np.ndarray:
+        """Gera (ou lê do cache) os embeddings de uma ou mais consultas, em um único lote."""
+        return self.cache_consultas.obter(
+            f"{self.nome_modelo}@{self.backend_embeddings}",
+            consultas,
+            lambda textos: np.asarray(self.embedding_function(textos), dtype=np.float32)
+        )
     
-    def buscar(self, consulta: str, num_resultados: int = 3) -> List[Dict]:
+    def buscar(self, consulta: str, num_resultados: int = 3, filtros: Optional[Dict] = None) -> List[Dict]:
         """
         Busca documentos relevantes na base de conhecimento.
         
         Args:
             consulta: A consulta de busca
             num_resultados: Número de resultados a retornar
+            filtros: Facetas para restringir a busca (ex.: {"tipo_documento": "FT",
+                "categoria": "Gestão_do_Cliente"}); ver facetas.montar_filtro
             
         Returns:
             Lista de documentos relevantes com metadados
         """
-        resultados = self.collection.query(
-            query_texts=[consulta],
-            n_results=num_resultados
-        )
+        with self._versao_consulta() as versao:
+            resultados = versao.collection.query(
+                query_embeddings=self._embeddings_consultas([consulta]).tolist(),
+                n_results=num_resultados,
+                where=montar_filtro(filtros)
+            )
         
         documentos = []
         for i in range(len(resultados['documents'][0])):
@@ -82,6 +529,205 @@ class BaseConhecimento:
         
         return documentos
     
+    def buscar_por_codigo(self, consulta: str, num_resultados: int = 8,
+                          filtros: Optional[Dict] = None) -> List[Dict]:
+        """
+        Busca exata pelos códigos de produto citados na consulta (ex.: "GQ13029-3").
+        
+        Os chunks vêm do índice de códigos, sem embedding da consulta e sem
+        busca vetorial. Só entram chunks de arquivos cujo nome traz o código
+        (o produto em si): um código apenas citado no texto de outro documento
+        não ativa a busca exata. O limite é repartido entre os códigos da
+        consulta, para que uma comparação entre produtos traga todos eles.
+        
+        Args:
+            consulta: Texto da consulta
+            num_resultados: Número máximo de chunks
+            filtros: Facetas para restringir a busca (ver buscar)
+            
+        Returns:
+            Lista de documentos com metadados e distância 0 (vazia se a consulta
+            não cita nenhum código indexado)
+        """
+        codigos = extrair_codigos(consulta)
+        if not codigos:
+            return []
+        
+        with self._versao_consulta() as versao:
+            listas = versao.indice_codigos.buscar_por_codigo(codigos, somente_nome=True)
+            if filtros:
+                # Aplica as facetas antes de repartir o limite entre os códigos
+                candidatos = list({chunk_id for lista in listas for chunk_id in lista})
+                permitidos = set(versao.collection.get(
+                    ids=candidatos, where=montar_filtro(filtros), include=[]
+                )["ids"]) if candidatos else set()
+                listas = [[chunk_id for chunk_id in lista if chunk_id in permitidos] for lista in listas]
+            ids = distribuir_por_codigo(listas, num_resultados)
+            if not ids:
+                return []
+            
+            encontrados = versao.collection.get(ids=ids, include=["documents", "metadatas"])
+            por_id = dict(zip(encontrados["ids"], zip(encontrados["documents"], encontrados["metadatas"])))
+            
+            return [
+                {"texto": por_id[chunk_id][0], "metadados": por_id[chunk_id][1], "distancia": 0.0}
+                for chunk_id in ids if chunk_id in por_id
+            ][:num_resultados]
+    
+    def buscar_hibrido(self, consulta: str, num_resultados: int = 3, num_candidatos: int = 20,
+                       k_rrf: int = 60, filtros: Optional[Dict] = None,
+                       incluir_embeddings: bool = False,
+                       embedding_consulta: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        Busca combinando o índice lexical BM25 e a busca vetorial.
+        
+        As duas listas de candidatos são fundidas por reciprocal-rank fusion
+        (pontuação = soma de 1 / (k_rrf + posição) em cada lista), o que
+        favorece chunks bem posicionados em qualquer uma delas sem depender da
+        escala das pontuações.
+        
+        Args:
+            consulta: A consulta de busca
+            num_resultados: Número de resultados a retornar
+            num_candidatos: Candidatos considerados de cada lista
+            k_rrf: Constante de suavização da fusão
+            filtros: Facetas para restringir a busca (ver buscar)
+            incluir_embeddings: Inclui o embedding de cada chunk (chave "embedding")
+            embedding_consulta: Embedding da consulta já calculado (padrão: gerado
+                ou lido do cache de consultas)
+            
+        Returns:
+            Lista de documentos relevantes com metadados, distância e pontuação da fusão
+        """
+        with self._versao_consulta() as versao:
+            filtro = montar_filtro(filtros)
+            if embedding_consulta is None:
+                embedding_consulta = self._embeddings_consultas([consulta])[0]
+            vetoriais = versao.collection.query(
+                query_embeddings=[embedding_consulta.tolist()],
+                n_results=num_candidatos,
+                where=filtro,
+                include=["documents", "metadatas", "distances"] + (["embeddings"] if incluir_embeddings else [])
+            )
+            lexicais = versao.indice_lexico.buscar(consulta, num_candidatos)
+            if filtro and lexicais:
+                permitidos = set(versao.collection.get(
+                    ids=[chunk_id for chunk_id, _ in lexicais], where=filtro, include=[]
+                )["ids"])
+                lexicais = [(chunk_id, pontuacao) for chunk_id, pontuacao in lexicais if chunk_id in permitidos]
+            
+            encontrados = {}
+            pontuacoes = {}
+            for posicao, chunk_id in enumerate(vetoriais["ids"][0]):
+                encontrados[chunk_id] = {
+                    "texto": vetoriais["documents"][0][posicao],
+                    "metadados": vetoriais["metadatas"][0][posicao],
+                    "distancia": vetoriais["distances"][0][posicao]
+                }
+                if incluir_embeddings:
+                    encontrados[chunk_id]["embedding"] = vetoriais["embeddings"][0][posicao]
+                pontuacoes[chunk_id] = 1.0 / (k_rrf + posicao + 1)
+            for posicao, (chunk_id, _) in enumerate(lexicais):
+                pontuacoes[chunk_id] = pontuacoes.get(chunk_id, 0.0) + 1.0 / (k_rrf + posicao + 1)
+            
+            melhores = sorted(pontuacoes, key=pontuacoes.get, reverse=True)[:num_resultados]
+            
+            # Chunks encontrados só pelo BM25: busca texto e vetor para calcular a distância
+            faltantes = [chunk_id for chunk_id in melhores if chunk_id not in encontrados]
+            if faltantes:
+                extras = versao.collection.get(ids=faltantes, include=["documents", "metadatas", "embeddings"])
+                for chunk_id, texto, metadados, embedding in zip(
+                    extras["ids"], extras["documents"], extras["metadatas"], extras["embeddings"]
+                ):
+                    # Mesma métrica padrão da coleção (L2 ao quadrado)
+                    diferenca = np.asarray(embedding, dtype=np.float32) - embedding_consulta
+                    encontrados[chunk_id] = {
+                        "texto": texto,
+                        "metadados": metadados,
+                        "distancia": float(diferenca @ diferenca)
+                    }
+                    if incluir_embeddings:
+                        encontrados[chunk_id]["embedding"] = embedding
+            
+            return [
+                {**encontrados[chunk_id], "pontuacao_rrf": pontuacoes[chunk_id]}
+                for chunk_id in melhores if chunk_id in encontrados
+            ]
+    
+    def buscar_contexto(self, consulta: str, num_maximo: int = NUM_MAXIMO_CONTEXTO,
+                        num_candidatos: int = 16, filtros: Optional[Dict] = None,
+                        **parametros_selecao) -> Tuple[List[Dict], Dict]:
+        """
+        Busca os chunks do contexto do LLM: busca híbrida seguida da seleção
+        adaptativa (corte por relevância, remoção de quase duplicatas e MMR).
+        
+        A seleção usa os embeddings retornados pela busca e o mesmo embedding
+        da consulta usado nela, calculado uma única vez.
+        
+        Args:
+            consulta: A consulta de busca
+            num_maximo: Número máximo de chunks no contexto
+            num_candidatos: Candidatos da busca híbrida submetidos à seleção
+            filtros: Facetas para restringir a busca (ver buscar)
+            **parametros_selecao: Parâmetros de selecao_contexto.selecionar_contexto
+            
+        Returns:
+            Tupla (chunks selecionados, resumo da seleção)
+        """
+        embedding_consulta = self._embeddings_consultas([consulta])[0]
+        candidatos = self.buscar_hibrido(
+            consulta, num_resultados=num_candidatos, filtros=filtros, incluir_embeddings=True,
+            embedding_consulta=embedding_consulta
+        )
+        return selecionar_contexto(
+            candidatos, embedding_consulta, num_maximo=num_maximo, **parametros_selecao
+        )
+    
+    def comprimir_contexto(self, consulta: str, documentos: List[Dict], **parametros) -> Tuple[List[Dict], Dict]:
+        """
+        Comprime os chunks do contexto, mantendo as sentenças relevantes para a consulta.
+        
+        O embedding da consulta vem do cache de consultas; os das sentenças são
+        gerados em um único lote pela função de embeddings das consultas, sem
+        passar pelo gerador da ingestão (sentenças não entram no cache
+        persistente nem nos contadores da ingestão).
+        
+        Args:
+            consulta: A consulta usada na busca
+            documentos: Chunks do contexto
+            **parametros: Parâmetros de compressao_contexto.comprimir_sentencas
+            
+        Returns:
+            Tupla (chunks comprimidos, resumo da compressão)
+        """
+        return comprimir_sentencas(
+            documentos, self._embeddings_consultas([consulta])[0],
+            lambda textos: np.asarray(self.embedding_function(textos), dtype=np.float32), **parametros
+        )
+    
+    def atualizar_facetas(self) -> int:
+        """
+        Grava as facetas nos metadados de chunks indexados antes de elas existirem.
+        
+        Apenas os metadados são atualizados; nenhum embedding é recalculado.
+        
+        Returns:
+            Número de chunks atualizados
+        """
+        atualizados = 0
+        for caminho in self.controle.keys():
+            existentes = self.collection.get(where={"caminho": caminho}, include=["metadatas"])
+            facetas = extrair_facetas(caminho)
+            ids, metadados = [], []
+            for chunk_id, meta in zip(existentes["ids"], existentes["metadatas"]):
+                if any(meta.get(campo) != valor for campo, valor in facetas.items()):
+                    ids.append(chunk_id)
+                    metadados.append({**meta, **facetas})
+            if ids:
+                self.collection.update(ids=ids, metadatas=metadados)
+                atualizados += len(ids)
+        return atualizados
+    
     def buscar_por_palavras_chave(self, palavras_chave: List[str], num_resultados: int = 3) -> List[Dict]:
         """
         Busca documentos por palavras-chave específicas.
@@ -100,11 +746,12 @@ class BaseConhecimento:
             ]
         }
         
-        resultados = self.collection.query(
-            query_texts=palavras_chave,
-            where=where_clause,
-            n_results=num_resultados
-        )
+        with self._versao_consulta() as versao:
+            resultados = versao.collection.query(
+                query_embeddings=self._embeddings_consultas(palavras_chave).tolist(),
+                where=where_clause,
+                n_results=num_resultados
+            )
         
         documentos = []
         for i in range(len(resultados['documents'][0])):
@@ -116,153 +763,193 @@ class BaseConhecimento:
         
         return documentos
     
-    def buscar_ampla(self, consulta: str, num_resultados: int = 10) -> List[Dict]:
+    def buscar_ampla(self, consulta: str, num_resultados: int = 10, max_termos: int = 3,
+                     resultados_por_termo: int = 5, filtros: Optional[Dict] = None) -> List[Dict]:
         """
         Realiza uma busca mais ampla usando diferentes estratégias quando a busca principal falha.
         
+        Os termos relevantes da consulta são buscados individualmente, mas em
+        uma única consulta em lote: um só lote de embeddings e uma só chamada
+        à coleção, qualquer que seja o número de termos.
+        
         Args:
             consulta: A consulta de busca
             num_resultados: Número de resultados a retornar
+            max_termos: Número máximo de termos da consulta buscados
+            resultados_por_termo: Resultados considerados para cada termo
+            filtros: Facetas para restringir a busca (ver buscar)
             
         Returns:
             Lista de documentos relevantes encontrados em busca ampla
         """
-        # Tenta busca com termos individuais da consulta
-        termos = consulta.lower().split()
-        termos_relevantes = [termo for termo in termos if len(termo) > 3]
-        
-        todos_resultados = []
-        ids_vistos = set()
+        # Termos individuais relevantes da consulta, sem repetição
+        termos = [termo for termo in consulta.lower().split() if len(termo) > 3]
+        termos = list(dict.fromkeys(termos))[:max_termos]
+        if not termos:
+            return []
         
-        # Busca por cada termo relevante individualmente
-        for termo in termos_relevantes[:3]:  # Limita a 3 termos para evitar muitas consultas
-            try:
-                resultados = self.collection.query(
-                    query_texts=[termo],
-                    n_results=5
+        try:
+            with self._versao_consulta() as versao:
+                resultados = versao.collection.query(
+                    query_embeddings=self._embeddings_consultas(termos).tolist(),
+                    n_results=resultados_por_termo,
+                    where=montar_filtro(filtros)
                 )
-                
-                for i in range(len(resultados['documents'][0])):
-                    doc_id = f"{resultados['metadatas'][0][i]['fonte']}_{resultados['metadatas'][0][i]['chunk_id']}"
-                    
-                    if doc_id not in ids_vistos:
-                        todos_resultados.append({
-                            "texto": resultados['documents'][0][i],
-                            "metadados": resultados['metadatas'][0][i],
-                            "distancia": resultados['distances'][0][i],
-                            "termo_busca": termo
-                        })
-                        ids_vistos.add(doc_id)
-                        
-            except Exception as e:
-                print(f"Erro na busca ampla com termo '{termo}': {e}")
-                continue
+        except Exception as e:
+            print(f"Erro na busca ampla com termos {termos}: {e}")
+            return []
+        
+        # Um chunk encontrado por vários termos fica com a menor distância
+        melhores = {}
+        for indice, termo in enumerate(termos):
+            for chunk_id, texto, metadados, distancia in zip(
+                resultados['ids'][indice],
+                resultados['documents'][indice],
+                resultados['metadatas'][indice],
+                resultados['distances'][indice]
+            ):
+                if chunk_id not in melhores or distancia < melhores[chunk_id]["distancia"]:
+                    melhores[chunk_id] = {
+                        "texto": texto,
+                        "metadados": metadados,
+                        "distancia": distancia,
+                        "termo_busca": termo
+                    }
         
         # Ordena por relevância (menor distância = mais relevante)
-        todos_resultados.sort(key=lambda x: x["distancia"])
+        todos_resultados = sorted(melhores.values(), key=lambda x: x["distancia"])
         
         return todos_resultados[:num_resultados]
     
-    def _carregar_controle(self) -> Dict:
+    def _calcular_hash_arquivo(self, caminho_arquivo: str) -> str:
         """
-        Carrega o arquivo de controle de documentos já processados.
+        Calcula hash MD5 de um arquivo para detectar modificações.
         
+        Args:
+            caminho_arquivo: Caminho do arquivo
+            
         Returns:
-            Dicionário com informações dos documentos processados
-        """
-        if os.path.exists(self.arquivo_controle):
-            try:
-                with open(self.arquivo_controle, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"⚠️ Erro ao carregar controle: {e}")
-                return {}
-        return {}
-    
-    def _salvar_controle(self):
-        """
-        Salva o arquivo de controle de documentos processados.
+            Hash MD5 do arquivo
         """
         try:
-            os.makedirs(self.diretorio_persistencia, exist_ok=True)
-            with open(self.arquivo_controle, 'w', encoding='utf-8') as f:
-                json.dump(self.documentos_processados, f, indent=2, ensure_ascii=False)
+            return calcular_hash_arquivo(caminho_arquivo)
         except Exception as e:
-            print(f"❌ Erro ao salvar controle: {e}")
+            print(f"❌ Erro ao calcular hash de {caminho_arquivo}: {e}")
+            return ""
     
-    def _calcular_hash_arquivo(self, caminho_arquivo: str) -> str:
+    @staticmethod
+    def _assinatura_arquivo(caminho_arquivo: str) -> Optional[Dict]:
         """
-        Calcula hash MD5 de um arquivo para detectar modificações.
+        Obtém tamanho, data de modificação e inode de um arquivo (uma chamada stat).
         
         Args:
             caminho_arquivo: Caminho do arquivo
             
         Returns:
-            Hash MD5 do arquivo
+            Dicionário com a assinatura do arquivo, ou None se ele não existir
         """
-        hash_md5 = hashlib.md5()
         try:
-            with open(caminho_arquivo, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
-        except Exception as e:
-            print(f"❌ Erro ao calcular hash de {caminho_arquivo}: {e}")
-            return ""
+            info = os.stat(caminho_arquivo)
+        except OSError:
+            return None
+        return {
+            "tamanho": info.st_size,
+            "mtime_ns": info.st_mtime_ns,
+            "inode": info.st_ino
+        }
     
     def arquivo_ja_processado(self, caminho_arquivo: str) -> bool:
         """
         Verifica se um arquivo já foi processado e não foi modificado.
         
+        Compara primeiro tamanho, data de modificação e inode gravados no
+        controle; o hash do conteúdo só é calculado quando essa assinatura
+        difere (ex.: arquivo tocado ou copiado sem mudança de conteúdo).
+        
         Args:
             caminho_arquivo: Caminho do arquivo a verificar
             
         Returns:
             True se o arquivo já foi processado e não foi modificado
         """
-        if caminho_arquivo not in self.documentos_processados:
+        registro = self.documentos_processados.get(caminho_arquivo)
+        if registro is None:
             return False
         
         # Verifica se o arquivo ainda existe
-        if not os.path.exists(caminho_arquivo):
+        assinatura = self._assinatura_arquivo(caminho_arquivo)
+        if assinatura is None:
             return False
         
-        # Verifica se o hash mudou (arquivo foi modificado)
+        if all(registro.get(campo) == valor for campo, valor in assinatura.items()):
+            return True
+        
+        # Assinatura diferente: verifica se o hash mudou (arquivo foi modificado)
         hash_atual = self._calcular_hash_arquivo(caminho_arquivo)
-        hash_salvo = self.documentos_processados[caminho_arquivo].get("hash", "")
+        if hash_atual != registro.get("hash", ""):
+            return False
         
-        return hash_atual == hash_salvo
+        # Conteúdo igual: atualiza a assinatura para evitar novo hash na próxima verificação
+        with self._versao_escrita(caminho_arquivo):
+            registro = self.documentos_processados.get(caminho_arquivo)
+            if registro is not None and registro.get("hash") == hash_atual:
+                self.documentos_processados[caminho_arquivo] = {**registro, **assinatura}
+        return True
     
-    def marcar_arquivo_processado(self, caminho_arquivo: str, num_chunks: int = 0):
+    def marcar_arquivo_processado(self, caminho_arquivo: str, num_chunks: int = 0, hash_arquivo: str = None):
         """
-        Marca um arquivo como processado no controle.
+        Marca um arquivo como processado no controle (e no catálogo de documentos).
         
         Args:
             caminho_arquivo: Caminho do arquivo processado
             num_chunks: Número de chunks gerados do arquivo
+            hash_arquivo: Hash do conteúdo, se já calculado
         """
-        self.documentos_processados[caminho_arquivo] = {
-            "hash": self._calcular_hash_arquivo(caminho_arquivo),
-            "data_processamento": datetime.now().isoformat(),
-            "num_chunks": num_chunks
-        }
-        self._salvar_controle()
+        with self._versao_escrita(caminho_arquivo):
+            self.documentos_processados[caminho_arquivo] = {
+                "hash": hash_arquivo or self._calcular_hash_arquivo(caminho_arquivo),
+                **(self._assinatura_arquivo(caminho_arquivo) or {}),
+                "data_processamento": datetime.now().isoformat(),
+                "num_chunks": num_chunks,
+                "paginas": contar_paginas(caminho_arquivo)
+            }
     
     def adicionar_documentos_incrementalmente(self, documentos: List[Dict[str, any]], caminho_arquivo: str = None):
         """
         Adiciona documentos de forma incremental, verificando se já foram processados.
         
+        Para indexar um arquivo a partir do disco, prefira
+        ProcessadorDocumentos.indexar_arquivo, que propaga os erros de extração.
+        
         Args:
             documentos: Lista de chunks de documentos com metadados
             caminho_arquivo: Caminho do arquivo de origem (opcional)
+            
+        Raises:
+            ValueError: Se a lista está vazia e o arquivo já tem chunks na base
+                (ex.: extração que falhou); os chunks existentes são mantidos
         """
         # Se foi fornecido um caminho e o arquivo já foi processado, pula
         if caminho_arquivo and self.arquivo_ja_processado(caminho_arquivo):
             print(f"⏭️ Arquivo já processado: {os.path.basename(caminho_arquivo)}")
             return
         
-        # Adiciona os documentos
-        self.adicionar_documentos(documentos)
+        # Lista vazia para um arquivo já indexado costuma ser uma extração que
+        # falhou (processar_arquivo retorna []): não apaga os chunks existentes
+        if caminho_arquivo and not documentos and \
+                self.collection.get(where={"caminho": caminho_arquivo}, limit=1, include=[])["ids"]:
+            raise ValueError(f"Nenhum chunk extraído de {os.path.basename(caminho_arquivo)}; "
+                             "chunks anteriores mantidos")
+        
+        # Atualiza os chunks do arquivo, gerando embeddings só para os que mudaram
+        if caminho_arquivo:
+            contadores = self.reindexar_arquivo(documentos, caminho_arquivo)
+            if contadores["inalterados"] or contadores["reaproveitados"] or contadores["removidos"]:
+                print(f"♻️ {os.path.basename(caminho_arquivo)}: {contadores['embedados']} chunks novos, "
+                      f"{contadores['inalterados'] + contadores['reaproveitados']} reaproveitados, "
+                      f"{contadores['removidos']} removidos")
+        else:
+            self.adicionar_documentos(documentos)
         
         # Marca como processado se foi fornecido o caminho
         if caminho_arquivo:
@@ -276,21 +963,53 @@ class BaseConhecimento:
         Returns:
             Dicionário com estatísticas
         """
-        total_documentos = self.collection.count()
-        arquivos_processados = len(self.documentos_processados)
+        with self._versao_consulta() as versao:
+            total_documentos = versao.collection.count()
+            resumo = versao.controle.estatisticas()
+            
+            return {
+                "total_chunks": total_documentos,
+                "total_arquivos": resumo["total_arquivos"],
+                "ultima_atualizacao": resumo["ultima_atualizacao"],
+                "backend_vetorial": self.backend_vetorial,
+                "versao": versao.nome,
+                "cache_consultas": self.cache_consultas.estatisticas(),
+                "arquivos": [
+                    {
+                        "caminho": caminho,
+                        "data": info.get("data_processamento", "N/A"),
+                        "chunks": info.get("num_chunks", 0)
+                    }
+                    for caminho, info in versao.controle.items()
+                ]
+            }
+    
+    def listar_documentos(self, filtros: Optional[Dict] = None, busca: Optional[str] = None,
+                          ordenar_por: str = "nome", decrescente: bool = False,
+                          limite: Optional[int] = None, deslocamento: int = 0) -> Dict:
+        """
+        Lista os documentos indexados a partir do catálogo da versão ativa.
         
-        return {
-            "total_chunks": total_documentos,
-            "total_arquivos": arquivos_processados,
-            "arquivos": [
-                {
-                    "caminho": caminho,
-                    "data": info.get("data_processamento", "N/A"),
-                    "chunks": info.get("num_chunks", 0)
-                }
-                for caminho, info in self.documentos_processados.items()
-            ]
-        }
+        Nenhum arquivo é lido: filtros, ordenação e paginação são feitos no
+        banco de controle (ver ControleDocumentos.listar_catalogo).
+        
+        Returns:
+            Dicionário com total e documentos da página
+        """
+        with self._versao_consulta() as versao:
+            return versao.controle.listar_catalogo(
+                filtros, busca, ordenar_por, decrescente, limite, deslocamento
+            )
+    
+    def resumo_documentos(self) -> Dict:
+        """
+        Retorna os totais do catálogo de documentos da versão ativa.
+        
+        Returns:
+            Dicionário com totais e contagens por categoria, tipo e extensão
+        """
+        with self._versao_consulta() as versao:
+            return versao.controle.resumo_catalogo()
     
     def limpar_base(self):
         """
@@ -298,43 +1017,51 @@ class BaseConhecimento:
         ⚠️ CUIDADO: Esta operação é irreversível!
         """
         try:
-            # Deleta a coleção
-            self.client.delete_collection("documentos_sebrae")
+            # Esvazia a coleção
+            self.collection.limpar()
             
-            # Recria a coleção
-            self.collection = self.client.get_or_create_collection(
-                "documentos_sebrae",
-                embedding_function=self.embedding_function
-            )
-            
-            # Limpa o controle
-            self.documentos_processados = {}
-            self._salvar_controle()
+            # Limpa o controle e o índice lexical
+            self.controle.limpar()
+            self.indice_lexico.limpar()
+            self.indice_codigos.limpar()
             
             print("✅ Base de conhecimento limpa com sucesso!")
             
         except Exception as e:
             print(f"❌ Erro ao limpar base: {e}")
     
-    def remover_arquivo(self, caminho_arquivo: str):
+    def remover_arquivo(self, caminho_arquivo: str) -> int:
         """
         Remove um arquivo específico da base de dados.
         
+        Apaga da coleção e do índice lexical todos os chunks cujo metadado
+        "caminho" é o do arquivo e retira o arquivo do controle; nenhum outro
+        documento é reprocessado.
+        
         Args:
             caminho_arquivo: Caminho do arquivo a remover
+            
+        Returns:
+            Número de chunks removidos
         """
         try:
-            # Remove do controle
-            if caminho_arquivo in self.documentos_processados:
-                del self.documentos_processados[caminho_arquivo]
-                self._salvar_controle()
+            with self._versao_escrita(caminho_arquivo, removido=True):
+                ids = self.collection.get(where={"caminho": caminho_arquivo}, include=[])["ids"]
+                if ids:
+                    self.collection.delete(ids=ids)
+                    self.indice_lexico.remover(ids)
+                    self.indice_codigos.remover(ids)
+                
+                registrado = caminho_arquivo in self.controle
+                if registrado:
+                    del self.controle[caminho_arquivo]
                 
-                # Nota: ChromaDB não tem uma maneira fácil de deletar por metadados
-                # Seria necessário reprocessar toda a base excluindo este arquivo
-                print(f"⚠️ Arquivo removido do controle: {caminho_arquivo}")
-                print("   Para remover completamente, reconstrua a base sem este arquivo")
-            else:
-                print(f"❌ Arquivo não encontrado no controle: {caminho_arquivo}")
+                if ids or registrado:
+                    print(f"🗑️ Arquivo removido da base: {os.path.basename(caminho_arquivo)} ({len(ids)} chunks)")
+                else:
+                    print(f"❌ Arquivo não encontrado no controle: {caminho_arquivo}")
+                return len(ids)
                 
         except Exception as e:
-            print(f"❌ Erro ao remover arquivo: {e}")
\ No newline at end of file
+            print(f"❌ Erro ao remover arquivo: {e}")
+            return 0
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+Cache LRU, com expiração, dos embeddings das consultas.
+
+Analistas repetem muito as mesmas perguntas; com o cache, uma consulta já vista
+não passa de novo pelo modelo de embeddings. As entradas são indexadas pelo
+texto normalizado da consulta e pelo modelo, e podem ser gravadas em disco para
+sobreviver a reinícios do servidor.
+"""
+
+import atexit
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalizar_consulta(consulta: str) -> str:
+    """Normaliza o texto da consulta (Unicode, caixa e espaços) para uso como chave."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", consulta)).strip().casefold()
+
+
+class CacheEmbeddingsConsulta:
+    """Cache LRU limitado de embeddings de consultas."""
+
+    def __init__(self, capacidade: int = 1024, ttl_segundos: Optional[float] = 3600,
+                 arquivo: Optional[str] = None):
+        """
+        Inicializa o cache.
+
+        Args:
+            capacidade: Número máximo de consultas guardadas
+            ttl_segundos: Validade de cada entrada (None = sem expiração)
+            arquivo: Arquivo .npz para persistir o cache entre execuções (opcional)
+        """
+        self.capacidade = max(1, capacidade)
+        self.ttl_segundos = ttl_segundos
+        self.arquivo = arquivo
+        self.acertos = 0
+        self.faltas = 0
+
+        self._entradas: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, float]]" = OrderedDict()
+        self._trava = threading.Lock()
+
+        if arquivo:
+            self._carregar()
+            atexit.register(self.salvar)
+
+    def _expirada(self, instante: float, agora: float) -> bool:
+        return self.ttl_segundos is not None and agora - instante > self.ttl_segundos
+
+    def obter(self, modelo: str, consultas: List[str],
+              gerar: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Retorna os embeddings das consultas, gerando em um único lote os que faltam.
+
+        Args:
+            modelo: Identificação do modelo (nome e backend)
+            consultas: Textos das consultas
+            gerar: Função que gera os embeddings de uma lista de textos
+
+        Returns:
+            Matriz com um embedding por consulta, na ordem recebida
+        """
+        agora = time.time()
+        chaves = [(modelo, normalizar_consulta(consulta)) for consulta in consultas]
+        vetores: List[Optional[np.ndarray]] = [None] * len(consultas)
+
+        with self._trava:
+            for posicao, chave in enumerate(chaves):
+                entrada = self._entradas.get(chave)
+                if entrada is not None and not self._expirada(entrada[1], agora):
+                    self._entradas.move_to_end(chave)
+                    vetores[posicao] = entrada[0]
+                    self.acertos += 1
+                else:
+                    self.faltas += 1
+
+        # Consultas repetidas na mesma chamada são geradas uma única vez
+        faltantes: Dict[Tuple[str, str], List[int]] = OrderedDict()
+        for posicao, vetor in enumerate(vetores):
+            if vetor is None:
+                faltantes.setdefault(chaves[posicao], []).append(posicao)
+
+        if faltantes:
+            novos = gerar([consultas[posicoes[0]] for posicoes in faltantes.values()])
+            with self._trava:
+                for (chave, posicoes), vetor in zip(faltantes.items(), novos):
+                    vetor = np.asarray(vetor, dtype=np.float32)
+                    self._entradas[chave] = (vetor, agora)
+                    self._entradas.move_to_end(chave)
+                    for posicao in posicoes:
+                        vetores[posicao] = vetor
+                while len(self._entradas) > self.capacidade:
+                    self._entradas.popitem(last=False)
+
+        return np.vstack(vetores)
+
+    def estatisticas(self) -> Dict[str, float]:
+        """
+        Retorna os contadores do cache.
+
+        Returns:
+            Dicionário com entradas, acertos, faltas e taxa_acerto
+        """
+        total = self.acertos + self.faltas
+        return {
+            "entradas": len(self._entradas),
+            "acertos": self.acertos,
+            "faltas": self.faltas,
+            "taxa_acerto": self.acertos / total if total else 0.0
+        }
+
+    def limpar(self):
+        """Descarta todas as entradas e zera os contadores."""
+        with self._trava:
+            self._entradas.clear()
+            self.acertos = 0
+            self.faltas = 0
+
+    def salvar(self):
+        """Grava as entradas válidas no arquivo de persistência, se configurado."""
+        if not self.arquivo:
+            return
+        agora = time.time()
+        with self._trava:
+            validas = [
+                (chave, vetor, instante) for chave, (vetor, instante) in self._entradas.items()
+                if not self._expirada(instante, agora)
+            ]
+        if not validas:
+            return
+
+        os.makedirs(os.path.dirname(self.arquivo) or ".", exist_ok=True)
+        temporario = f"{self.arquivo}.{os.getpid()}.tmp.npz"
+        np.savez(
+            temporario,
+            modelos=np.array([chave[0] for chave, _, _ in validas]),
+            consultas=np.array([chave[1] for chave, _, _ in validas]),
+            vetores=np.vstack([vetor for _, vetor, _ in validas]),
+            instantes=np.array([instante for _, _, instante in validas])
+        )
+        os.replace(temporario, self.arquivo)
+
+    def _carregar(self):
+        """Lê as entradas ainda válidas gravadas em uma execução anterior."""
+        if not os.path.exists(self.arquivo):
+            return
+        try:
+            with np.load(self.arquivo) as dados:
+                agora = time.time()
+                for modelo, consulta, vetor, instante in zip(
+                    dados["modelos"], dados["consultas"], dados["vetores"], dados["instantes"]
+                ):
+                    if not self._expirada(float(instante), agora):
+                        self._entradas[(str(modelo), str(consulta))] = (vetor.astype(np.float32), float(instante))
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar cache de consultas: {e}")
+            return
+
+        while len(self._entradas) > self.capacidade:
+            self._entradas.popitem(last=False)
+        print(f"📦 Cache de consultas carregado: {len(self._entradas)} entradas")
@@ -0,0 +1,212 @@
+"""
+Cache persistente de embeddings, endereçado por (modelo, sha256 do texto do chunk).
+
+Os vetores ficam em uma matriz binária lida por memória mapeada (np.memmap) e o
+índice hash -> linha em um arquivo de texto, ambos gravados apenas por acréscimo.
+Assim, reconstruir a coleção, mudar o esquema de metadados ou mover pastas (o que
+muda os IDs dos chunks) reaproveita os vetores em vez de recalculá-los.
+
+Mais de um processo pode usar o mesmo cache (ex.: a API com o monitor de
+documentos e o gerenciar_base.py). As gravações são serializadas por uma trava
+de arquivo (flock) e, com ela adquirida, cada processo relê as linhas que os
+outros acrescentaram antes de gravar, de modo que a linha de cada hash no índice
+é sempre a linha do seu vetor. As leituras não usam a trava: acompanham o índice
+pelo que já foi gravado por completo (os vetores são gravados antes do índice).
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (um único processo por cache)
+    fcntl = None
+
+TIPOS_SUPORTADOS = ("float16", "float32")
+
+
+def hash_texto(texto: str) -> str:
+    """Calcula o sha256 do texto de um chunk."""
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+class CacheEmbeddings:
+    """Matriz de embeddings em disco de um único modelo."""
+
+    def __init__(self, diretorio: str, nome_modelo: str, tipo: str = "float16"):
+        """
+        Abre (ou cria) o cache de um modelo.
+
+        Args:
+            diretorio: Diretório raiz do cache (um subdiretório por modelo)
+            nome_modelo: Nome do modelo de embeddings
+            tipo: Tipo dos vetores gravados ("float16" ou "float32")
+        """
+        if tipo not in TIPOS_SUPORTADOS:
+            raise ValueError(f"Tipo de vetor não suportado: {tipo}")
+
+        self.diretorio = os.path.join(diretorio, re.sub(r"[^\w.-]", "_", nome_modelo))
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.arquivo_vetores = os.path.join(self.diretorio, "vetores.bin")
+        self.arquivo_indice = os.path.join(self.diretorio, "indice.txt")
+        self.arquivo_info = os.path.join(self.diretorio, "info.json")
+        self.arquivo_trava = os.path.join(self.diretorio, "gravacao.lock")
+
+        self._trava = threading.Lock()
+        self._matriz: Optional[np.memmap] = None
+        self._linhas: Dict[str, int] = {}
+        # Linhas do índice já lidas e posição (em bytes) até onde o arquivo foi lido
+        self._total_linhas = 0
+        self._posicao_indice = 0
+        self.dimensao: Optional[int] = None
+        self.tipo = np.dtype(tipo)
+
+        with self._trava, self._trava_arquivos():
+            self._alinhar_arquivos()
+
+    @contextmanager
+    def _trava_arquivos(self):
+        """Trava exclusiva entre processos para gravar nos arquivos do cache."""
+        with open(self.arquivo_trava, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _ler_novas_linhas(self):
+        """Lê as linhas completas acrescentadas ao índice (por qualquer processo) desde a última leitura."""
+        if self.dimensao is None:
+            if not os.path.exists(self.arquivo_info):
+                return
+            with open(self.arquivo_info, "r", encoding="utf-8") as f:
+                info = json.load(f)
+            self.dimensao = info["dimensao"]
+            self.tipo = np.dtype(info["tipo"])
+
+        try:
+            tamanho = os.path.getsize(self.arquivo_indice)
+        except FileNotFoundError:
+            return
+        if tamanho < self._posicao_indice:
+            # Índice reparado por outro processo: relê do início
+            self._linhas, self._total_linhas, self._posicao_indice = {}, 0, 0
+        if tamanho == self._posicao_indice:
+            return
+
+        with open(self.arquivo_indice, "rb") as f:
+            f.seek(self._posicao_indice)
+            dados = f.read(tamanho - self._posicao_indice)
+        completas = dados[:dados.rfind(b"\n") + 1]
+        for hash_chunk in completas.decode("utf-8").splitlines():
+            self._linhas[hash_chunk] = self._total_linhas
+            self._total_linhas += 1
+        self._posicao_indice += len(completas)
+
+    def _alinhar_arquivos(self):
+        """
+        Lê as linhas novas do índice e descarta o que uma gravação interrompida
+        deixou em só um dos arquivos (vetores sem índice, linha de índice
+        incompleta ou sem vetor). Deve ser chamado com a trava entre processos.
+        """
+        self._ler_novas_linhas()
+        if self.dimensao is None:
+            return
+
+        for arquivo in (self.arquivo_vetores, self.arquivo_indice):
+            open(arquivo, "ab").close()
+
+        if os.path.getsize(self.arquivo_indice) > self._posicao_indice:
+            os.truncate(self.arquivo_indice, self._posicao_indice)
+
+        linhas_gravadas = os.path.getsize(self.arquivo_vetores) // self._bytes_por_linha()
+        if linhas_gravadas < self._total_linhas:
+            # Índice aponta para vetores inexistentes: mantém só as linhas que têm vetor
+            with open(self.arquivo_indice, "r", encoding="utf-8") as f:
+                hashes = [linha.rstrip("\n") for linha in f][:linhas_gravadas]
+            with open(self.arquivo_indice, "w", encoding="utf-8") as f:
+                f.writelines(f"{h}\n" for h in hashes)
+            self._linhas, self._total_linhas, self._posicao_indice = {}, 0, 0
+            self._matriz = None
+            self._ler_novas_linhas()
+
+        if os.path.getsize(self.arquivo_vetores) != self._total_linhas * self._bytes_por_linha():
+            os.truncate(self.arquivo_vetores, self._total_linhas * self._bytes_por_linha())
+
+    def _bytes_por_linha(self) -> int:
+        return self.dimensao * self.tipo.itemsize
+
+    def _abrir_matriz(self) -> np.memmap:
+        """Mapeia em memória as linhas já indexadas da matriz de vetores."""
+        if self._matriz is None or len(self._matriz) < self._total_linhas:
+            self._matriz = np.memmap(
+                self.arquivo_vetores, dtype=self.tipo, mode="r",
+                shape=(os.path.getsize(self.arquivo_vetores) // self._bytes_por_linha(), self.dimensao)
+            )
+        return self._matriz
+
+    def __len__(self) -> int:
+        return len(self._linhas)
+
+    def ler(self, hashes: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Busca os vetores de uma lista de textos.
+
+        Args:
+            hashes: sha256 dos textos (ver hash_texto)
+
+        Returns:
+            Lista com o vetor (float32) de cada hash, ou None quando ausente
+        """
+        with self._trava:
+            self._ler_novas_linhas()
+            if not self._linhas:
+                return [None] * len(hashes)
+            matriz = self._abrir_matriz()
+            return [
+                np.asarray(matriz[self._linhas[h]], dtype=np.float32) if h in self._linhas else None
+                for h in hashes
+            ]
+
+    def gravar(self, hashes: List[str], embeddings: np.ndarray):
+        """
+        Acrescenta vetores ao cache, ignorando hashes já presentes.
+
+        Args:
+            hashes: sha256 dos textos
+            embeddings: Matriz com um vetor por hash
+        """
+        with self._trava, self._trava_arquivos():
+            # Com a trava, nenhum outro processo grava: as linhas que eles já
+            # acrescentaram são lidas antes, e as novas entram logo depois delas
+            self._alinhar_arquivos()
+            novos = {}
+            for hash_chunk, vetor in zip(hashes, embeddings):
+                if hash_chunk not in self._linhas:
+                    novos.setdefault(hash_chunk, vetor)
+            if not novos:
+                return
+
+            if self.dimensao is None:
+                self.dimensao = int(np.shape(embeddings)[1])
+                with open(self.arquivo_info, "w", encoding="utf-8") as f:
+                    json.dump({"dimensao": self.dimensao, "tipo": self.tipo.name}, f)
+
+            matriz = np.asarray(list(novos.values()), dtype=self.tipo)
+
+            # Vetores primeiro: o índice só aponta para linhas já gravadas
+            with open(self.arquivo_vetores, "ab") as f:
+                f.write(matriz.tobytes())
+            with open(self.arquivo_indice, "a", encoding="utf-8") as f:
+                f.writelines(f"{hash_chunk}\n" for hash_chunk in novos)
+
+            self._ler_novas_linhas()
@@ -0,0 +1,192 @@
+"""
+Cache em disco do texto extraído dos documentos, endereçado pelo hash do conteúdo.
+
+Guarda dois níveis de resultado para cada arquivo:
+- o texto extraído (páginas/parágrafos/linhas), que independe da configuração
+  de divisão em chunks;
+- os chunks gerados para uma configuração específica do divisor de texto.
+
+Como a chave é o hash do conteúdo, o cache continua válido após limpar a base,
+mover arquivos de pasta ou trocar o modelo de embeddings.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+
+# Leituras de 1 MiB: poucas chamadas de sistema por arquivo sem custo relevante de memória
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+
+def calcular_hash_arquivo(caminho_arquivo: str) -> str:
+    """
+    Calcula hash MD5 de um arquivo para detectar modificações.
+
+    Args:
+        caminho_arquivo: Caminho do arquivo
+
+    Returns:
+        Hash MD5 do arquivo
+    """
+    hash_md5 = hashlib.md5()
+    buffer = bytearray(TAMANHO_BLOCO_HASH)
+    visao = memoryview(buffer)
+    with open(caminho_arquivo, "rb", buffering=0) as f:
+        while True:
+            lidos = f.readinto(buffer)
+            if not lidos:
+                break
+            hash_md5.update(visao[:lidos])
+    return hash_md5.hexdigest()
+
+
+class CacheExtracao:
+    """Armazena texto extraído e chunks de documentos indexados pelo hash do arquivo."""
+
+    def __init__(self, diretorio: str = ".cache_extracao"):
+        """
+        Inicializa o cache.
+
+        Args:
+            diretorio: Diretório onde os arquivos de cache são gravados
+        """
+        self.diretorio = diretorio
+
+    def _caminho(self, hash_arquivo: str, sufixo: str) -> str:
+        """Monta o caminho de uma entrada, agrupando por prefixo do hash."""
+        return os.path.join(self.diretorio, hash_arquivo[:2], f"{hash_arquivo}{sufixo}.jsonl.gz")
+
+    @staticmethod
+    def chave_configuracao(configuracao: Dict) -> str:
+        """Gera uma chave curta e estável para uma configuração do divisor de texto."""
+        serializada = json.dumps(configuracao, sort_keys=True)
+        return hashlib.sha256(serializada.encode()).hexdigest()[:16]
+
+    def _ler(self, destino: str) -> Optional[Iterator[Dict]]:
+        """Abre uma entrada do cache para leitura linha a linha, se existir."""
+        if not os.path.exists(destino):
+            return None
+
+        def linhas():
+            with gzip.open(destino, "rt", encoding="utf-8") as f:
+                for linha in f:
+                    yield json.loads(linha)
+
+        return linhas()
+
+    def _gravar_em_fluxo(self, destino: str, itens: Iterable, serializar: Callable[[any], List[Dict]]) -> Iterator:
+        """
+        Repassa os itens recebidos gravando suas linhas no cache.
+
+        A entrada só é publicada (os.replace) depois de o último item ser
+        consumido; uma extração interrompida não deixa entrada parcial no cache.
+
+        Args:
+            destino: Caminho da entrada do cache
+            itens: Itens a repassar
+            serializar: Função que converte um item nas linhas a gravar
+
+        Yields:
+            Os mesmos itens recebidos, à medida que são gravados
+        """
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        try:
+            with gzip.open(temporario, "wt", encoding="utf-8") as f:
+                for item in itens:
+                    for linha in serializar(item):
+                        f.write(json.dumps(linha, ensure_ascii=False) + "\n")
+                    yield item
+            os.replace(temporario, destino)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    def ler_texto(self, hash_arquivo: str) -> Optional[Iterator[str]]:
+        """
+        Lê o texto extraído de um arquivo.
+
+        Args:
+            hash_arquivo: Hash do conteúdo do arquivo
+
+        Returns:
+            Iterador sobre os segmentos de texto, ou None se não estiver no cache
+        """
+        linhas = self._ler(self._caminho(hash_arquivo, ""))
+        if linhas is None:
+            return None
+        return (linha["texto"] for linha in linhas)
+
+    def gravar_texto(self, hash_arquivo: str, segmentos: Iterable[str]) -> Iterator[str]:
+        """
+        Repassa os segmentos de texto extraídos gravando-os no cache.
+
+        Args:
+            hash_arquivo: Hash do conteúdo do arquivo
+            segmentos: Segmentos de texto na ordem do documento
+
+        Returns:
+            Iterador que repassa os segmentos recebidos
+        """
+        return self._gravar_em_fluxo(
+            self._caminho(hash_arquivo, ""),
+            segmentos,
+            lambda segmento: [{"texto": segmento}]
+        )
+
+    def ler_chunks(self, hash_arquivo: str, chave: str) -> Optional[Dict]:
+        """
+        Lê os chunks gerados para um arquivo com uma configuração do divisor.
+
+        Args:
+            hash_arquivo: Hash do conteúdo do arquivo
+            chave: Chave da configuração (ver chave_configuracao)
+
+        Returns:
+            Dicionário com "palavras_chave" do documento e "chunks" (iterador de
+            dicionários com texto, chunk_id e palavras_chave), ou None
+        """
+        linhas = self._ler(self._caminho(hash_arquivo, f"_{chave}"))
+        if linhas is None:
+            return None
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return None
+        return {
+            "palavras_chave": cabecalho.get("palavras_documento", []),
+            "chunks": linhas
+        }
+
+    def gravar_chunks(self, hash_arquivo: str, chave: str, chunks: Iterable[Dict],
+                      palavras_documento: List[str]) -> Iterator[Dict]:
+        """
+        Repassa os chunks gerados gravando no cache a parte que independe do caminho.
+
+        Args:
+            hash_arquivo: Hash do conteúdo do arquivo
+            chave: Chave da configuração do divisor
+            chunks: Chunks com metadados, na ordem de chunk_id
+            palavras_documento: Lista preenchida com as palavras-chave do documento
+                antes do primeiro chunk ser produzido
+
+        Returns:
+            Iterador que repassa os chunks recebidos
+        """
+        cabecalho_gravado = []
+
+        def serializar(chunk: Dict) -> List[Dict]:
+            linhas = []
+            if not cabecalho_gravado:
+                linhas.append({"palavras_documento": list(palavras_documento)})
+                cabecalho_gravado.append(True)
+            linhas.append({
+                "texto": chunk["texto"],
+                "chunk_id": chunk["metadados"]["chunk_id"],
+                "palavras_chave": chunk["metadados"]["palavras_chave"]
+            })
+            return linhas
+
+        return self._gravar_em_fluxo(self._caminho(hash_arquivo, f"_{chave}"), chunks, serializar)
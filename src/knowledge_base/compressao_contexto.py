@@ -0,0 +1,136 @@
+"""
+Compressão do contexto do LLM por sentenças, orientada pela consulta.
+
+Mesmo depois da seleção dos chunks, boa parte de cada um é texto padrão dos
+modelos de FT e MOA (cabeçalhos, sumários, notas legais) que não ajuda a
+responder à pergunta. Aqui, cada chunk é dividido em sentenças; todas as
+sentenças do contexto são pontuadas contra o embedding da consulta em um
+único produto de matrizes e, de cada chunk, ficam apenas as sentenças mais
+relevantes e as vizinhas imediatas (para preservar a continuidade do texto),
+na ordem original. Trechos omitidos são marcados com "[...]".
+"""
+
+import re
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from .orcamento_tokens import contar_tokens
+
+NUM_SENTENCAS_MANTIDAS = 3
+NUM_VIZINHOS = 1
+
+# Fragmentos curtos (ex.: numeração de itens, títulos) são unidos à sentença seguinte
+TAMANHO_MINIMO_SENTENCA = 40
+MARCADOR_OMISSAO = " [...] "
+
+PADRAO_FIM_SENTENCA = re.compile(r"(?<=[.!?])\s+|\s*\n+\s*")
+
+
+def dividir_sentencas(texto: str) -> List[str]:
+    """
+    Divide um texto em sentenças (pontuação final ou quebra de linha).
+
+    Args:
+        texto: Texto do chunk
+
+    Returns:
+        Sentenças na ordem do texto, sem espaços nas pontas
+    """
+    sentencas: List[str] = []
+    for parte in PADRAO_FIM_SENTENCA.split(texto):
+        parte = parte.strip()
+        if not parte:
+            continue
+        if sentencas and len(sentencas[-1]) < TAMANHO_MINIMO_SENTENCA:
+            sentencas[-1] = f"{sentencas[-1]} {parte}"
+        else:
+            sentencas.append(parte)
+    return sentencas
+
+
+def _montar_texto(sentencas: List[str], mantidas: List[int]) -> str:
+    partes = []
+    anterior = None
+    for indice in mantidas:
+        if anterior is not None:
+            partes.append(" " if indice == anterior + 1 else MARCADOR_OMISSAO)
+        elif indice > 0:
+            partes.append(MARCADOR_OMISSAO.lstrip())
+        partes.append(sentencas[indice])
+        anterior = indice
+    if anterior is not None and anterior < len(sentencas) - 1:
+        partes.append(MARCADOR_OMISSAO.rstrip())
+    return "".join(partes)
+
+
+def comprimir_sentencas(documentos: List[Dict], embedding_consulta: np.ndarray,
+                        gerar_embeddings: Callable[[List[str]], np.ndarray],
+                        num_sentencas: int = NUM_SENTENCAS_MANTIDAS,
+                        vizinhos: int = NUM_VIZINHOS) -> Tuple[List[Dict], Dict]:
+    """
+    Mantém, em cada chunk, as sentenças mais relevantes para a consulta e suas vizinhas.
+
+    Args:
+        documentos: Chunks do contexto (com "texto" e "metadados")
+        embedding_consulta: Embedding da consulta
+        gerar_embeddings: Função textos -> matriz de embeddings (um único lote
+            com as sentenças de todos os chunks)
+        num_sentencas: Sentenças mais relevantes mantidas por chunk
+        vizinhos: Sentenças mantidas antes e depois de cada sentença relevante
+
+    Returns:
+        Tupla (chunks com o texto comprimido e "num_tokens" recalculado nos
+        metadados; resumo com sentencas, sentencas_mantidas,
+        caracteres_originais, caracteres_comprimidos, taxa_compressao
+        (comprimido / original) e tempo_ms)
+    """
+    inicio = time.perf_counter()
+    sentencas_por_chunk = [dividir_sentencas(documento["texto"]) for documento in documentos]
+    todas = [sentenca for sentencas in sentencas_por_chunk for sentenca in sentencas]
+    resumo = {
+        "sentencas": len(todas),
+        "sentencas_mantidas": 0,
+        "caracteres_originais": sum(len(documento["texto"]) for documento in documentos),
+        "caracteres_comprimidos": 0,
+        "taxa_compressao": 1.0,
+        "tempo_ms": 0.0,
+    }
+    if not todas:
+        resumo["caracteres_comprimidos"] = resumo["caracteres_originais"]
+        return documentos, resumo
+
+    vetores = np.asarray(gerar_embeddings(todas), dtype=np.float32)
+    vetores /= np.maximum(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12)
+    consulta = np.asarray(embedding_consulta, dtype=np.float32)
+    pontuacoes = vetores @ (consulta / max(float(np.linalg.norm(consulta)), 1e-12))
+
+    comprimidos = []
+    deslocamento = 0
+    for documento, sentencas in zip(documentos, sentencas_por_chunk):
+        pontuacoes_chunk = pontuacoes[deslocamento:deslocamento + len(sentencas)]
+        deslocamento += len(sentencas)
+
+        mantidas = set()
+        for indice in np.argsort(-pontuacoes_chunk, kind="stable")[:num_sentencas]:
+            mantidas.update(range(max(0, indice - vizinhos), min(len(sentencas), indice + vizinhos + 1)))
+        resumo["sentencas_mantidas"] += len(mantidas)
+
+        if len(mantidas) == len(sentencas):
+            comprimidos.append(documento)
+            resumo["caracteres_comprimidos"] += len(documento["texto"])
+            continue
+
+        texto = _montar_texto(sentencas, sorted(mantidas))
+        comprimidos.append({
+            **documento,
+            "texto": texto,
+            "metadados": {**documento.get("metadados", {}), "num_tokens": contar_tokens(texto)}
+        })
+        resumo["caracteres_comprimidos"] += len(texto)
+
+    if resumo["caracteres_originais"]:
+        resumo["taxa_compressao"] = round(resumo["caracteres_comprimidos"] / resumo["caracteres_originais"], 3)
+    resumo["tempo_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    return comprimidos, resumo
@@ -0,0 +1,471 @@
+"""
+Controle transacional dos documentos processados, armazenado em SQLite (modo WAL).
+
+Substitui o antigo documentos_processados.json, que era reescrito por inteiro a
+cada arquivo processado. Cada registro é gravado como uma linha, as gravações
+podem ser agrupadas em transações e uma interrupção no meio da escrita não
+corrompe o controle.
+
+A mesma tabela serve de catálogo dos documentos indexados: além de hash,
+tamanho, data de ingestão e número de chunks, cada registro guarda nome,
+extensão, facetas (categoria, tipo, código do produto) e número de páginas,
+calculados uma única vez na ingestão. Listagens, filtros e contagens leem o
+catálogo sem percorrer o diretório de documentos.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .facetas import extrair_facetas
+
+CAMPOS_DOCUMENTO = ("hash", "tamanho", "mtime_ns", "inode", "data_processamento", "num_chunks", "paginas")
+
+# Colunas do catálogo derivadas do caminho (preenchidas a cada gravação)
+CAMPOS_CATALOGO = ("nome", "extensao", "categoria", "tipo_documento", "codigo_produto")
+
+FILTROS_CATALOGO = ("extensao", "categoria", "tipo_documento", "codigo_produto")
+ORDENACOES_CATALOGO = ("nome", "caminho", "categoria", "tipo_documento", "codigo_produto", "tamanho",
+                       "paginas", "num_chunks", "data_processamento")
+
+PADRAO_PAGINAS_DOCX = re.compile(rb"<Pages>(\d+)</Pages>")
+
+
+def contar_paginas(caminho: str) -> Optional[int]:
+    """
+    Conta as páginas de um documento sem extrair o texto.
+
+    PDFs têm as páginas contadas na árvore de páginas; arquivos Word usam o
+    total gravado pelo editor em docProps/app.xml.
+
+    Args:
+        caminho: Caminho do arquivo
+
+    Returns:
+        Número de páginas, ou None se não for possível determiná-lo (ex.: planilhas)
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    try:
+        if extensao == ".pdf":
+            from pypdf import PdfReader
+            return len(PdfReader(caminho).pages)
+        if extensao == ".docx":
+            with zipfile.ZipFile(caminho) as arquivo:
+                encontrado = PADRAO_PAGINAS_DOCX.search(arquivo.read("docProps/app.xml"))
+            return int(encontrado.group(1)) if encontrado else None
+    except Exception as e:
+        print(f"⚠️ Não foi possível contar as páginas de {os.path.basename(caminho)}: {e}")
+    return None
+
+
+def _campos_catalogo(caminho: str) -> Dict[str, Any]:
+    """Calcula as colunas do catálogo derivadas do caminho do arquivo."""
+    facetas = extrair_facetas(caminho)
+    nome = os.path.basename(caminho)
+    return {
+        "nome": nome,
+        "extensao": os.path.splitext(nome)[1].lower().lstrip("."),
+        "categoria": facetas["categoria"],
+        "tipo_documento": facetas["tipo_documento"],
+        "codigo_produto": facetas.get("codigo_produto"),
+    }
+
+
+class ControleDocumentos:
+    """
+    Registro dos arquivos processados, com interface de dicionário
+    (caminho -> informações do arquivo).
+    """
+
+    def __init__(self, caminho_banco: str, arquivo_json_legado: Optional[str] = None):
+        """
+        Abre (ou cria) o banco de controle.
+
+        Args:
+            caminho_banco: Caminho do arquivo SQLite
+            arquivo_json_legado: Controle JSON antigo a importar na primeira abertura
+        """
+        self.caminho_banco = caminho_banco
+        os.makedirs(os.path.dirname(caminho_banco) or ".", exist_ok=True)
+
+        self._trava = threading.RLock()
+        self._profundidade_transacao = 0
+        self._conexao = sqlite3.connect(caminho_banco, check_same_thread=False, isolation_level=None)
+        self._conexao.row_factory = sqlite3.Row
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._criar_tabelas()
+
+        if arquivo_json_legado:
+            self._importar_json_legado(arquivo_json_legado)
+
+    def _criar_tabelas(self):
+        """Cria as tabelas e índices do controle, se ainda não existirem."""
+        with self.transacao():
+            self._conexao.execute("""
+                CREATE TABLE IF NOT EXISTS documentos (
+                    caminho TEXT PRIMARY KEY,
+                    hash TEXT NOT NULL,
+                    tamanho INTEGER,
+                    mtime_ns INTEGER,
+                    inode INTEGER,
+                    data_processamento TEXT,
+                    num_chunks INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self._migrar_catalogo()
+            self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_documentos_hash ON documentos(hash)")
+            for campo in ("nome", "categoria", "tipo_documento", "codigo_produto"):
+                self._conexao.execute(f"CREATE INDEX IF NOT EXISTS idx_documentos_{campo} ON documentos({campo})")
+            self._conexao.execute("""
+                CREATE TABLE IF NOT EXISTS jobs_ingestao (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    diretorio TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    iniciado_em TEXT NOT NULL,
+                    concluido_em TEXT
+                )
+            """)
+            self._conexao.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints_ingestao (
+                    job_id INTEGER NOT NULL,
+                    caminho TEXT NOT NULL,
+                    num_chunks INTEGER NOT NULL DEFAULT 0,
+                    concluido_em TEXT NOT NULL,
+                    PRIMARY KEY (job_id, caminho)
+                )
+            """)
+
+    def _migrar_catalogo(self):
+        """Acrescenta as colunas do catálogo a controles antigos e as preenche a partir do caminho."""
+        existentes = {linha["name"] for linha in self._conexao.execute("PRAGMA table_info(documentos)")}
+        for campo in CAMPOS_CATALOGO + ("paginas",):
+            if campo not in existentes:
+                tipo = "INTEGER" if campo == "paginas" else "TEXT"
+                self._conexao.execute(f"ALTER TABLE documentos ADD COLUMN {campo} {tipo}")
+
+        pendentes = [linha[0] for linha in self._conexao.execute("SELECT caminho FROM documentos WHERE nome IS NULL")]
+        for caminho in pendentes:
+            campos = _campos_catalogo(caminho)
+            self._conexao.execute(
+                f"UPDATE documentos SET {', '.join(f'{campo} = ?' for campo in CAMPOS_CATALOGO)} WHERE caminho = ?",
+                tuple(campos[campo] for campo in CAMPOS_CATALOGO) + (caminho,)
+            )
+
+    def _importar_json_legado(self, arquivo_json: str):
+        """Importa o controle JSON antigo e o renomeia para não importá-lo de novo."""
+        if not os.path.exists(arquivo_json):
+            return
+        try:
+            with open(arquivo_json, 'r', encoding='utf-8') as f:
+                registros = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Erro ao importar controle legado: {e}")
+            return
+
+        with self.transacao():
+            for caminho, info in registros.items():
+                if caminho not in self:
+                    self[caminho] = info
+        os.replace(arquivo_json, f"{arquivo_json}.migrado")
+        print(f"📦 Controle legado importado: {len(registros)} arquivos")
+
+    @contextmanager
+    def transacao(self):
+        """
+        Agrupa várias gravações em uma única transação.
+
+        Transações podem ser aninhadas; o commit acontece ao sair da mais externa
+        e qualquer exceção desfaz todas as gravações do bloco.
+        """
+        with self._trava:
+            if self._profundidade_transacao == 0:
+                self._conexao.execute("BEGIN IMMEDIATE")
+            self._profundidade_transacao += 1
+            try:
+                yield self
+            except BaseException:
+                self._profundidade_transacao -= 1
+                if self._profundidade_transacao == 0:
+                    self._conexao.execute("ROLLBACK")
+                raise
+            else:
+                self._profundidade_transacao -= 1
+                if self._profundidade_transacao == 0:
+                    self._conexao.execute("COMMIT")
+
+    def _executar(self, sql: str, parametros: Tuple = ()) -> sqlite3.Cursor:
+        """Executa um comando sob a trava da conexão."""
+        with self._trava:
+            return self._conexao.execute(sql, parametros)
+
+    @staticmethod
+    def _linha_para_dict(linha: sqlite3.Row) -> Dict:
+        """Converte uma linha da tabela no dicionário de informações do arquivo."""
+        return {campo: linha[campo] for campo in CAMPOS_DOCUMENTO if linha[campo] is not None}
+
+    # --- Interface de dicionário ---
+
+    def __contains__(self, caminho: str) -> bool:
+        return self._executar("SELECT 1 FROM documentos WHERE caminho = ?", (caminho,)).fetchone() is not None
+
+    def __getitem__(self, caminho: str) -> Dict:
+        registro = self.get(caminho)
+        if registro is None:
+            raise KeyError(caminho)
+        return registro
+
+    def get(self, caminho: str, padrao: Optional[Dict] = None) -> Optional[Dict]:
+        linha = self._executar("SELECT * FROM documentos WHERE caminho = ?", (caminho,)).fetchone()
+        return self._linha_para_dict(linha) if linha else padrao
+
+    def __setitem__(self, caminho: str, info: Dict):
+        campos = _campos_catalogo(caminho)
+        self._executar(
+            """
+            INSERT INTO documentos (caminho, hash, tamanho, mtime_ns, inode, data_processamento, num_chunks,
+                                    paginas, nome, extensao, categoria, tipo_documento, codigo_produto)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(caminho) DO UPDATE SET
+                hash = excluded.hash,
+                tamanho = excluded.tamanho,
+                mtime_ns = excluded.mtime_ns,
+                inode = excluded.inode,
+                data_processamento = excluded.data_processamento,
+                num_chunks = excluded.num_chunks,
+                paginas = excluded.paginas,
+                nome = excluded.nome,
+                extensao = excluded.extensao,
+                categoria = excluded.categoria,
+                tipo_documento = excluded.tipo_documento,
+                codigo_produto = excluded.codigo_produto
+            """,
+            (
+                caminho,
+                info.get("hash", ""),
+                info.get("tamanho"),
+                info.get("mtime_ns"),
+                info.get("inode"),
+                info.get("data_processamento"),
+                info.get("num_chunks", 0),
+                info.get("paginas"),
+            ) + tuple(campos[campo] for campo in CAMPOS_CATALOGO),
+        )
+
+    def __delitem__(self, caminho: str):
+        cursor = self._executar("DELETE FROM documentos WHERE caminho = ?", (caminho,))
+        if cursor.rowcount == 0:
+            raise KeyError(caminho)
+
+    def __len__(self) -> int:
+        return self._executar("SELECT COUNT(*) FROM documentos").fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __bool__(self) -> bool:
+        return self._executar("SELECT 1 FROM documentos LIMIT 1").fetchone() is not None
+
+    def keys(self) -> List[str]:
+        return [linha[0] for linha in self._executar("SELECT caminho FROM documentos ORDER BY caminho")]
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        linhas = self._executar("SELECT * FROM documentos ORDER BY caminho").fetchall()
+        return [(linha["caminho"], self._linha_para_dict(linha)) for linha in linhas]
+
+    # --- Consultas ---
+
+    def buscar_por_hash(self, hash_arquivo: str) -> List[str]:
+        """
+        Lista os caminhos registrados com um determinado hash de conteúdo.
+
+        Args:
+            hash_arquivo: Hash MD5 do conteúdo
+
+        Returns:
+            Caminhos dos arquivos com esse conteúdo
+        """
+        linhas = self._executar("SELECT caminho FROM documentos WHERE hash = ?", (hash_arquivo,))
+        return [linha[0] for linha in linhas]
+
+    def estatisticas(self) -> Dict:
+        """
+        Calcula os totais do controle diretamente no banco.
+
+        Returns:
+            Dicionário com total de arquivos, total de chunks e data da última atualização
+        """
+        linha = self._executar(
+            "SELECT COUNT(*), COALESCE(SUM(num_chunks), 0), MAX(data_processamento) FROM documentos"
+        ).fetchone()
+        return {
+            "total_arquivos": linha[0],
+            "total_chunks": linha[1],
+            "ultima_atualizacao": linha[2] or "N/A"
+        }
+
+    def listar_catalogo(self, filtros: Optional[Dict[str, Any]] = None, busca: Optional[str] = None,
+                        ordenar_por: str = "nome", decrescente: bool = False,
+                        limite: Optional[int] = None, deslocamento: int = 0) -> Dict:
+        """
+        Lista os documentos do catálogo com filtro, ordenação e paginação feitos no banco.
+
+        Args:
+            filtros: Campo -> valor (ou lista de valores), com campos de FILTROS_CATALOGO
+            busca: Trecho do nome do arquivo (sem diferenciar maiúsculas)
+            ordenar_por: Campo de ORDENACOES_CATALOGO
+            decrescente: Ordena do maior para o menor
+            limite: Número máximo de documentos (None = todos)
+            deslocamento: Documentos pulados antes do primeiro retornado
+
+        Returns:
+            Dicionário com o total de documentos que atendem aos filtros e os
+            documentos da página (caminho, informações do controle e colunas do catálogo)
+
+        Raises:
+            ValueError: Se um filtro ou campo de ordenação não for suportado
+        """
+        if ordenar_por not in ORDENACOES_CATALOGO:
+            raise ValueError(f"Ordenação não suportada: {ordenar_por} (use {', '.join(ORDENACOES_CATALOGO)})")
+
+        condicoes, parametros = [], []
+        for campo, valor in (filtros or {}).items():
+            if campo not in FILTROS_CATALOGO:
+                raise ValueError(f"Filtro não suportado: {campo} (use {', '.join(FILTROS_CATALOGO)})")
+            valores = list(valor) if isinstance(valor, (list, tuple, set)) else [valor]
+            condicoes.append(f"{campo} IN ({', '.join('?' * len(valores))})")
+            parametros += valores
+        if busca:
+            condicoes.append("nome LIKE ? ESCAPE '\\'")
+            parametros.append("%" + re.sub(r"([%_\\])", r"\\\1", busca) + "%")
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+        with self._trava:
+            total = self._conexao.execute(f"SELECT COUNT(*) FROM documentos {where}", parametros).fetchone()[0]
+            linhas = self._conexao.execute(
+                f"SELECT * FROM documentos {where} "
+                f"ORDER BY {ordenar_por} {'DESC' if decrescente else 'ASC'}, caminho LIMIT ? OFFSET ?",
+                parametros + [limite if limite is not None else -1, max(0, deslocamento)]
+            ).fetchall()
+
+        return {
+            "total": total,
+            "documentos": [
+                {
+                    "caminho": linha["caminho"],
+                    **self._linha_para_dict(linha),
+                    **{campo: linha[campo] for campo in CAMPOS_CATALOGO}
+                }
+                for linha in linhas
+            ]
+        }
+
+    def resumo_catalogo(self) -> Dict:
+        """
+        Calcula os totais do catálogo por categoria, tipo de documento e extensão.
+
+        Returns:
+            Dicionário com total de documentos, tamanho, páginas e chunks e as
+            contagens por categoria, tipo_documento e extensao
+        """
+        with self._trava:
+            totais = self._conexao.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0), COALESCE(SUM(paginas), 0), "
+                "COALESCE(SUM(num_chunks), 0) FROM documentos"
+            ).fetchone()
+            resumo = {
+                "total_documentos": totais[0],
+                "tamanho_total": totais[1],
+                "total_paginas": totais[2],
+                "total_chunks": totais[3],
+            }
+            for campo in ("categoria", "tipo_documento", "extensao"):
+                resumo[campo] = {
+                    valor or "N/A": quantidade for valor, quantidade in self._conexao.execute(
+                        f"SELECT {campo}, COUNT(*) FROM documentos GROUP BY {campo} ORDER BY {campo}"
+                    )
+                }
+        return resumo
+
+    def limpar(self):
+        """Remove todos os registros do controle, inclusive os jobs de ingestão."""
+        with self.transacao():
+            self._executar("DELETE FROM checkpoints_ingestao")
+            self._executar("DELETE FROM jobs_ingestao")
+            self._executar("DELETE FROM documentos")
+
+    def fechar(self):
+        """Fecha a conexão com o banco."""
+        with self._trava:
+            self._conexao.close()
+
+    # --- Jobs de ingestão ---
+
+    def iniciar_job(self, diretorio: str) -> Dict:
+        """
+        Inicia um job de ingestão para o diretório ou retoma o último job
+        interrompido para ele.
+
+        Args:
+            diretorio: Diretório a ser ingerido
+
+        Returns:
+            Dicionário com id do job, se foi retomado e os caminhos já concluídos
+        """
+        diretorio = os.path.abspath(diretorio)
+        with self.transacao():
+            linha = self._executar(
+                "SELECT id FROM jobs_ingestao WHERE diretorio = ? AND status = 'em_andamento' "
+                "ORDER BY id DESC LIMIT 1",
+                (diretorio,)
+            ).fetchone()
+
+            if linha:
+                job_id = linha[0]
+                concluidos = {
+                    registro[0] for registro in self._executar(
+                        "SELECT caminho FROM checkpoints_ingestao WHERE job_id = ?", (job_id,)
+                    )
+                }
+                return {"id": job_id, "retomado": True, "concluidos": concluidos}
+
+            cursor = self._executar(
+                "INSERT INTO jobs_ingestao (diretorio, status, iniciado_em) VALUES (?, 'em_andamento', ?)",
+                (diretorio, datetime.now().isoformat())
+            )
+            return {"id": cursor.lastrowid, "retomado": False, "concluidos": set()}
+
+    def registrar_checkpoint(self, job_id: int, caminho: str, num_chunks: int):
+        """
+        Registra que um arquivo do job foi gravado por completo na base.
+
+        Args:
+            job_id: ID do job de ingestão
+            caminho: Caminho do arquivo concluído
+            num_chunks: Número de chunks gravados
+        """
+        self._executar(
+            "INSERT OR REPLACE INTO checkpoints_ingestao (job_id, caminho, num_chunks, concluido_em) "
+            "VALUES (?, ?, ?, ?)",
+            (job_id, caminho, num_chunks, datetime.now().isoformat())
+        )
+
+    def concluir_job(self, job_id: int):
+        """
+        Marca o job como concluído e descarta seus checkpoints.
+
+        Args:
+            job_id: ID do job de ingestão
+        """
+        with self.transacao():
+            self._executar(
+                "UPDATE jobs_ingestao SET status = 'concluido', concluido_em = ? WHERE id = ?",
+                (datetime.now().isoformat(), job_id)
+            )
+            self._executar("DELETE FROM checkpoints_ingestao WHERE job_id = ?", (job_id,))
@@ -0,0 +1,140 @@
+"""
+Extração vetorizada de palavras-chave por TF-IDF.
+
+Alternativa ao YAKE para a ingestão: em vez de executar o extrator em cada
+chunk, calcula a matriz TF-IDF esparsa de todos os chunks de um corpus de uma
+só vez e seleciona as maiores pontuações de cada linha. Um documento lido em
+janelas acumula a frequência dos termos entre as chamadas, de modo que o IDF
+de cada janela considera todos os chunks do documento já lidos.
+"""
+
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+STOPWORDS_PT = [
+    "a", "à", "ao", "aos", "aquela", "aquelas", "aquele", "aqueles", "aquilo", "as", "às", "até",
+    "com", "como", "da", "das", "de", "dela", "delas", "dele", "deles", "depois", "do", "dos",
+    "e", "é", "ela", "elas", "ele", "eles", "em", "entre", "era", "essa", "essas", "esse", "esses",
+    "esta", "está", "estão", "estas", "este", "estes", "eu", "foi", "for", "foram", "há", "isso",
+    "isto", "já", "lhe", "lhes", "mais", "mas", "me", "mesmo", "meu", "minha", "muito", "na",
+    "não", "nas", "nem", "no", "nos", "nós", "nossa", "nosso", "num", "numa", "o", "os", "ou",
+    "para", "pela", "pelas", "pelo", "pelos", "por", "qual", "quando", "que", "quem", "se", "seja",
+    "sem", "ser", "será", "seu", "seus", "só", "sua", "suas", "também", "te", "tem", "têm", "ter",
+    "um", "uma", "umas", "uns", "você", "vocês", "são", "sobre", "cada", "onde", "pode", "podem",
+    "deve", "devem", "forma", "através", "após", "ainda", "outro", "outros", "outra", "outras",
+    "todo", "todos", "toda", "todas", "fazer", "feito", "sendo", "caso", "bem", "assim", "ano",
+]
+
+
+class FrequenciasDocumento:
+    """Número de chunks e de chunks por termo acumulados ao longo de um documento."""
+
+    def __init__(self):
+        self.total_chunks = 0
+        self.chunks_por_termo: Counter = Counter()
+
+    def acumular(self, vocabulario: np.ndarray, chunks_por_termo: np.ndarray, total_chunks: int) -> np.ndarray:
+        """
+        Soma as frequências de uma janela às do documento.
+
+        Args:
+            vocabulario: Termos da janela
+            chunks_por_termo: Chunks da janela em que cada termo aparece
+            total_chunks: Chunks da janela
+
+        Returns:
+            Chunks do documento (até esta janela) em que cada termo aparece
+        """
+        self.total_chunks += total_chunks
+        acumulado = np.empty(len(vocabulario), dtype=np.int64)
+        for posicao, (termo, quantidade) in enumerate(zip(vocabulario.tolist(), chunks_por_termo.tolist())):
+            self.chunks_por_termo[termo] += quantidade
+            acumulado[posicao] = self.chunks_por_termo[termo]
+        return acumulado
+
+
+class ExtratorTfidf:
+    """Calcula palavras-chave de todos os chunks de um corpus em uma única passada."""
+
+    def __init__(self, ngramas: Tuple[int, int] = (1, 2)):
+        """
+        Inicializa o extrator.
+
+        Args:
+            ngramas: Intervalo de tamanho dos termos (1 = palavras, 2 = bigramas)
+        """
+        self.ngramas = ngramas
+
+    @staticmethod
+    def _maiores(colunas: np.ndarray, pesos: np.ndarray, vocabulario: np.ndarray, quantidade: int) -> List[str]:
+        """Seleciona os termos de maior peso usando seleção parcial (argpartition)."""
+        if quantidade <= 0 or len(pesos) == 0:
+            return []
+        if len(pesos) > quantidade:
+            selecionados = np.argpartition(-pesos, quantidade)[:quantidade]
+        else:
+            selecionados = np.arange(len(pesos))
+        selecionados = selecionados[np.argsort(-pesos[selecionados], kind="stable")]
+        return vocabulario[colunas[selecionados]].tolist()
+
+    def extrair(self, textos: List[str], num_palavras_chunk: int = 3, num_palavras_corpus: int = 5,
+                frequencias: Optional[FrequenciasDocumento] = None) -> Tuple[List[str], List[List[str]]]:
+        """
+        Extrai palavras-chave de cada texto e do corpus como um todo.
+
+        A pontuação é a do TfidfVectorizer (tf sublinear, IDF suavizado e
+        normalização L2); sem frequencias, o IDF vem só dos textos recebidos.
+
+        Args:
+            textos: Chunks que formam o corpus
+            num_palavras_chunk: Palavras-chave por chunk
+            num_palavras_corpus: Palavras-chave do corpus (documento)
+            frequencias: Frequências do documento acumuladas nas chamadas
+                anteriores (janelas anteriores); recebem as destes textos
+
+        Returns:
+            Tupla (palavras do corpus, lista de palavras por chunk)
+        """
+        if not textos:
+            return [], []
+
+        vetorizador = CountVectorizer(
+            ngram_range=self.ngramas,
+            stop_words=STOPWORDS_PT,
+            token_pattern=r"(?u)\b[^\W\d_]{3,}\b"
+        )
+        try:
+            contagens = vetorizador.fit_transform(textos).tocsr()
+        except ValueError:
+            # Nenhum termo válido no corpus (ex.: apenas números ou stopwords)
+            if frequencias is not None:
+                frequencias.total_chunks += len(textos)
+            return [], [[] for _ in textos]
+
+        vocabulario = vetorizador.get_feature_names_out()
+        frequencias = frequencias if frequencias is not None else FrequenciasDocumento()
+        chunks_por_termo = frequencias.acumular(
+            vocabulario, np.bincount(contagens.indices, minlength=len(vocabulario)), len(textos)
+        )
+        idf = np.log((1 + frequencias.total_chunks) / (1 + chunks_por_termo)) + 1
+        matriz = contagens.astype(np.float64)
+        matriz.data = (1 + np.log(matriz.data)) * idf[matriz.indices]
+        matriz = normalize(matriz)
+
+        por_chunk = []
+        for linha in range(matriz.shape[0]):
+            inicio, fim = matriz.indptr[linha], matriz.indptr[linha + 1]
+            por_chunk.append(self._maiores(
+                matriz.indices[inicio:fim], matriz.data[inicio:fim], vocabulario, num_palavras_chunk
+            ))
+
+        pesos_corpus = np.asarray(matriz.sum(axis=0)).ravel()
+        palavras_corpus = self._maiores(
+            np.arange(len(pesos_corpus)), pesos_corpus, vocabulario, num_palavras_corpus
+        )
+
+        return palavras_corpus, por_chunk
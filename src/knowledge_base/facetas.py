@@ -0,0 +1,107 @@
+"""
+Facetas dos documentos extraídas do caminho do arquivo.
+
+O acervo é organizado em pastas por categoria (ex.: "Gestão_do_Cliente") e os
+nomes dos arquivos indicam o tipo de documento (FT, MOA, SEBRAETEC), o código do
+produto (ex.: "GQ13029-3") e a carga horária (ex.: "_15h"). Essas informações
+são gravadas nos metadados de cada chunk e permitem buscas filtradas.
+"""
+
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+CAMPOS_FACETAS = ("categoria", "tipo_documento", "codigo_produto", "carga_horaria")
+
+# Código de produto (ex.: "GQ13029-3"); o dígito final é opcional ("GQ13029" = todas as variações).
+# Mesmo padrão da faceta codigo_produto e do índice de códigos (ver indice_codigos)
+PADRAO_CODIGO_PRODUTO = re.compile(r"(?<![A-Za-z0-9])([A-Za-z]{1,4}\d{5})(?:-(\d))?(?![\d-])")
+PADRAO_CARGA_HORARIA = re.compile(r"(?<!\d)(\d{1,3})\s*h(?:oras?)?(?![a-z])", re.IGNORECASE)
+PADRAO_MOA = re.compile(r"(?<![A-Za-z])MOA(?![A-Za-z])|manual de orienta", re.IGNORECASE)
+PADRAO_FT = re.compile(r"(?<![A-Za-z])FT(?![A-Za-z])|ficha t[eé]cnica", re.IGNORECASE)
+PADRAO_MATERIAL = re.compile(r"material|livro|slides|manual do participante", re.IGNORECASE)
+
+OPERADORES_FILTRO = ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin")
+
+
+def formatar_codigo(correspondencia: re.Match) -> str:
+    """Normaliza um código encontrado por PADRAO_CODIGO_PRODUTO (maiúsculas, com o dígito final se houver)."""
+    base, digito = correspondencia.groups()
+    return f"{base.upper()}-{digito}" if digito else base.upper()
+
+
+@lru_cache(maxsize=4096)
+def extrair_facetas(caminho: str) -> Dict[str, Any]:
+    """
+    Extrai as facetas de um documento a partir do seu caminho.
+
+    Args:
+        caminho: Caminho do arquivo
+
+    Returns:
+        Dicionário com categoria, tipo_documento e, quando presentes no nome,
+        codigo_produto e carga_horaria (em horas)
+    """
+    # Nomes vindos do macOS podem estar em Unicode decomposto (NFD)
+    caminho = unicodedata.normalize("NFC", caminho)
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    codigo = PADRAO_CODIGO_PRODUTO.search(nome)
+
+    if PADRAO_MOA.search(nome):
+        tipo = "MOA"
+    elif "SEBRAETEC" in nome.upper() or codigo:
+        tipo = "SEBRAETEC"
+    elif PADRAO_FT.search(nome):
+        tipo = "FT"
+    elif PADRAO_MATERIAL.search(nome):
+        tipo = "MATERIAL_PARTICIPANTE"
+    else:
+        tipo = "OUTRO"
+
+    facetas = {
+        "categoria": os.path.basename(os.path.dirname(caminho)),
+        "tipo_documento": tipo,
+    }
+    if codigo:
+        facetas["codigo_produto"] = formatar_codigo(codigo)
+    carga = PADRAO_CARGA_HORARIA.search(nome)
+    if carga:
+        facetas["carga_horaria"] = int(carga.group(1))
+    return facetas
+
+
+def montar_filtro(filtros: Optional[Dict[str, Any]]) -> Optional[Dict]:
+    """
+    Converte filtros de facetas na cláusula where do ChromaDB.
+
+    Cada filtro pode ser um valor (igualdade), uma lista de valores ($in) ou
+    um dicionário com um operador do ChromaDB (ex.: {"$lte": 16}).
+
+    Args:
+        filtros: Dicionário campo -> valor, com campos de CAMPOS_FACETAS
+
+    Returns:
+        Cláusula where, ou None se não houver filtros
+
+    Raises:
+        ValueError: Se um campo ou operador não for suportado
+    """
+    if not filtros:
+        return None
+
+    condicoes = []
+    for campo, valor in filtros.items():
+        if campo not in CAMPOS_FACETAS:
+            raise ValueError(f"Filtro não suportado: {campo} (use {', '.join(CAMPOS_FACETAS)})")
+        if isinstance(valor, dict):
+            if not valor or any(operador not in OPERADORES_FILTRO for operador in valor):
+                raise ValueError(f"Operador de filtro não suportado em {campo}: {list(valor)}")
+            condicoes.append({campo: valor})
+        elif isinstance(valor, (list, tuple, set)):
+            condicoes.append({campo: {"$in": list(valor)}})
+        else:
+            condicoes.append({campo: valor})
+
+    return condicoes[0] if len(condicoes) == 1 else {"$and": condicoes}
@@ -0,0 +1,211 @@
+"""
+Índice exato de códigos de produto (ex.: "GQ13029-3", "TD46010-2") -> chunks.
+
+Os nomes das fichas técnicas trazem o código do produto e os analistas muitas
+vezes colam só o código na pergunta. Com este índice, mantido na ingestão, os
+chunks de um produto são lidos diretamente, sem embedding da consulta e sem
+busca vetorial. Um código sem o dígito final (ex.: "GQ13029") encontra todas as
+variações do produto.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from .facetas import PADRAO_CODIGO_PRODUTO, formatar_codigo
+
+
+def extrair_codigos(texto: str) -> List[str]:
+    """
+    Extrai os códigos de produto citados em um texto.
+
+    Args:
+        texto: Consulta, texto de chunk ou nome de arquivo
+
+    Returns:
+        Códigos em maiúsculas, sem repetição e na ordem em que aparecem
+        (com o dígito final quando presente, ex.: "GQ13029-3", ou só a base, "GQ13029")
+    """
+    codigos = []
+    for correspondencia in PADRAO_CODIGO_PRODUTO.finditer(texto):
+        codigo = formatar_codigo(correspondencia)
+        if codigo not in codigos:
+            codigos.append(codigo)
+    return codigos
+
+
+def distribuir_por_codigo(listas: List[List[str]], num_resultados: Optional[int] = None) -> List[str]:
+    """
+    Reparte o número de chunks entre os códigos, um chunk de cada código por vez.
+
+    Assim, uma consulta que compara dois produtos traz chunks dos dois, em vez
+    de preencher todas as posições com o primeiro.
+
+    Args:
+        listas: IDs dos chunks de cada código, na ordem de preferência
+        num_resultados: Número máximo de chunks (None = todos)
+
+    Returns:
+        IDs sem repetição, agrupados por código e na ordem de cada lista
+    """
+    selecionados: List[List[str]] = [[] for _ in listas]
+    vistos: Set[str] = set()
+    posicoes = [0] * len(listas)
+    total = 0
+    while num_resultados is None or total < num_resultados:
+        avancou = False
+        for indice, lista in enumerate(listas):
+            while posicoes[indice] < len(lista) and lista[posicoes[indice]] in vistos:
+                posicoes[indice] += 1
+            if posicoes[indice] == len(lista) or (num_resultados is not None and total >= num_resultados):
+                continue
+            chunk_id = lista[posicoes[indice]]
+            posicoes[indice] += 1
+            vistos.add(chunk_id)
+            selecionados[indice].append(chunk_id)
+            total += 1
+            avancou = True
+        if not avancou:
+            break
+    return [chunk_id for selecionados_codigo in selecionados for chunk_id in selecionados_codigo]
+
+
+class IndiceCodigos:
+    """Índice código de produto -> chunks, persistido em SQLite."""
+
+    def __init__(self, caminho_banco: str):
+        """
+        Abre (ou cria) o índice.
+
+        Args:
+            caminho_banco: Caminho do arquivo SQLite do índice
+        """
+        self.caminho_banco = caminho_banco
+        os.makedirs(os.path.dirname(caminho_banco) or ".", exist_ok=True)
+
+        self._trava = threading.RLock()
+        self._conexao = sqlite3.connect(caminho_banco, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS codigos (
+                codigo TEXT NOT NULL,
+                base TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                caminho TEXT,
+                ordem INTEGER,
+                no_nome INTEGER NOT NULL,
+                PRIMARY KEY (codigo, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_codigos_base ON codigos(base);
+            CREATE INDEX IF NOT EXISTS idx_codigos_chunk ON codigos(chunk_id);
+        """)
+
+    @property
+    def construido(self) -> bool:
+        """Indica se o índice já foi preenchido alguma vez (mesmo que sem nenhum código)."""
+        return self._conexao.execute("PRAGMA user_version").fetchone()[0] > 0
+
+    def _remover(self, ids: List[str]):
+        self._conexao.executemany("DELETE FROM codigos WHERE chunk_id = ?", [(chunk_id,) for chunk_id in ids])
+
+    def indexar(self, ids: List[str], textos: List[str], metadados: List[Dict]):
+        """
+        Indexa (ou reindexa) os códigos citados nos chunks e no nome dos seus arquivos.
+
+        Args:
+            ids: IDs dos chunks na coleção
+            textos: Texto de cada chunk
+            metadados: Metadados de cada chunk (caminho, chunk_id, codigo_produto)
+        """
+        linhas = []
+        for chunk_id, texto, meta in zip(ids, textos, metadados):
+            caminho = meta.get("caminho") or ""
+            no_nome = set(extrair_codigos(os.path.basename(caminho)))
+            if meta.get("codigo_produto"):
+                no_nome.add(meta["codigo_produto"])
+            for codigo in no_nome | set(extrair_codigos(texto or "")):
+                linhas.append((codigo, codigo.split("-")[0], chunk_id, caminho, meta.get("chunk_id"),
+                               int(codigo in no_nome)))
+
+        with self._trava:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                self._remover(ids)
+                self._conexao.executemany(
+                    "INSERT OR REPLACE INTO codigos (codigo, base, chunk_id, caminho, ordem, no_nome) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    linhas
+                )
+                self._conexao.execute("PRAGMA user_version = 1")
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+
+    def remover(self, ids: Iterable[str]):
+        """
+        Remove chunks do índice.
+
+        Args:
+            ids: IDs dos chunks
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        with self._trava:
+            self._remover(ids)
+
+    def limpar(self):
+        """Remove todos os códigos do índice."""
+        with self._trava:
+            self._conexao.execute("DELETE FROM codigos")
+
+    def fechar(self):
+        """Fecha a conexão com o banco."""
+        with self._trava:
+            self._conexao.close()
+
+    def buscar_por_codigo(self, codigos: List[str], somente_nome: bool = False) -> List[List[str]]:
+        """
+        Busca os chunks associados a cada código, separadamente.
+
+        Chunks de arquivos cujo nome traz o código vêm primeiro, na ordem do
+        documento; depois, chunks de outros arquivos que citam o código.
+
+        Args:
+            codigos: Códigos completos ("GQ13029-3") ou só a base ("GQ13029")
+            somente_nome: Apenas chunks de arquivos cujo nome traz o código
+                (o produto em si, e não documentos que só o citam)
+
+        Returns:
+            Lista de IDs dos chunks de cada código, na ordem dos códigos
+        """
+        listas = []
+        with self._trava:
+            for codigo in codigos:
+                coluna = "codigo" if "-" in codigo else "base"
+                linhas = self._conexao.execute(
+                    f"SELECT chunk_id FROM codigos WHERE {coluna} = ? "
+                    + ("AND no_nome = 1 " if somente_nome else "")
+                    + "ORDER BY no_nome DESC, caminho, ordem",
+                    (codigo.upper(),)
+                ).fetchall()
+                listas.append([chunk_id for (chunk_id,) in linhas])
+        return listas
+
+    def buscar(self, codigos: List[str], num_resultados: Optional[int] = None,
+               somente_nome: bool = False) -> List[str]:
+        """
+        Busca os chunks associados aos códigos, repartindo o limite entre eles.
+
+        Args:
+            codigos: Códigos completos ("GQ13029-3") ou só a base ("GQ13029")
+            num_resultados: Número máximo de chunks (None = todos)
+            somente_nome: Apenas chunks de arquivos cujo nome traz o código
+
+        Returns:
+            IDs dos chunks, sem repetição (ver distribuir_por_codigo)
+        """
+        return distribuir_por_codigo(self.buscar_por_codigo(codigos, somente_nome), num_resultados)
@@ -0,0 +1,253 @@
+"""
+Índice invertido BM25 sobre o texto dos chunks, persistido em SQLite.
+
+Complementa a busca vetorial em consultas com códigos de produto (ex.:
+"GQ13022"), siglas ("PBQP-H") e nomes próprios de soluções ("Cliente Oculto"),
+que os embeddings nem sempre aproximam. O índice é atualizado a cada chunk
+gravado na base, sem reconstrução; os totais usados na pontuação são relidos
+quando outro processo (monitor, API, CLI) altera o banco.
+"""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from .extrator_palavras_chave import STOPWORDS_PT
+
+PADRAO_TOKEN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+# Regras de plural do português (após remover acentos), na ordem de aplicação
+SUFIXOS_PLURAL = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"),
+                  ("res", "r"), ("zes", "z"), ("ns", "m"))
+
+
+def remover_acentos(texto: str) -> str:
+    """Remove acentos e cedilhas, mantendo as letras base."""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+STOPWORDS_NORMALIZADAS = frozenset(remover_acentos(palavra) for palavra in STOPWORDS_PT)
+
+
+def reduzir_palavra(palavra: str) -> str:
+    """
+    Stemmer leve para português: remove plural, sufixo adverbial e vogal temática.
+
+    Args:
+        palavra: Palavra em minúsculas e sem acentos
+
+    Returns:
+        Radical da palavra
+    """
+    if len(palavra) <= 3 or not palavra.isalpha():
+        return palavra
+
+    for sufixo, substituto in SUFIXOS_PLURAL:
+        if palavra.endswith(sufixo) and len(palavra) > len(sufixo) + 2:
+            palavra = palavra[:-len(sufixo)] + substituto
+            break
+    else:
+        if palavra.endswith("s") and not palavra.endswith("ss"):
+            palavra = palavra[:-1]
+
+    if palavra.endswith("mente") and len(palavra) > 7:
+        palavra = palavra[:-5]
+    if len(palavra) > 4 and palavra[-1] in "aeo":
+        palavra = palavra[:-1]
+    return palavra
+
+
+def tokenizar(texto: str) -> List[str]:
+    """
+    Converte um texto nos termos do índice.
+
+    Termos com hífen (códigos como "gq13022-4" ou siglas como "pbqp-h") são
+    indexados inteiros e também por partes, para casar com consultas que
+    citam só o prefixo.
+
+    Args:
+        texto: Texto livre
+
+    Returns:
+        Lista de termos (com repetição)
+    """
+    termos = []
+    for token in PADRAO_TOKEN.findall(remover_acentos(texto.lower())):
+        partes = token.split("-")
+        if len(partes) > 1:
+            termos.append(token)
+        for parte in partes:
+            if parte and parte not in STOPWORDS_NORMALIZADAS and (len(parte) > 1 or parte.isdigit()):
+                termos.append(reduzir_palavra(parte))
+    return termos
+
+
+class IndiceBM25:
+    """Índice lexical BM25 dos chunks da base de conhecimento."""
+
+    def __init__(self, caminho_banco: str, k1: float = 1.5, b: float = 0.75):
+        """
+        Abre (ou cria) o índice.
+
+        Args:
+            caminho_banco: Caminho do arquivo SQLite do índice
+            k1: Saturação da frequência do termo
+            b: Peso da normalização pelo tamanho do chunk
+        """
+        self.caminho_banco = caminho_banco
+        self.k1 = k1
+        self.b = b
+        os.makedirs(os.path.dirname(caminho_banco) or ".", exist_ok=True)
+
+        self._trava = threading.RLock()
+        self._conexao = sqlite3.connect(caminho_banco, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                tamanho INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                termo TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                frequencia INTEGER NOT NULL,
+                PRIMARY KEY (termo, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(chunk_id);
+        """)
+        self._atualizar_totais()
+
+    def _atualizar_totais(self):
+        """Recalcula número de chunks e tamanho médio usados na pontuação."""
+        total, media = self._conexao.execute("SELECT COUNT(*), AVG(tamanho) FROM chunks").fetchone()
+        self.total_chunks = total
+        self.tamanho_medio = media or 0.0
+        self._versao_dados = self._conexao.execute("PRAGMA data_version").fetchone()[0]
+
+    def _sincronizar_totais(self):
+        """
+        Relê os totais se outra conexão gravou no banco desde a última leitura.
+
+        O PRAGMA data_version muda a cada commit de outra conexão (inclusive de
+        outros processos); as gravações desta conexão já atualizam os totais.
+        """
+        with self._trava:
+            if self._conexao.execute("PRAGMA data_version").fetchone()[0] != self._versao_dados:
+                self._atualizar_totais()
+
+    def __len__(self) -> int:
+        self._sincronizar_totais()
+        return self.total_chunks
+
+    def _remover(self, ids: List[str]):
+        for chunk_id in ids:
+            self._conexao.execute("DELETE FROM postings WHERE chunk_id = ?", (chunk_id,))
+            self._conexao.execute("DELETE FROM chunks WHERE id = ?", (chunk_id,))
+
+    def indexar(self, ids: List[str], textos: List[str]):
+        """
+        Indexa (ou reindexa) chunks.
+
+        Args:
+            ids: IDs dos chunks na coleção
+            textos: Texto de cada chunk
+        """
+        if not ids:
+            return
+        with self._trava:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                self._remover(ids)
+                for chunk_id, texto in zip(ids, textos):
+                    frequencias = Counter(tokenizar(texto))
+                    self._conexao.execute(
+                        "INSERT INTO chunks (id, tamanho) VALUES (?, ?)",
+                        (chunk_id, sum(frequencias.values()))
+                    )
+                    self._conexao.executemany(
+                        "INSERT INTO postings (termo, chunk_id, frequencia) VALUES (?, ?, ?)",
+                        [(termo, chunk_id, frequencia) for termo, frequencia in frequencias.items()]
+                    )
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+            self._atualizar_totais()
+
+    def remover(self, ids: Iterable[str]):
+        """
+        Remove chunks do índice.
+
+        Args:
+            ids: IDs dos chunks
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        with self._trava:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                self._remover(ids)
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+            self._atualizar_totais()
+
+    def limpar(self):
+        """Remove todos os chunks do índice."""
+        with self._trava:
+            self._conexao.execute("DELETE FROM postings")
+            self._conexao.execute("DELETE FROM chunks")
+            self._atualizar_totais()
+
+    def fechar(self):
+        """Fecha a conexão com o banco."""
+        with self._trava:
+            self._conexao.close()
+
+    def buscar(self, consulta: str, num_resultados: int = 10) -> List[Tuple[str, float]]:
+        """
+        Busca os chunks de maior pontuação BM25 para a consulta.
+
+        Args:
+            consulta: Texto da consulta
+            num_resultados: Número máximo de resultados
+
+        Returns:
+            Lista de (id do chunk, pontuação), da maior para a menor pontuação
+        """
+        termos = set(tokenizar(consulta))
+        if not termos:
+            return []
+
+        pontuacoes: Dict[str, float] = {}
+        with self._trava:
+            self._sincronizar_totais()
+            if not self.total_chunks:
+                return []
+            for termo in termos:
+                postings = self._conexao.execute(
+                    "SELECT p.chunk_id, p.frequencia, c.tamanho FROM postings p "
+                    "JOIN chunks c ON c.id = p.chunk_id WHERE p.termo = ?",
+                    (termo,)
+                ).fetchall()
+                if not postings:
+                    continue
+
+                frequencia_documentos = len(postings)
+                idf = math.log(1 + (self.total_chunks - frequencia_documentos + 0.5) / (frequencia_documentos + 0.5))
+                for chunk_id, frequencia, tamanho in postings:
+                    normalizacao = self.k1 * (1 - self.b + self.b * tamanho / (self.tamanho_medio or 1))
+                    pontuacoes[chunk_id] = pontuacoes.get(chunk_id, 0.0) + \
+                        idf * frequencia * (self.k1 + 1) / (frequencia + normalizacao)
+
+        melhores = sorted(pontuacoes.items(), key=lambda item: item[1], reverse=True)
+        return melhores[:num_resultados]
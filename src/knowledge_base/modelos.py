@@ -0,0 +1,234 @@
+"""
+Registro de modelos de embeddings compartilhado por todo o processo.
+
+Cada modelo SentenceTransformer é carregado uma única vez, no primeiro uso, e
+reaproveitado pela base de conhecimento, pelo processador de documentos e por
+qualquer outro componente que precise de embeddings.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from .cache_embeddings import CacheEmbeddings, hash_texto
+
+MODELO_EMBEDDINGS_PADRAO = 'distiluse-base-multilingual-cased-v2'
+TAMANHO_LOTE_EMBEDDINGS = 32
+
+# torch: SentenceTransformer/PyTorch; onnx: ONNX Runtime; onnx-int8: ONNX Runtime com pesos int8
+BACKENDS_EMBEDDINGS = ("torch", "onnx", "onnx-int8")
+
+_modelos: Dict[str, any] = {}
+_trava_modelos = threading.Lock()
+
+
+def _chave_modelo(nome_modelo: str, backend: str) -> str:
+    return nome_modelo if backend == "torch" else f"{nome_modelo}@{backend}"
+
+
+def obter_modelo(nome_modelo: str = MODELO_EMBEDDINGS_PADRAO, backend: str = "torch"):
+    """
+    Retorna o modelo de embeddings, carregando-o na primeira chamada.
+
+    Args:
+        nome_modelo: Nome do modelo no SentenceTransformers/Hugging Face
+        backend: Backend de inferência (ver BACKENDS_EMBEDDINGS)
+
+    Returns:
+        Instância compartilhada de SentenceTransformer (ou ModeloOnnx)
+    """
+    if backend not in BACKENDS_EMBEDDINGS:
+        raise ValueError(f"Backend de embeddings desconhecido: {backend}")
+
+    chave = _chave_modelo(nome_modelo, backend)
+    modelo = _modelos.get(chave)
+    if modelo is not None:
+        return modelo
+
+    with _trava_modelos:
+        modelo = _modelos.get(chave)
+        if modelo is None:
+            print(f"🧠 Carregando modelo de embeddings: {nome_modelo} ({backend})")
+            if backend == "torch":
+                from sentence_transformers import SentenceTransformer
+                modelo = SentenceTransformer(nome_modelo)
+            else:
+                from .backend_onnx import ModeloOnnx
+                modelo = ModeloOnnx(nome_modelo, quantizar=backend == "onnx-int8")
+            _modelos[chave] = modelo
+    return modelo
+
+
+def modelo_carregado(nome_modelo: str = MODELO_EMBEDDINGS_PADRAO, backend: str = "torch") -> bool:
+    """Indica se o modelo já foi carregado neste processo."""
+    return _chave_modelo(nome_modelo, backend) in _modelos
+
+
+class FuncaoEmbeddingCompartilhada(EmbeddingFunction):
+    """Função de embeddings do ChromaDB que usa o modelo do registro."""
+
+    def __init__(self, nome_modelo: str = MODELO_EMBEDDINGS_PADRAO, backend: str = "torch"):
+        """
+        Inicializa a função sem carregar o modelo.
+
+        Args:
+            nome_modelo: Nome do modelo SentenceTransformer
+            backend: Backend de inferência (ver BACKENDS_EMBEDDINGS)
+        """
+        self.nome_modelo = nome_modelo
+        self.backend = backend
+
+    def __call__(self, input: Documents) -> Embeddings:
+        modelo = obter_modelo(self.nome_modelo, self.backend)
+        return modelo.encode(list(input), convert_to_numpy=True).tolist()
+
+    @staticmethod
+    def name() -> str:
+        # Mesmo nome da função nativa, para coleções já persistidas continuarem compatíveis
+        return "sentence_transformer"
+
+    def get_config(self) -> Dict[str, any]:
+        return {"model_name": self.nome_modelo, "backend": self.backend}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, any]) -> "FuncaoEmbeddingCompartilhada":
+        # Configurações gravadas antes do backend ONNX não têm "backend": eram torch
+        return FuncaoEmbeddingCompartilhada(
+            config.get("model_name", MODELO_EMBEDDINGS_PADRAO), config.get("backend", "torch")
+        )
+
+
+class GeradorEmbeddings:
+    """
+    Etapa de embeddings da ingestão.
+
+    Ordena os textos pelo número de tokens e os envia ao modelo em micro-lotes
+    de tamanho fixo, de modo que cada lote reúne textos de tamanho parecido e
+    quase não há padding desperdiçado na inferência em CPU. Com um cache de
+    embeddings, textos já vistos não passam pelo modelo.
+    """
+
+    def __init__(self, nome_modelo: str = MODELO_EMBEDDINGS_PADRAO,
+                 tamanho_lote: int = TAMANHO_LOTE_EMBEDDINGS, num_threads: Optional[int] = None,
+                 cache: Optional[CacheEmbeddings] = None, backend: str = "torch"):
+        """
+        Inicializa a etapa sem carregar o modelo.
+
+        Args:
+            nome_modelo: Nome do modelo SentenceTransformer
+            backend: Backend de inferência (ver BACKENDS_EMBEDDINGS)
+            tamanho_lote: Número de textos por micro-lote
+            num_threads: Threads de CPU usadas pelo PyTorch (None mantém o padrão)
+            cache: Cache persistente de embeddings do mesmo modelo (opcional)
+        """
+        self.nome_modelo = nome_modelo
+        self.backend = backend
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.num_threads = num_threads
+        self.cache = cache
+        self._threads_configuradas = False
+        self.total_chunks = 0
+        self.acertos_cache = 0
+        self.tempo_total = 0.0
+
+    def _configurar_threads(self):
+        """Aplica a configuração de threads do PyTorch uma única vez."""
+        if self._threads_configuradas:
+            return
+        self._threads_configuradas = True
+        if self.num_threads:
+            try:
+                import torch
+                torch.set_num_threads(self.num_threads)
+            except ImportError:
+                pass
+
+    @staticmethod
+    def _contar_tokens(modelo, textos: List[str]) -> List[int]:
+        """Conta os tokens de cada texto (ou caracteres, se o modelo não expõe o tokenizador)."""
+        tokenizador = getattr(modelo, "tokenizer", None)
+        if tokenizador is None:
+            return [len(texto) for texto in textos]
+        tokens = tokenizador(
+            textos,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=getattr(modelo, "max_seq_length", None) or 512
+        )["input_ids"]
+        return [len(ids) for ids in tokens]
+
+    def _embedar(self, textos: List[str]) -> np.ndarray:
+        """Passa os textos pelo modelo em micro-lotes ordenados por número de tokens."""
+        modelo = obter_modelo(self.nome_modelo, self.backend)
+        self._configurar_threads()
+
+        ordem = np.argsort(self._contar_tokens(modelo, textos), kind="stable")
+        embeddings = None
+        for posicao in range(0, len(ordem), self.tamanho_lote):
+            indices = ordem[posicao:posicao + self.tamanho_lote]
+            lote = modelo.encode(
+                [textos[i] for i in indices],
+                batch_size=len(indices),
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            if embeddings is None:
+                embeddings = np.empty((len(textos), lote.shape[1]), dtype=np.float32)
+            embeddings[indices] = lote
+        return embeddings
+
+    def gerar(self, textos: List[str]) -> np.ndarray:
+        """
+        Gera os embeddings de uma lista de textos.
+
+        Args:
+            textos: Textos a converter
+
+        Returns:
+            Matriz (len(textos) x dimensão) na ordem dos textos recebidos
+        """
+        if not textos:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        inicio = time.perf_counter()
+        if self.cache is None:
+            embeddings = self._embedar(textos)
+        else:
+            hashes = [hash_texto(texto) for texto in textos]
+            encontrados = self.cache.ler(hashes)
+            faltantes = [i for i, vetor in enumerate(encontrados) if vetor is None]
+
+            novos = self._embedar([textos[i] for i in faltantes]) if faltantes else None
+            if novos is not None:
+                self.cache.gravar([hashes[i] for i in faltantes], novos)
+                for posicao, i in enumerate(faltantes):
+                    encontrados[i] = novos[posicao]
+            embeddings = np.vstack(encontrados).astype(np.float32, copy=False)
+            self.acertos_cache += len(textos) - len(faltantes)
+
+        self.tempo_total += time.perf_counter() - inicio
+        self.total_chunks += len(textos)
+        return embeddings
+
+    def desempenho(self) -> Dict[str, float]:
+        """
+        Retorna o desempenho acumulado desde a última chamada a reiniciar_contadores.
+
+        Returns:
+            Dicionário com chunks, acertos_cache, segundos e chunks_por_segundo
+        """
+        return {
+            "chunks": self.total_chunks,
+            "acertos_cache": self.acertos_cache,
+            "segundos": self.tempo_total,
+            "chunks_por_segundo": self.total_chunks / self.tempo_total if self.tempo_total else 0.0
+        }
+
+    def reiniciar_contadores(self):
+        """Zera os contadores de desempenho."""
+        self.total_chunks = 0
+        self.acertos_cache = 0
+        self.tempo_total = 0.0
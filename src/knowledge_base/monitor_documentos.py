@@ -0,0 +1,250 @@
+"""
+Monitoramento do diretório de documentos com ingestão incremental em segundo plano.
+
+Usa notificações do sistema de arquivos (inotify, via watchdog) quando
+disponíveis e, na falta delas, varreduras periódicas de tamanho/data de
+modificação. Eventos de um mesmo arquivo são agrupados (debounce) até o arquivo
+ficar estável, e só os arquivos adicionados, modificados ou removidos são
+reprocessados. Um arquivo cuja extração falha só é tentado de novo quando sua
+assinatura (tamanho, data de modificação, inode) muda.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from .processador_documentos import EXTENSOES_SUPORTADAS
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+EVENTO_ALTERADO = "alterado"
+EVENTO_REMOVIDO = "removido"
+
+
+class _ReceptorEventos(FileSystemEventHandler):
+    """Repassa ao monitor os eventos do watchdog que envolvem arquivos."""
+
+    def __init__(self, monitor: "MonitorDocumentos"):
+        self.monitor = monitor
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.monitor.registrar_evento(event.src_path, EVENTO_ALTERADO)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.monitor.registrar_evento(event.src_path, EVENTO_ALTERADO)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.monitor.registrar_evento(event.src_path, EVENTO_ALTERADO)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.monitor.registrar_evento(event.src_path, EVENTO_REMOVIDO)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.monitor.registrar_evento(event.src_path, EVENTO_REMOVIDO)
+            self.monitor.registrar_evento(event.dest_path, EVENTO_ALTERADO)
+
+
+class MonitorDocumentos:
+    """Mantém a base de conhecimento sincronizada com um diretório de documentos."""
+
+    def __init__(self, diretorio: str, base_conhecimento, processador,
+                 atraso_debounce: float = 2.0, intervalo_varredura: float = 30.0,
+                 usar_notificacoes: bool = True):
+        """
+        Inicializa o monitor sem iniciá-lo.
+
+        Args:
+            diretorio: Diretório monitorado (inclui subpastas)
+            base_conhecimento: Instância de BaseConhecimento a manter atualizada
+            processador: Instância de ProcessadorDocumentos usada na ingestão
+            atraso_debounce: Segundos sem novos eventos antes de processar um arquivo
+            intervalo_varredura: Segundos entre varreduras quando não há notificações
+            usar_notificacoes: Usa inotify/watchdog se estiver instalado
+        """
+        self.diretorio = diretorio
+        self.base_conhecimento = base_conhecimento
+        self.processador = processador
+        self.atraso_debounce = atraso_debounce
+        self.intervalo_varredura = intervalo_varredura
+        self.usar_notificacoes = usar_notificacoes and Observer is not None
+
+        self._pendentes: Dict[str, tuple] = {}
+        # Arquivos cuja indexação falhou -> assinatura do arquivo na falha
+        self._falhas: Dict[str, Dict] = {}
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observador = None
+
+    @staticmethod
+    def _arquivo_suportado(caminho: str) -> bool:
+        """Ignora temporários do Office/editores e extensões não suportadas."""
+        nome = os.path.basename(caminho)
+        if nome.startswith(("~$", ".")):
+            return False
+        return nome.lower().endswith(EXTENSOES_SUPORTADAS)
+
+    def registrar_evento(self, caminho: str, tipo: str):
+        """
+        Agenda o processamento de um arquivo após o período de debounce.
+
+        Args:
+            caminho: Caminho do arquivo
+            tipo: EVENTO_ALTERADO ou EVENTO_REMOVIDO
+        """
+        if not self._arquivo_suportado(caminho):
+            return
+        caminho = os.path.join(self.diretorio, os.path.relpath(caminho, self.diretorio))
+        with self._trava:
+            self._pendentes[caminho] = (tipo, time.monotonic())
+
+    def _falhou_sem_mudanca(self, caminho: str, assinatura: Optional[Dict]) -> bool:
+        """Indica se a indexação do arquivo já falhou com esta mesma assinatura."""
+        with self._trava:
+            return assinatura is not None and self._falhas.get(caminho) == assinatura
+
+    def sincronizar(self) -> int:
+        """
+        Compara o diretório com o controle da base e agenda as diferenças.
+
+        Usa apenas a assinatura (tamanho, data de modificação, inode) dos
+        arquivos; o conteúdo só é lido para os arquivos que de fato mudaram.
+        Arquivos cuja indexação falhou não são agendados enquanto a assinatura
+        for a mesma da falha.
+
+        Returns:
+            Número de arquivos agendados
+        """
+        controle = self.base_conhecimento.controle
+        prefixo = os.path.join(self.diretorio, "")
+        registrados = {caminho for caminho in controle.keys() if caminho.startswith(prefixo)}
+
+        agendados = 0
+        for raiz, _, arquivos in os.walk(self.diretorio):
+            for arquivo in arquivos:
+                caminho = os.path.join(raiz, arquivo)
+                if not self._arquivo_suportado(caminho):
+                    continue
+                registrados.discard(caminho)
+                registro = controle.get(caminho)
+                assinatura = self.base_conhecimento._assinatura_arquivo(caminho)
+                if self._falhou_sem_mudanca(caminho, assinatura):
+                    continue
+                if registro is None or assinatura is None or any(
+                    registro.get(campo) != valor for campo, valor in assinatura.items()
+                ):
+                    self.registrar_evento(caminho, EVENTO_ALTERADO)
+                    agendados += 1
+
+        for caminho in registrados:
+            self.registrar_evento(caminho, EVENTO_REMOVIDO)
+            agendados += 1
+        return agendados
+
+    def _aplicar(self, caminho: str, tipo: str):
+        """
+        Atualiza a base para um arquivo cujo período de debounce terminou.
+
+        Se a indexação falha, a assinatura do arquivo é anotada e o erro é
+        propagado; o arquivo volta a ser indexado quando a assinatura mudar.
+        """
+        nome = os.path.basename(caminho)
+        if tipo == EVENTO_REMOVIDO or not os.path.exists(caminho):
+            with self._trava:
+                self._falhas.pop(caminho, None)
+            if caminho in self.base_conhecimento.controle:
+                print(f"🗑️ Arquivo removido do diretório: {nome}")
+                self.base_conhecimento.remover_arquivo(caminho)
+            return
+
+        assinatura = self.base_conhecimento._assinatura_arquivo(caminho)
+        if self._falhou_sem_mudanca(caminho, assinatura):
+            return
+        if self.base_conhecimento.arquivo_ja_processado(caminho):
+            return
+
+        try:
+            num_chunks = self.processador.indexar_arquivo(caminho, self.base_conhecimento)
+        except Exception:
+            with self._trava:
+                self._falhas[caminho] = assinatura
+            raise
+        with self._trava:
+            self._falhas.pop(caminho, None)
+        print(f"🔄 Arquivo indexado pelo monitor: {nome} ({num_chunks} chunks)")
+
+    def processar_pendentes(self, forcar: bool = False) -> int:
+        """
+        Processa os arquivos cujo período de debounce já terminou.
+
+        Args:
+            forcar: Processa todos os pendentes, sem aguardar o debounce
+
+        Returns:
+            Número de arquivos processados
+        """
+        limite = time.monotonic() - self.atraso_debounce
+        with self._trava:
+            prontos = {
+                caminho: tipo for caminho, (tipo, instante) in self._pendentes.items()
+                if forcar or instante <= limite
+            }
+            for caminho in prontos:
+                del self._pendentes[caminho]
+
+        for caminho, tipo in sorted(prontos.items()):
+            try:
+                self._aplicar(caminho, tipo)
+            except Exception as e:
+                print(f"⚠️ Erro ao atualizar {os.path.basename(caminho)}: {e}")
+        return len(prontos)
+
+    def _executar(self):
+        """Laço da thread de segundo plano."""
+        self.sincronizar()
+        proxima_varredura = time.monotonic() + self.intervalo_varredura
+
+        while not self._parar.wait(min(self.atraso_debounce, 1.0) / 2):
+            if not self.usar_notificacoes and time.monotonic() >= proxima_varredura:
+                self.sincronizar()
+                proxima_varredura = time.monotonic() + self.intervalo_varredura
+            self.processar_pendentes()
+
+    def iniciar(self):
+        """Inicia o monitoramento em segundo plano."""
+        if self._thread is not None:
+            return
+
+        if self.usar_notificacoes:
+            self._observador = Observer()
+            self._observador.schedule(_ReceptorEventos(self), self.diretorio, recursive=True)
+            self._observador.start()
+            print(f"👀 Monitorando {self.diretorio} (notificações do sistema de arquivos)")
+        else:
+            print(f"👀 Monitorando {self.diretorio} (varredura a cada {self.intervalo_varredura:.0f}s)")
+
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="monitor-documentos", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        """Interrompe o monitoramento."""
+        self._parar.set()
+        if self._observador is not None:
+            self._observador.stop()
+            self._observador.join()
+            self._observador = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
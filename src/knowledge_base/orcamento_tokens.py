@@ -0,0 +1,198 @@
+"""
+Contagem de tokens e montagem do prompt dentro de um orçamento por modelo.
+
+O prompt enviado ao LLM é preenchido em ordem de prioridade: prompt de
+sistema, consulta (com as instruções que a acompanham), chunks da base na
+ordem de relevância e, por último, o histórico da conversa (das interações
+mais recentes para as mais antigas). O que não cabe no orçamento fica de fora,
+em vez de estourar a janela do modelo ou gastar tokens com histórico antigo.
+
+A contagem usa o tiktoken quando ele está instalado e a codificação está
+disponível localmente; caso contrário, uma estimativa conservadora por
+palavra (que tende a contar um pouco a mais do que o tokenizador real).
+O número de tokens de cada chunk é gravado nos metadados na ingestão
+("num_tokens"), de modo que a montagem do prompt não precisa recontá-los.
+"""
+
+import math
+import re
+from typing import Callable, Dict, List, Optional
+
+CODIFICACAO_TIKTOKEN = "cl100k_base"
+
+# Janela de contexto (entrada + resposta) por prefixo do nome do modelo
+JANELAS_CONTEXTO = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4": 8192,
+}
+
+# Orçamento padrão de tokens do prompt (entrada) por prefixo do nome do modelo;
+# menor que a janela para limitar custo e latência
+ORCAMENTOS_PROMPT = {
+    "gpt-3.5-turbo": 8000,
+    "gpt-4-32k": 12000,
+    "gpt-4-turbo": 12000,
+    "gpt-4o": 12000,
+    "gpt-4.1": 12000,
+    "gpt-4": 5000,
+}
+ORCAMENTO_PROMPT_PADRAO = 6000
+
+# Tokens de estrutura de cada mensagem do chat (papel e delimitadores) e da resposta
+TOKENS_POR_MENSAGEM = 4
+TOKENS_INICIO_RESPOSTA = 3
+
+PADRAO_PALAVRAS = re.compile(r"\d+|[^\W\d_]+|[^\w\s]|_+", re.UNICODE)
+
+_codificador = None
+_codificador_carregado = False
+
+
+def _obter_codificador():
+    """Carrega o tokenizador do tiktoken uma única vez (None se indisponível)."""
+    global _codificador, _codificador_carregado
+    if not _codificador_carregado:
+        _codificador_carregado = True
+        try:
+            import tiktoken
+            _codificador = tiktoken.get_encoding(CODIFICACAO_TIKTOKEN)
+        except Exception:
+            _codificador = None
+    return _codificador
+
+
+def estimar_tokens(texto: str) -> int:
+    """
+    Estima o número de tokens de um texto sem tokenizador.
+
+    Palavras em ASCII contam um token a cada 4 caracteres, palavras com
+    acentos um a cada 3, números um a cada 3 dígitos e cada sinal de
+    pontuação um token.
+
+    Args:
+        texto: Texto a estimar
+
+    Returns:
+        Número estimado de tokens
+    """
+    total = 0
+    for parte in PADRAO_PALAVRAS.findall(texto):
+        if parte.isdigit():
+            total += math.ceil(len(parte) / 3)
+        elif parte[0].isalpha():
+            total += math.ceil(len(parte) / (4 if parte.isascii() else 3))
+        else:
+            total += 1
+    return total
+
+
+def contar_tokens(texto: str) -> int:
+    """
+    Conta os tokens de um texto (tiktoken, se disponível, ou estimativa).
+
+    Args:
+        texto: Texto a contar
+
+    Returns:
+        Número de tokens
+    """
+    if not texto:
+        return 0
+    codificador = _obter_codificador()
+    if codificador is not None:
+        return len(codificador.encode(texto, disallowed_special=()))
+    return estimar_tokens(texto)
+
+
+def _por_prefixo(tabela: Dict[str, int], nome_modelo: str) -> Optional[int]:
+    prefixos = [prefixo for prefixo in tabela if nome_modelo.startswith(prefixo)]
+    return tabela[max(prefixos, key=len)] if prefixos else None
+
+
+def orcamento_modelo(nome_modelo: str, max_tokens_resposta: int, orcamento: Optional[int] = None) -> int:
+    """
+    Calcula o orçamento de tokens do prompt para um modelo.
+
+    Args:
+        nome_modelo: Nome do modelo (ex.: "gpt-4o-mini")
+        max_tokens_resposta: Tokens reservados para a resposta
+        orcamento: Orçamento configurado (None = padrão do modelo em ORCAMENTOS_PROMPT)
+
+    Returns:
+        Orçamento do prompt, limitado ao que cabe na janela do modelo junto com a resposta
+    """
+    if orcamento is None:
+        orcamento = _por_prefixo(ORCAMENTOS_PROMPT, nome_modelo) or ORCAMENTO_PROMPT_PADRAO
+    janela = _por_prefixo(JANELAS_CONTEXTO, nome_modelo)
+    if janela is not None:
+        orcamento = min(orcamento, janela - max_tokens_resposta)
+    return max(0, orcamento)
+
+
+def tokens_chunk(chunk: Dict) -> int:
+    """Tokens do texto de um chunk (dos metadados gravados na ingestão, se houver)."""
+    num_tokens = chunk.get("metadados", {}).get("num_tokens")
+    return num_tokens if num_tokens is not None else contar_tokens(chunk["texto"])
+
+
+def empacotar_contexto(prompt_sistema: str, consulta: str, chunks: List[Dict], historico: List[str],
+                       orcamento: int, formatar_chunk: Callable[[int, Dict], str],
+                       moldura_historico: str = "") -> Dict:
+    """
+    Escolhe os chunks e as interações do histórico que cabem no orçamento.
+
+    Prompt de sistema e consulta entram sempre; depois, os chunks na ordem
+    recebida (um chunk que não cabe é pulado e os seguintes, menores, ainda
+    podem entrar); por fim, o histórico, da interação mais recente para a
+    mais antiga.
+
+    Args:
+        prompt_sistema: Conteúdo da mensagem de sistema
+        consulta: Mensagem do usuário sem o contexto e o histórico (pergunta e instruções)
+        chunks: Chunks em ordem de prioridade (com "texto" e "metadados")
+        historico: Interações já formatadas, da mais antiga para a mais recente
+        orcamento: Orçamento de tokens do prompt
+        formatar_chunk: Função (posição, chunk) -> texto do chunk no prompt
+        moldura_historico: Cabeçalho e instruções que acompanham o histórico
+            (contados uma vez, se alguma interação entrar)
+
+    Returns:
+        Dicionário com os chunks e o histórico escolhidos (histórico na ordem
+        original) e "tokens": orçamento, sistema, consulta, chunks, historico,
+        total e quantidades de chunks e interações descartados
+    """
+    tokens = {
+        "orcamento": orcamento,
+        "sistema": contar_tokens(prompt_sistema) + TOKENS_POR_MENSAGEM,
+        "consulta": contar_tokens(consulta) + TOKENS_POR_MENSAGEM + TOKENS_INICIO_RESPOSTA,
+        "chunks": 0,
+        "historico": 0,
+    }
+    disponivel = orcamento - tokens["sistema"] - tokens["consulta"]
+
+    escolhidos = []
+    for chunk in chunks:
+        # Moldura do chunk no prompt (cabeçalho e rodapé) + texto já contado na ingestão
+        custo = contar_tokens(formatar_chunk(len(escolhidos), {**chunk, "texto": ""})) + tokens_chunk(chunk)
+        if custo <= disponivel:
+            escolhidos.append(chunk)
+            disponivel -= custo
+            tokens["chunks"] += custo
+
+    interacoes = []
+    for interacao in reversed(historico):
+        custo = contar_tokens(interacao) + (0 if interacoes else contar_tokens(moldura_historico))
+        if custo > disponivel:
+            break
+        interacoes.insert(0, interacao)
+        disponivel -= custo
+        tokens["historico"] += custo
+
+    tokens["total"] = tokens["sistema"] + tokens["consulta"] + tokens["chunks"] + tokens["historico"]
+    tokens["chunks_descartados"] = len(chunks) - len(escolhidos)
+    tokens["historico_descartado"] = len(historico) - len(interacoes)
+    return {"chunks": escolhidos, "historico": interacoes, "tokens": tokens}
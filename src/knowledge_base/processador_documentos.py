@@ -1,22 +1,121 @@
+import multiprocessing
 import os
-from typing import List, Dict, Optional
+import queue
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import groupby
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
 from pypdf import PdfReader
 from docx import Document
 from openpyxl import load_workbook
 import yake
-from sentence_transformers import SentenceTransformer
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .cache_extracao import CacheExtracao, calcular_hash_arquivo
+from .extrator_palavras_chave import ExtratorTfidf, FrequenciasDocumento
+from .facetas import extrair_facetas
+from .modelos import MODELO_EMBEDDINGS_PADRAO, obter_modelo
+
+EXTENSOES_SUPORTADAS = ('.pdf', '.docx', '.xlsx')
+
+# Quantidade de chunks entregues por vez ao escritor (e ao embedder) na ingestão
+TAMANHO_LOTE_CHUNKS = 64
+
+# Tamanho da janela de texto (em múltiplos de chunk_size) acumulada antes de dividir
+JANELA_EM_CHUNKS = 20
+
+# Lotes de um arquivo que um worker da ingestão paralela pode adiantar ao
+# processo principal antes de esperar que sejam gravados
+LOTES_EM_TRANSITO = 4
+
+# Processador exclusivo de cada processo do pool de ingestão paralela
+_processador_worker = None
+
+
+def _inicializar_worker(diretorio_cache: Optional[str], extrator_palavras_chave: str):
+    """Cria o processador usado pelo processo worker do pool."""
+    global _processador_worker
+    _processador_worker = ProcessadorDocumentos(
+        diretorio_cache=diretorio_cache,
+        extrator_palavras_chave=extrator_palavras_chave
+    )
+
+
+def _processar_arquivo_worker(caminho: str, fila) -> Tuple[int, int]:
+    """
+    Processa um arquivo dentro de um worker, enviando os lotes de chunks pela
+    fila do arquivo à medida que ficam prontos.
+    
+    A fila é limitada (LOTES_EM_TRANSITO): o worker espera enquanto o processo
+    principal não grava os lotes anteriores, de modo que um arquivo grande não
+    é acumulado inteiro na memória. O último item da fila traz o resultado da
+    extração, com o erro (para que uma falha não seja confundida com um
+    arquivo sem texto) ou o hash do arquivo.
+    
+    Returns:
+        PID do worker e número de chunks enviados
+    """
+    num_chunks = 0
+    info_arquivo = {}
+    try:
+        for lote in _processador_worker.processar_arquivo_em_lotes(caminho, info_arquivo=info_arquivo):
+            num_chunks += len(lote)
+            fila.put((lote, None))
+    except Exception as e:
+        try:
+            fila.put(([], {"erro": e}))
+        except Exception:
+            # Exceção que não pode ser serializada: envia só a mensagem
+            fila.put(([], {"erro": RuntimeError(str(e))}))
+    else:
+        fila.put(([], {"erro": None, "hash_arquivo": info_arquivo.get("hash_arquivo")}))
+    return os.getpid(), num_chunks
+
+
+def _receber_lotes(fila, futuro: Future) -> Iterator[Tuple[List[Dict[str, any]], Optional[Dict]]]:
+    """
+    Recebe os lotes de um arquivo enviados por _processar_arquivo_worker, até
+    o resultado da extração. Se o worker morrer sem enviá-lo, o erro do futuro
+    vira o resultado.
+    """
+    while True:
+        try:
+            lote, fim = fila.get(timeout=1)
+        except queue.Empty:
+            if not futuro.done():
+                continue
+            try:
+                lote, fim = fila.get_nowait()
+            except queue.Empty:
+                erro = futuro.exception() or RuntimeError("o worker terminou sem concluir o arquivo")
+                lote, fim = [], {"erro": erro}
+        yield lote, fim
+        if fim is not None:
+            return
+
 
 class ProcessadorDocumentos:
     """Processa diferentes tipos de documentos e extrai palavras-chave."""
     
-    def __init__(self):
-        """Inicializa o processador com os modelos necessários."""
+    def __init__(self, diretorio_cache: Optional[str] = ".cache_extracao",
+                 extrator_palavras_chave: str = "yake"):
+        """
+        Inicializa o processador com os modelos necessários.
+        
+        Args:
+            diretorio_cache: Diretório do cache de texto extraído (None desativa o cache)
+            extrator_palavras_chave: "yake" (por chunk) ou "tfidf" (vetorizado por lote de chunks)
+        """
+        if extrator_palavras_chave not in ("yake", "tfidf"):
+            raise ValueError(f"Extrator de palavras-chave desconhecido: {extrator_palavras_chave}")
+        
+        self.chunk_size = 1000
+        self.chunk_overlap = 200
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
             length_function=len
         )
+        self.tamanho_janela = self.chunk_size * JANELA_EM_CHUNKS
         
         # Inicializa os modelos para extração de palavras-chave
         self.keyword_extractor = yake.KeywordExtractor(
@@ -28,8 +127,16 @@ class ProcessadorDocumentos:
             top=20,
             features=None
         )
-        self.sentence_model = SentenceTransformer('distiluse-base-multilingual-cased-v2')
+        self.extrator_palavras_chave = extrator_palavras_chave
+        self.extrator_tfidf = ExtratorTfidf()
+        # Cache de texto extraído e chunks, endereçado pelo hash do arquivo
+        self.cache_extracao = CacheExtracao(diretorio_cache) if diretorio_cache else None
         
+    @property
+    def sentence_model(self):
+        """Modelo de embeddings compartilhado, carregado apenas quando usado."""
+        return obter_modelo(MODELO_EMBEDDINGS_PADRAO)
+    
     def extrair_palavras_chave(self, texto: str, num_palavras: int = 5) -> List[str]:
         """
         Extrai palavras-chave do texto usando YAKE.
@@ -46,121 +153,528 @@ class ProcessadorDocumentos:
         keywords.sort(key=lambda x: x[1])  # Ordena por relevância
         return [k[0] for k in keywords[:num_palavras]]
     
-    def processar_pdf(self, caminho: str) -> Dict[str, any]:
-        """Processa arquivo PDF."""
+    def _extrair_paginas_pdf(self, caminho: str) -> Iterator[str]:
+        """Extrai o texto de um PDF página a página, sem montar o documento inteiro."""
+        reader = PdfReader(caminho)
+        for page in reader.pages:
+            yield (page.extract_text() or "") + "\n"
+    
+    def _extrair_paragrafos_docx(self, caminho: str) -> Iterator[str]:
+        """Extrai o texto de um arquivo Word parágrafo a parágrafo."""
+        doc = Document(caminho)
+        for i, paragraph in enumerate(doc.paragraphs):
+            yield ("\n" if i else "") + paragraph.text
+    
+    def _extrair_linhas_xlsx(self, caminho: str) -> Iterator[str]:
+        """Extrai o texto de uma planilha Excel linha a linha."""
+        wb = load_workbook(caminho, data_only=True)
+        for sheet in wb.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                yield " ".join([str(cell) if cell is not None else "" for cell in row]) + "\n"
+    
+    def _processar_documento(self, caminho: str, extrair_segmentos, tipo: str) -> Dict[str, any]:
+        """
+        Processa um documento a partir da função que extrai seus segmentos de texto.
+        
+        Args:
+            caminho: Caminho do arquivo
+            extrair_segmentos: Função que gera os segmentos de texto do arquivo
+            tipo: Tipo do documento, usado nas mensagens de erro
+            
+        Returns:
+            Dicionário com chunks de texto e palavras-chave, ou None em caso de erro
+        """
         try:
-            reader = PdfReader(caminho)
-            texto = ""
-            for page in reader.pages:
-                texto += page.extract_text() + "\n"
-            return self._processar_texto(texto, caminho)
+            palavras_chave = []
+            chunks = list(self._gerar_chunks_arquivo(caminho, extrair_segmentos, palavras_chave))
+            return {
+                "chunks": chunks,
+                "palavras_chave": palavras_chave
+            }
         except Exception as e:
-            print(f"Erro ao processar PDF {caminho}: {str(e)}")
+            print(f"Erro ao processar {tipo} {caminho}: {str(e)}")
             return None
+    
+    def processar_pdf(self, caminho: str) -> Dict[str, any]:
+        """Processa arquivo PDF."""
+        return self._processar_documento(caminho, self._extrair_paginas_pdf, "PDF")
             
     def processar_docx(self, caminho: str) -> Dict[str, any]:
         """Processa arquivo Word."""
-        try:
-            doc = Document(caminho)
-            texto = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            return self._processar_texto(texto, caminho)
-        except Exception as e:
-            print(f"Erro ao processar DOCX {caminho}: {str(e)}")
-            return None
+        return self._processar_documento(caminho, self._extrair_paragrafos_docx, "DOCX")
             
     def processar_xlsx(self, caminho: str) -> Dict[str, any]:
         """Processa arquivo Excel."""
-        try:
-            wb = load_workbook(caminho, data_only=True)
-            texto = ""
-            for sheet in wb.worksheets:
-                for row in sheet.iter_rows(values_only=True):
-                    texto += " ".join([str(cell) if cell is not None else "" for cell in row]) + "\n"
-            return self._processar_texto(texto, caminho)
-        except Exception as e:
-            print(f"Erro ao processar XLSX {caminho}: {str(e)}")
-            return None
+        return self._processar_documento(caminho, self._extrair_linhas_xlsx, "XLSX")
     
-    def _processar_texto(self, texto: str, caminho: str) -> Dict[str, any]:
+    def _configuracao_divisor(self) -> Dict[str, any]:
+        """Parâmetros que determinam os chunks gerados a partir de um mesmo texto."""
+        configuracao = {
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "tamanho_janela": self.tamanho_janela,
+            "palavras_chave": self.extrator_palavras_chave
+        }
+        if self.extrator_palavras_chave == "tfidf":
+            # IDF acumulado entre as janelas do documento (ver _palavras_chave_janela)
+            configuracao["idf"] = "documento"
+        return configuracao
+    
+    def _gerar_chunks_arquivo(self, caminho: str, extrair_segmentos,
+                              palavras_documento: Optional[List[str]] = None,
+                              info_arquivo: Optional[Dict] = None) -> Iterator[Dict[str, any]]:
         """
-        Processa o texto extraído, gerando chunks e palavras-chave.
+        Gera os chunks de um arquivo, reaproveitando o cache de extração.
+        
+        Se os chunks do arquivo (pelo hash do conteúdo) já existem para a
+        configuração atual do divisor, eles são lidos do cache sem abrir o
+        documento. Se apenas o texto extraído existe, o parsing é pulado e o
+        texto é dividido novamente. Caso contrário o documento é extraído e
+        ambos os níveis são gravados no cache durante o processamento.
         
         Args:
-            texto: Texto extraído do documento
             caminho: Caminho do arquivo
+            extrair_segmentos: Função que gera os segmentos de texto do arquivo
+            palavras_documento: Lista opcional que recebe as palavras-chave do documento
+            info_arquivo: Dicionário opcional que recebe o "hash_arquivo" calculado
+                (para o controle não ler o arquivo de novo)
             
-        Returns:
-            Dicionário com chunks de texto e metadados
+        Yields:
+            Chunks com metadados, na ordem de chunk_id
         """
-        # Extrai palavras-chave do texto completo
-        palavras_chave = self.extrair_palavras_chave(texto)
+        if palavras_documento is None:
+            palavras_documento = []
         
-        # Divide o texto em chunks
-        chunks = self.text_splitter.split_text(texto)
+        if self.cache_extracao is None:
+            yield from self._gerar_chunks(extrair_segmentos(caminho), caminho, palavras_documento)
+            return
         
-        # Cria chunks de documento com metadados
-        nome_arquivo = os.path.basename(caminho)
-        doc_chunks = []
+        hash_arquivo = calcular_hash_arquivo(caminho)
+        if info_arquivo is not None:
+            info_arquivo["hash_arquivo"] = hash_arquivo
+        chave = CacheExtracao.chave_configuracao(self._configuracao_divisor())
         
-        for i, chunk in enumerate(chunks):
-            # Extrai palavras-chave específicas do chunk
-            chunk_keywords = self.extrair_palavras_chave(chunk, num_palavras=3)
-            
-            # Junta as palavras-chave em uma única string
-            keywords_str = ", ".join(palavras_chave + chunk_keywords)
-
-            doc_chunks.append({
-                "texto": chunk,
-                "metadados": {
-                    "fonte": nome_arquivo,
-                    "caminho": caminho,
-                    "chunk_id": i,
-                    "palavras_chave": keywords_str
-                }
-            })
+        em_cache = self.cache_extracao.ler_chunks(hash_arquivo, chave)
+        if em_cache is not None:
+            palavras_documento.extend(em_cache["palavras_chave"])
+            for item in em_cache["chunks"]:
+                yield self._criar_chunk(item["texto"], caminho, item["chunk_id"], item["palavras_chave"])
+            return
+        
+        segmentos = self.cache_extracao.ler_texto(hash_arquivo)
+        if segmentos is None:
+            segmentos = self.cache_extracao.gravar_texto(hash_arquivo, extrair_segmentos(caminho))
         
+        chunks = self._gerar_chunks(segmentos, caminho, palavras_documento)
+        yield from self.cache_extracao.gravar_chunks(hash_arquivo, chave, chunks, palavras_documento)
+    
+    def _criar_chunk(self, texto: str, caminho: str, chunk_id: int, palavras_chave: str) -> Dict[str, any]:
+        """Cria o dicionário do chunk com os metadados gravados na base (inclui as facetas do arquivo)."""
         return {
-            "chunks": doc_chunks,
-            "palavras_chave": palavras_chave
+            "texto": texto,
+            "metadados": {
+                "fonte": os.path.basename(caminho),
+                "caminho": caminho,
+                "chunk_id": chunk_id,
+                "palavras_chave": palavras_chave,
+                **extrair_facetas(caminho)
+            }
         }
     
-    def processar_diretorio(self, diretorio: str, ignorar_arquivos: set = None) -> List[Dict[str, any]]:
+    def _gerar_chunks(self, segmentos: Iterable[str], caminho: str,
+                      palavras_documento: Optional[List[str]] = None) -> Iterator[Dict[str, any]]:
         """
-        Processa todos os documentos suportados em um diretório.
+        Divide em chunks um texto recebido em partes (ex.: páginas de um PDF),
+        mantendo em memória apenas uma janela limitada do documento.
+        
+        As páginas são acumuladas até atingir tamanho_janela caracteres; a janela
+        é então dividida e todos os chunks, exceto o último, são entregues. O
+        último volta para o início da próxima janela, preservando a continuidade
+        entre páginas. As palavras-chave do documento são extraídas da primeira
+        janela (o documento inteiro, quando ele cabe em uma janela), pois vão
+        nos metadados de todos os chunks, inclusive os já entregues. Com o
+        extrator TF-IDF, o IDF de cada janela considera todos os chunks do
+        documento entregues até ela.
         
         Args:
-            diretorio: Caminho do diretório com os documentos
-            ignorar_arquivos: Um conjunto de caminhos de arquivos a serem ignorados.
+            segmentos: Partes consecutivas do texto do documento
+            caminho: Caminho do arquivo
+            palavras_documento: Lista opcional que recebe as palavras-chave do documento
+            
+        Yields:
+            Chunks com metadados, na ordem de chunk_id
+        """
+        buffer = []
+        tamanho_buffer = 0
+        palavras_chave = None
+        chunk_id = 0
+        frequencias = FrequenciasDocumento()
+        
+        def emitir(texto: str, final: bool) -> Iterator[Dict[str, any]]:
+            nonlocal palavras_chave, chunk_id
+            partes = self.text_splitter.split_text(texto)
+            emitidas = len(partes) if final else max(len(partes) - 1, 0)
+            
+            palavras_janela, palavras_chunks = self._palavras_chave_janela(
+                texto, partes, emitidas, incluir_documento=palavras_chave is None, frequencias=frequencias
+            )
+            if palavras_chave is None:
+                palavras_chave = palavras_janela
+                if palavras_documento is not None:
+                    palavras_documento.extend(palavras_chave)
+            
+            for parte, chaves_chunk in zip(partes[:emitidas], palavras_chunks):
+                yield self._criar_chunk(parte, caminho, chunk_id, ", ".join(palavras_chave + chaves_chunk))
+                chunk_id += 1
+            return partes[emitidas:]
+        
+        for segmento in segmentos:
+            buffer.append(segmento)
+            tamanho_buffer += len(segmento)
+            if tamanho_buffer < self.tamanho_janela:
+                continue
+            
+            buffer = yield from emitir("".join(buffer), final=False)
+            tamanho_buffer = sum(len(parte) for parte in buffer)
+        
+        yield from emitir("".join(buffer), final=True)
+    
+    def _palavras_chave_janela(self, texto: str, partes: List[str], emitidas: int, incluir_documento: bool,
+                               frequencias: Optional[FrequenciasDocumento] = None
+                               ) -> Tuple[Optional[List[str]], List[List[str]]]:
+        """
+        Extrai as palavras-chave de uma janela de texto já dividida em chunks.
+        
+        Com o extrator "tfidf" os chunks entregues da janela são pontuados em
+        uma única passada vetorizada, com o IDF acumulado em frequencias desde
+        a primeira janela do documento (o último chunk de uma janela
+        intermediária volta para a próxima e só é contado nela); com "yake"
+        cada chunk é analisado separadamente.
+        
+        Args:
+            texto: Texto completo da janela
+            partes: Chunks da janela
+            emitidas: Quantidade de chunks (do início) que serão entregues
+            incluir_documento: Se deve extrair também as palavras-chave do documento
+            frequencias: Frequências dos termos nas janelas anteriores do documento
             
         Returns:
-            Lista de chunks de documentos com metadados
+            Tupla (palavras do documento ou None, palavras de cada chunk entregue)
         """
-        if ignorar_arquivos is None:
-            ignorar_arquivos = set()
+        if self.extrator_palavras_chave == "tfidf":
+            palavras_corpus, por_chunk = self.extrator_tfidf.extrair(
+                partes[:emitidas], num_palavras_chunk=3, frequencias=frequencias
+            )
+            return (palavras_corpus if incluir_documento else None), por_chunk
+        
+        palavras_documento = self.extrair_palavras_chave(texto) if incluir_documento else None
+        por_chunk = [self.extrair_palavras_chave(parte, num_palavras=3) for parte in partes[:emitidas]]
+        return palavras_documento, por_chunk
+    
+    def processar_arquivo_em_lotes(self, caminho: str, tamanho_lote: int = TAMANHO_LOTE_CHUNKS,
+                                   info_arquivo: Optional[Dict] = None) -> Iterator[List[Dict[str, any]]]:
+        """
+        Processa um arquivo entregando seus chunks em lotes de tamanho limitado.
+        
+        Os documentos são lidos página a página (ou parágrafo/linha a linha),
+        de modo que os primeiros lotes ficam disponíveis para gravação antes de
+        a última página ser extraída e o consumo de memória não cresce com o
+        tamanho do documento.
+        
+        Args:
+            caminho: Caminho do arquivo
+            tamanho_lote: Número máximo de chunks por lote
+            info_arquivo: Dicionário opcional que recebe o "hash_arquivo" calculado
+                na leitura (só com o cache de extração ativo)
             
-        todos_chunks = []
+        Yields:
+            Listas de chunks, na ordem de chunk_id
+            
+        Raises:
+            Exception: Erro de leitura ou extração do arquivo; pode ocorrer depois
+                de alguns lotes já terem sido entregues (o arquivo não foi lido até o fim)
+        """
+        extratores = {
+            '.pdf': self._extrair_paginas_pdf,
+            '.docx': self._extrair_paragrafos_docx,
+            '.xlsx': self._extrair_linhas_xlsx
+        }
+        extensao = os.path.splitext(caminho)[1].lower()
+        if extensao not in extratores:
+            return
         
+        lote = []
+        for chunk in self._gerar_chunks_arquivo(caminho, extratores[extensao], info_arquivo=info_arquivo):
+            lote.append(chunk)
+            if len(lote) >= tamanho_lote:
+                yield lote
+                lote = []
+        
+        if lote:
+            yield lote
+    
+    def processar_arquivo(self, caminho: str) -> List[Dict[str, any]]:
+        """
+        Processa um único arquivo de acordo com sua extensão.
+        
+        Args:
+            caminho: Caminho do arquivo
+            
+        Returns:
+            Lista de chunks do arquivo (vazia se não suportado ou em caso de erro)
+        """
+        extensao = os.path.splitext(caminho)[1].lower()
+        resultado = None
+        
+        if extensao == '.pdf':
+            resultado = self.processar_pdf(caminho)
+        elif extensao == '.docx':
+            resultado = self.processar_docx(caminho)
+        elif extensao == '.xlsx':
+            resultado = self.processar_xlsx(caminho)
+        
+        if resultado and 'chunks' in resultado:
+            return resultado['chunks']
+        return []
+    
+    def _listar_arquivos(self, diretorio: str, ignorar_arquivos: set) -> List[str]:
+        """Lista, em ordem estável, os arquivos suportados de um diretório."""
+        caminhos = []
         for root, _, arquivos in os.walk(diretorio):
-            for arquivo in arquivos:
+            for arquivo in sorted(arquivos):
                 caminho = os.path.join(root, arquivo)
                 if caminho in ignorar_arquivos:
                     continue
-
-                resultado = None
-                
+                if arquivo.lower().endswith(EXTENSOES_SUPORTADAS):
+                    caminhos.append(caminho)
+        return sorted(caminhos)
+    
+    def _iterar_resultados(self, diretorio: str, ignorar_arquivos: set = None,
+                           num_workers: int = 1) -> Iterator[Tuple[str, List[Dict[str, any]], Optional[Dict]]]:
+        """
+        Processa os arquivos do diretório e entrega os chunks de cada arquivo
+        assim que ficam prontos.
+        
+        Cada arquivo é entregue em lotes de até TAMANHO_LOTE_CHUNKS chunks
+        (PDFs são lidos página a página). Com num_workers > 1 a extração, a
+        divisão em chunks e a extração de palavras-chave são distribuídas em um
+        pool de processos. Cada arquivo é processado inteiramente por um único
+        worker, o que preserva a ordem dos chunk_id dentro do arquivo, e seus
+        lotes chegam por uma fila limitada a LOTES_EM_TRANSITO lotes: a memória
+        por arquivo não depende do tamanho do arquivo. Os arquivos são
+        entregues na ordem de envio ao pool, que é a ordem em que começam a ser
+        processados, então o arquivo aguardado está sempre em andamento.
+        
+        Args:
+            diretorio: Caminho do diretório com os documentos
+            ignorar_arquivos: Conjunto de caminhos de arquivos a serem ignorados
+            num_workers: Número de processos do pool (1 = processamento sequencial)
+            
+        Yields:
+            Tuplas (caminho, chunks, fim); um arquivo pode gerar vários lotes
+            consecutivos e o último item de cada arquivo traz em "fim" o
+            resultado da extração ({"erro": None, "hash_arquivo": hash ou None}
+            se o arquivo foi lido até o fim, ou {"erro": exceção}); nos demais
+            itens "fim" é None. Um arquivo interrompido pode ter entregado lotes
+            antes do erro.
+        """
+        caminhos = self._listar_arquivos(diretorio, ignorar_arquivos or set())
+        total = len(caminhos)
+        
+        if num_workers <= 1 or total <= 1:
+            for i, caminho in enumerate(caminhos, 1):
+                num_chunks = 0
+                info_arquivo = {}
                 try:
-                    if arquivo.lower().endswith('.pdf'):
-                        resultado = self.processar_pdf(caminho)
-                    elif arquivo.lower().endswith('.docx'):
-                        resultado = self.processar_docx(caminho)
-                    elif arquivo.lower().endswith('.xlsx'):
-                        resultado = self.processar_xlsx(caminho)
-                    
-                    if resultado and 'chunks' in resultado:
-                        todos_chunks.extend(resultado['chunks'])
-                        print(f"Processado: {arquivo} - {len(resultado['chunks'])} chunks")
+                    for lote in self.processar_arquivo_em_lotes(caminho, info_arquivo=info_arquivo):
+                        num_chunks += len(lote)
+                        yield caminho, lote, None
                 except Exception as e:
-                    print(f"Erro ao processar {arquivo}: {str(e)}")
+                    print(f"Erro ao processar {os.path.basename(caminho)}: {str(e)}")
+                    yield caminho, [], {"erro": e}
                     continue
+                if num_chunks:
+                    print(f"Processado: {os.path.basename(caminho)} - {num_chunks} chunks ({i}/{total})")
+                yield caminho, [], {"erro": None, "hash_arquivo": info_arquivo.get("hash_arquivo")}
+            return
+        
+        print(f"🚀 Processando {total} arquivos com {num_workers} workers...")
+        arquivos_por_worker = {}
+        
+        diretorio_cache = self.cache_extracao.diretorio if self.cache_extracao else None
+        with multiprocessing.Manager() as gerenciador, \
+                ProcessPoolExecutor(max_workers=num_workers, initializer=_inicializar_worker,
+                                    initargs=(diretorio_cache, self.extrator_palavras_chave)) as executor:
+            # Janela de arquivos enviados ao pool, cada um com sua fila de lotes
+            pendentes = deque()
+            restantes = iter(caminhos)
+            try:
+                for concluidos in range(1, total + 1):
+                    while len(pendentes) < 2 * num_workers:
+                        caminho = next(restantes, None)
+                        if caminho is None:
+                            break
+                        fila = gerenciador.Queue(maxsize=LOTES_EM_TRANSITO)
+                        pendentes.append((caminho, fila, executor.submit(_processar_arquivo_worker, caminho, fila)))
+                    
+                    caminho, fila, futuro = pendentes[0]
+                    for lote, fim in _receber_lotes(fila, futuro):
+                        if fim is not None and fim["erro"] is not None:
+                            print(f"Erro ao processar {os.path.basename(caminho)}: {str(fim['erro'])}")
+                        yield caminho, lote, fim
+                    pendentes.popleft()
+                    if fim["erro"] is not None:
+                        continue
+                    pid, num_chunks = futuro.result()
+                    arquivos_por_worker[pid] = arquivos_por_worker.get(pid, 0) + 1
+                    if num_chunks:
+                        print(f"[worker {pid} | {arquivos_por_worker[pid]} arquivos] "
+                              f"Processado: {os.path.basename(caminho)} - {num_chunks} chunks ({concluidos}/{total})")
+            finally:
+                # Consumo interrompido: cancela os arquivos não iniciados e esvazia
+                # as filas para que os workers em andamento não fiquem bloqueados
+                for _, _, futuro in pendentes:
+                    futuro.cancel()
+                for _, fila, futuro in pendentes:
+                    while not futuro.done():
+                        try:
+                            fila.get(timeout=0.1)
+                        except queue.Empty:
+                            pass
+        
+        for pid, quantidade in sorted(arquivos_por_worker.items()):
+            print(f"   Worker {pid}: {quantidade} arquivos")
+    
+    def processar_diretorio(self, diretorio: str, ignorar_arquivos: set = None,
+                            num_workers: int = 1) -> List[Dict[str, any]]:
+        """
+        Processa todos os documentos suportados em um diretório.
+        
+        Args:
+            diretorio: Caminho do diretório com os documentos
+            ignorar_arquivos: Um conjunto de caminhos de arquivos a serem ignorados.
+            num_workers: Número de processos para processamento paralelo
+            
+        Returns:
+            Lista de chunks de documentos com metadados (arquivos com erro
+            de extração ficam de fora por inteiro)
+        """
+        todos_chunks = []
+        chunks_arquivo = []
+        for _, chunks, fim in self._iterar_resultados(diretorio, ignorar_arquivos, num_workers):
+            chunks_arquivo.extend(chunks)
+            if fim is not None:
+                if fim["erro"] is None:
+                    todos_chunks.extend(chunks_arquivo)
+                chunks_arquivo = []
+        return todos_chunks
+    
+    @staticmethod
+    def _lotes_arquivo(resultados: Iterable[Tuple[str, List[Dict[str, any]], Optional[Dict]]],
+                       fim_arquivo: Dict) -> Iterator[List[Dict[str, any]]]:
+        """
+        Entrega os lotes de um arquivo vindos de _iterar_resultados.
         
-        return todos_chunks
\ No newline at end of file
+        Se a extração foi interrompida, o erro é levantado depois do último
+        lote recebido, o que impede a reindexação de tratar como removidos os
+        chunks que não chegaram a ser lidos. O resultado da extração (com o
+        hash do arquivo) é copiado para fim_arquivo.
+        """
+        for _, lote, fim in resultados:
+            if lote:
+                yield lote
+            if fim is not None:
+                fim_arquivo.update(fim)
+                if fim["erro"] is not None:
+                    raise fim["erro"]
+    
+    def indexar_arquivo(self, caminho: str, base_conhecimento) -> int:
+        """
+        Processa um único arquivo e atualiza seus chunks na base.
+        
+        Args:
+            caminho: Caminho do arquivo
+            base_conhecimento: Instância de BaseConhecimento que receberá os chunks
+            
+        Returns:
+            Número de chunks do arquivo gravados na base
+            
+        Raises:
+            Exception: Erro de extração; os chunks anteriores do arquivo são
+                mantidos e ele não é marcado como processado
+        """
+        info_arquivo = {}
+        contadores = base_conhecimento.reindexar_arquivo_em_lotes(
+            self.processar_arquivo_em_lotes(caminho, info_arquivo=info_arquivo), caminho
+        )
+        num_chunks = contadores["inalterados"] + contadores["reaproveitados"] + contadores["embedados"]
+        # Arquivos sem texto (ex.: PDF escaneado) também são registrados, para não
+        # serem extraídos de novo a cada varredura do monitor
+        base_conhecimento.marcar_arquivo_processado(
+            caminho, num_chunks, hash_arquivo=info_arquivo.get("hash_arquivo")
+        )
+        return num_chunks
+    
+    def indexar_diretorio(self, diretorio: str, base_conhecimento, ignorar_arquivos: set = None,
+                          num_workers: int = 1) -> int:
+        """
+        Processa um diretório gravando os chunks na base à medida que cada
+        arquivo é concluído.
+        
+        O processo principal é o único escritor: os workers apenas extraem e
+        dividem o texto, e é aqui que a base é atualizada, um lote por vez.
+        Arquivos já indexados são reindexados por chunk, de modo que apenas os
+        trechos alterados geram novos embeddings.
+        
+        A ingestão é registrada como um job com checkpoint por arquivo: se a
+        execução for interrompida, a próxima chamada para o mesmo diretório
+        retoma o job e pula os arquivos já concluídos.
+        
+        A versão da base fica fixa durante o job (ver
+        BaseConhecimento.versao_ingestao); uma reconstrução espera o job terminar.
+        
+        Args:
+            diretorio: Caminho do diretório com os documentos
+            base_conhecimento: Instância de BaseConhecimento que receberá os chunks
+            ignorar_arquivos: Conjunto de caminhos de arquivos a serem ignorados
+            num_workers: Número de processos para processamento paralelo
+            
+        Returns:
+            Total de chunks gravados na base
+        """
+        # Versão fixa durante todo o job: uma troca de versão entre arquivos
+        # fecharia o controle que guarda o job e seus checkpoints
+        with base_conhecimento.versao_ingestao() as versao:
+            controle = versao.controle
+            job = controle.iniciar_job(diretorio)
+            if job["retomado"]:
+                print(f"⏯️ Retomando ingestão #{job['id']}: {len(job['concluidos'])} arquivos já concluídos")
+            
+            ignorar = set(ignorar_arquivos or set()) | job["concluidos"]
+            total_chunks = 0
+            base_conhecimento.gerador_embeddings.reiniciar_contadores()
+            resultados = self._iterar_resultados(diretorio, ignorar, num_workers)
+            
+            for caminho, grupo in groupby(resultados, key=lambda resultado: resultado[0]):
+                # Arquivo não lido até o fim: mantém os chunks anteriores e fica sem
+                # checkpoint, para ser processado de novo na próxima ingestão
+                fim_arquivo = {}
+                try:
+                    contadores = base_conhecimento.reindexar_arquivo_em_lotes(
+                        self._lotes_arquivo(grupo, fim_arquivo), caminho
+                    )
+                except Exception as e:
+                    print(f"⚠️ {os.path.basename(caminho)} não foi reindexado (chunks anteriores mantidos): {e}")
+                    continue
+                num_chunks = contadores["inalterados"] + contadores["reaproveitados"] + contadores["embedados"]
+                # Registrado mesmo sem chunks (arquivo vazio ou sem texto extraível)
+                with controle.transacao():
+                    base_conhecimento.marcar_arquivo_processado(
+                        caminho, num_chunks, hash_arquivo=fim_arquivo.get("hash_arquivo")
+                    )
+                    controle.registrar_checkpoint(job["id"], caminho, num_chunks)
+                total_chunks += num_chunks
+            
+            controle.concluir_job(job["id"])
+            base_conhecimento.exibir_desempenho_embeddings()
+        return total_chunks
@@ -0,0 +1,129 @@
+"""
+Seleção dos chunks que entram no contexto do LLM.
+
+A busca devolve um número fixo de candidatos e, com frequência, vários deles
+são janelas sobrepostas do mesmo documento. Antes de montar o prompt, os
+candidatos passam por três etapas, todas calculadas sobre os embeddings já
+retornados pela busca (nenhum texto é embedado de novo):
+
+1. Remoção de quase duplicatas: de cada grupo de candidatos com similaridade
+   de cosseno muito alta entre si, fica apenas o mais relevante;
+2. Corte por relevância: descarta candidatos muito abaixo do melhor e corta a
+   lista no maior salto de relevância entre posições consecutivas (os
+   primeiros candidatos da busca híbrida são sempre mantidos, pois podem ter
+   vindo do BM25 com similaridade vetorial baixa);
+3. MMR (maximal marginal relevance): a ordem de escolha equilibra relevância
+   para a consulta e diferença em relação aos chunks já escolhidos, o que
+   favorece trechos de documentos e seções diferentes.
+
+O número de chunks do contexto é, portanto, adaptativo: consultas com poucos
+trechos realmente relevantes geram prompts menores.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+NUM_MAXIMO_CONTEXTO = 8
+NUM_MINIMO_CONTEXTO = 2
+
+# Relevância = similaridade de cosseno entre a consulta e o chunk
+MARGEM_RELEVANCIA = 0.2
+SALTO_MINIMO_RELEVANCIA = 0.1
+LIMIAR_REDUNDANCIA = 0.95
+LAMBDA_MMR = 0.7
+
+
+def _normalizar(vetores: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(vetores, axis=-1, keepdims=True)
+    return vetores / np.maximum(normas, 1e-12)
+
+
+def _corte_relevancia(relevancias: np.ndarray, num_minimo: int, num_maximo: int,
+                      margem: float, salto_minimo: float) -> int:
+    """
+    Calcula quantos candidatos (em ordem decrescente de relevância) passam no corte.
+
+    Returns:
+        Número de candidatos mantidos, entre num_minimo e num_maximo
+    """
+    ordenadas = np.sort(relevancias)[::-1][:num_maximo]
+    mantidos = int(np.sum(ordenadas >= ordenadas[0] - margem))
+
+    # Maior salto entre posições consecutivas, a partir do mínimo garantido
+    saltos = ordenadas[:mantidos - 1] - ordenadas[1:mantidos]
+    saltos[:num_minimo - 1] = 0.0
+    if len(saltos) and saltos.max() >= salto_minimo:
+        mantidos = int(saltos.argmax()) + 1
+
+    return max(min(num_minimo, len(relevancias)), mantidos)
+
+
+def selecionar_contexto(documentos: List[Dict], embedding_consulta: np.ndarray,
+                        num_maximo: int = NUM_MAXIMO_CONTEXTO,
+                        num_minimo: int = NUM_MINIMO_CONTEXTO,
+                        margem: float = MARGEM_RELEVANCIA,
+                        salto_minimo: float = SALTO_MINIMO_RELEVANCIA,
+                        limiar_redundancia: float = LIMIAR_REDUNDANCIA,
+                        lambda_mmr: float = LAMBDA_MMR) -> Tuple[List[Dict], Dict]:
+    """
+    Seleciona os chunks do contexto a partir dos candidatos da busca.
+
+    Args:
+        documentos: Candidatos com a chave "embedding" (ver
+            BaseConhecimento.buscar_hibrido com incluir_embeddings=True)
+        embedding_consulta: Embedding da consulta
+        num_maximo: Número máximo de chunks selecionados
+        num_minimo: Número mínimo de chunks selecionados (se houver candidatos);
+            os num_minimo primeiros candidatos nunca são cortados por relevância
+        margem: Diferença máxima de relevância em relação ao melhor candidato
+        salto_minimo: Salto de relevância entre posições consecutivas que corta a lista
+        limiar_redundancia: Similaridade a partir da qual um chunk é quase duplicata
+        lambda_mmr: Peso da relevância no MMR (1 = só relevância, 0 = só diversidade)
+
+    Returns:
+        Tupla (documentos selecionados, sem a chave "embedding" e com a
+        "relevancia" de cada um; resumo com candidatos, selecionados,
+        descartados_corte e descartados_redundancia)
+    """
+    resumo = {"candidatos": len(documentos), "selecionados": 0,
+              "descartados_corte": 0, "descartados_redundancia": 0}
+    if not documentos:
+        return [], resumo
+
+    vetores = _normalizar(np.asarray([documento["embedding"] for documento in documentos], dtype=np.float32))
+    relevancias = vetores @ _normalizar(np.asarray(embedding_consulta, dtype=np.float32))
+    similaridades = vetores @ vetores.T
+
+    # 1. Quase duplicatas: mantém o mais relevante de cada grupo
+    distintos: List[int] = []
+    for indice in np.argsort(-relevancias, kind="stable"):
+        if all(similaridades[indice, outro] < limiar_redundancia for outro in distintos):
+            distintos.append(int(indice))
+    resumo["descartados_redundancia"] = len(documentos) - len(distintos)
+
+    # 2. Corte por relevância (adaptativo); os primeiros candidatos da busca são preservados
+    mantidos = _corte_relevancia(relevancias[distintos], num_minimo, num_maximo, margem, salto_minimo)
+    protegidos = [indice for indice in range(min(num_minimo, len(documentos))) if indice in distintos]
+    candidatos = distintos[:mantidos] + [indice for indice in protegidos if indice not in distintos[:mantidos]]
+
+    # 3. MMR: relevância menos a maior similaridade com os já escolhidos
+    escolhidos: List[int] = []
+    while candidatos and len(escolhidos) < num_maximo:
+        pontuacoes = [
+            lambda_mmr * relevancias[indice]
+            - (1 - lambda_mmr) * max([similaridades[indice, outro] for outro in escolhidos] + [0.0])
+            for indice in candidatos
+        ]
+        escolhidos.append(candidatos.pop(int(np.argmax(pontuacoes))))
+    resumo["descartados_corte"] = len(distintos) - len(escolhidos)
+
+    selecionados = [
+        {
+            **{chave: valor for chave, valor in documentos[indice].items() if chave != "embedding"},
+            "relevancia": float(relevancias[indice])
+        }
+        for indice in escolhidos
+    ]
+    resumo["selecionados"] = len(selecionados)
+    return selecionados, resumo
@@ -0,0 +1,317 @@
+"""
+Versões da base de conhecimento para reconstrução sem indisponibilidade (blue/green).
+
+Cada versão é um diretório em "<persistência>/versoes/<nome>" com seus próprios
+armazenamento vetorial, controle de documentos e índices lexical e de códigos.
+O arquivo "<persistência>/versao_atual" aponta para a versão ativa e é trocado
+de forma atômica (os.replace) apenas quando uma reconstrução termina; até lá as
+consultas continuam na versão anterior. Sem esse arquivo, a versão ativa é o próprio
+diretório de persistência (bases criadas antes do versionamento).
+
+Escritas incrementais feitas na versão ativa durante uma reconstrução (monitor
+de documentos, remoções pela API, outro processo) são anotadas em um registro de
+alterações da versão em construção, que as reaplica antes de ser ativada. Cada
+processo mantém uma trava compartilhada nas versões que tem abertas, de modo que
+uma versão antiga só é apagada quando nenhum processo a usa mais.
+"""
+
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem travas de arquivo (um único processo e sem escritas durante a reconstrução)
+    fcntl = None
+
+ARQUIVO_VERSAO_ATUAL = "versao_atual"
+DIRETORIO_VERSOES = "versoes"
+ARQUIVO_INFO_VERSAO = "versao.json"
+ARQUIVO_ALTERACOES = "alteracoes.jsonl"
+ARQUIVO_RESERVA = "em_uso.lock"
+ARQUIVO_TRAVA_ESCRITA = "escrita.lock"
+
+
+class VersaoBase:
+    """Armazenamentos de uma versão da base."""
+
+    def __init__(self, nome: Optional[str], diretorio: str, collection, controle, indice_lexico, indice_codigos):
+        """
+        Agrupa os armazenamentos de uma versão.
+
+        Args:
+            nome: Nome da versão (None = diretório de persistência sem versionamento)
+            diretorio: Diretório da versão
+            collection: Armazenamento vetorial
+            controle: Controle de documentos processados
+            indice_lexico: Índice BM25
+            indice_codigos: Índice de códigos de produto
+        """
+        self.nome = nome
+        self.diretorio = diretorio
+        self.collection = collection
+        self.controle = controle
+        self.indice_lexico = indice_lexico
+        self.indice_codigos = indice_codigos
+
+        # Reserva da versão por este processo (ver remover_versoes_antigas) e
+        # consultas em andamento, que adiam o fechamento dos armazenamentos
+        self._reserva = _reservar(diretorio) if nome is not None else None
+        self._trava = threading.Lock()
+        self._em_uso = 0
+        self._fechar = False
+        self._fechada = False
+
+    def reter(self):
+        """Registra uma consulta que começou a usar a versão."""
+        with self._trava:
+            self._em_uso += 1
+
+    def liberar(self):
+        """Registra o fim de uma consulta; fecha a versão se ela já foi substituída."""
+        with self._trava:
+            self._em_uso -= 1
+        self._fechar_se_livre()
+
+    def fechar(self):
+        """
+        Fecha os armazenamentos e libera a reserva da versão assim que nenhuma
+        consulta em andamento a estiver usando.
+        """
+        with self._trava:
+            self._fechar = True
+        self._fechar_se_livre()
+
+    def _fechar_se_livre(self):
+        with self._trava:
+            if not self._fechar or self._em_uso or self._fechada:
+                return
+            self._fechada = True
+        for armazenamento in (self.collection, self.controle, self.indice_lexico, self.indice_codigos):
+            armazenamento.fechar()
+        if self._reserva is not None:
+            self._reserva.close()
+            self._reserva = None
+
+
+def _reservar(diretorio: str):
+    """Abre o arquivo de reserva da versão com uma trava compartilhada (mantida até ser fechado)."""
+    reserva = open(os.path.join(diretorio, ARQUIVO_RESERVA), "a")
+    if fcntl is not None:
+        fcntl.flock(reserva, fcntl.LOCK_SH)
+    return reserva
+
+
+@contextmanager
+def trava_escrita(diretorio_persistencia: str, exclusiva: bool = False):
+    """
+    Trava entre processos das escritas na base.
+
+    As escritas incrementais usam a trava compartilhada; a criação e a
+    ativação de uma versão, a exclusiva. Assim, uma escrita nunca é feita em
+    uma versão que deixa de ser a ativa no meio dela.
+
+    Args:
+        diretorio_persistencia: Diretório de persistência da base
+        exclusiva: Trava exclusiva (reconstrução) em vez de compartilhada
+    """
+    os.makedirs(diretorio_persistencia, exist_ok=True)
+    with open(os.path.join(diretorio_persistencia, ARQUIVO_TRAVA_ESCRITA), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusiva else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def ler_versao_atual(diretorio_persistencia: str) -> Optional[str]:
+    """Retorna o nome da versão ativa (None se a base não é versionada)."""
+    try:
+        with open(os.path.join(diretorio_persistencia, ARQUIVO_VERSAO_ATUAL), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def diretorio_versao(diretorio_persistencia: str, nome: Optional[str]) -> str:
+    """Retorna o diretório de uma versão."""
+    if nome is None:
+        return diretorio_persistencia
+    return os.path.join(diretorio_persistencia, DIRETORIO_VERSOES, nome)
+
+
+def _ler_info(diretorio_persistencia: str, nome: str) -> Dict:
+    try:
+        with open(os.path.join(diretorio_versao(diretorio_persistencia, nome), ARQUIVO_INFO_VERSAO),
+                  "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _gravar_info(diretorio_persistencia: str, nome: str, info: Dict):
+    caminho = os.path.join(diretorio_versao(diretorio_persistencia, nome), ARQUIVO_INFO_VERSAO)
+    with open(f"{caminho}.tmp", "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    os.replace(f"{caminho}.tmp", caminho)
+
+
+def listar_versoes(diretorio_persistencia: str) -> List[Dict]:
+    """
+    Lista as versões existentes, da mais antiga para a mais recente.
+
+    Returns:
+        Lista de dicionários com nome, criada_em, concluida_em (None se a
+        construção não terminou) e ativa
+    """
+    raiz = os.path.join(diretorio_persistencia, DIRETORIO_VERSOES)
+    if not os.path.isdir(raiz):
+        return []
+    atual = ler_versao_atual(diretorio_persistencia)
+    versoes = []
+    for nome in sorted(os.listdir(raiz)):
+        if os.path.isdir(os.path.join(raiz, nome)):
+            info = _ler_info(diretorio_persistencia, nome)
+            versoes.append({
+                "nome": nome,
+                "criada_em": info.get("criada_em"),
+                "concluida_em": info.get("concluida_em"),
+                "ativa": nome == atual
+            })
+    return versoes
+
+
+def versao_em_construcao(diretorio_persistencia: str) -> Optional[str]:
+    """Retorna a última versão cuja construção não foi concluída (None se não houver)."""
+    versoes = listar_versoes(diretorio_persistencia)
+    if versoes and not versoes[-1]["concluida_em"] and not versoes[-1]["ativa"]:
+        return versoes[-1]["nome"]
+    return None
+
+
+def preparar_versao(diretorio_persistencia: str) -> str:
+    """
+    Retorna a versão a construir: a última construção não concluída (para
+    retomá-la) ou uma versão nova.
+
+    Returns:
+        Nome da versão
+    """
+    nome = versao_em_construcao(diretorio_persistencia)
+    if nome is not None:
+        return nome
+
+    nome = datetime.now().strftime("v%Y%m%d-%H%M%S")
+    os.makedirs(diretorio_versao(diretorio_persistencia, nome), exist_ok=True)
+    _gravar_info(diretorio_persistencia, nome, {"criada_em": datetime.now().isoformat(), "concluida_em": None})
+    return nome
+
+
+def registrar_alteracao(diretorio_persistencia: str, caminho: str, removido: bool = False):
+    """
+    Anota um arquivo alterado ou removido na versão ativa enquanto outra
+    versão está em construção (sem construção em andamento, não faz nada).
+
+    Args:
+        diretorio_persistencia: Diretório de persistência da base
+        caminho: Caminho do arquivo
+        removido: O arquivo foi removido da base (e não reindexado)
+    """
+    nome = versao_em_construcao(diretorio_persistencia)
+    if nome is None:
+        return
+    with open(os.path.join(diretorio_versao(diretorio_persistencia, nome), ARQUIVO_ALTERACOES),
+              "a", encoding="utf-8") as f:
+        f.write(json.dumps({"caminho": caminho, "removido": removido}, ensure_ascii=False) + "\n")
+
+
+def ler_alteracoes(diretorio_persistencia: str, nome: str, posicao: int = 0) -> Tuple[Dict[str, bool], int]:
+    """
+    Lê as alterações anotadas para uma versão a partir de uma posição do registro.
+
+    Args:
+        diretorio_persistencia: Diretório de persistência da base
+        nome: Nome da versão em construção
+        posicao: Posição (em bytes) até onde o registro já foi lido
+
+    Returns:
+        Tupla ({caminho: removido}, com a última alteração de cada arquivo;
+        nova posição do registro)
+    """
+    try:
+        with open(os.path.join(diretorio_versao(diretorio_persistencia, nome), ARQUIVO_ALTERACOES), "rb") as f:
+            f.seek(posicao)
+            dados = f.read()
+    except FileNotFoundError:
+        return {}, posicao
+    # Apenas linhas completas: uma anotação pode estar sendo gravada agora
+    completas = dados[:dados.rfind(b"\n") + 1]
+    alteracoes = {}
+    for linha in completas.decode("utf-8").splitlines():
+        alteracao = json.loads(linha)
+        alteracoes[alteracao["caminho"]] = alteracao["removido"]
+    return alteracoes, posicao + len(completas)
+
+
+def ativar_versao(diretorio_persistencia: str, nome: str, resumo: Optional[Dict] = None):
+    """
+    Marca a versão como concluída e a torna ativa, trocando o ponteiro de forma atômica.
+
+    Args:
+        diretorio_persistencia: Diretório de persistência da base
+        nome: Nome da versão
+        resumo: Informações gravadas junto da versão (ex.: número de chunks)
+    """
+    info = _ler_info(diretorio_persistencia, nome)
+    info.update(resumo or {})
+    info["concluida_em"] = datetime.now().isoformat()
+    _gravar_info(diretorio_persistencia, nome, info)
+
+    ponteiro = os.path.join(diretorio_persistencia, ARQUIVO_VERSAO_ATUAL)
+    with open(f"{ponteiro}.tmp", "w", encoding="utf-8") as f:
+        f.write(nome)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{ponteiro}.tmp", ponteiro)
+
+
+def remover_versoes_antigas(diretorio_persistencia: str, versoes_mantidas: int = 1) -> List[str]:
+    """
+    Apaga as versões concluídas mais antigas que a ativa.
+
+    A versão ativa e as `versoes_mantidas` anteriores a ela são preservadas,
+    de modo que consultas que começaram antes da troca terminam na versão
+    em que começaram (e é possível voltar a ela). Versões ainda abertas por
+    algum processo (ex.: a API enquanto o gerenciar_base.py reconstrói) também
+    são mantidas e ficam para a próxima remoção.
+
+    Args:
+        diretorio_persistencia: Diretório de persistência da base
+        versoes_mantidas: Versões anteriores à ativa que são mantidas
+
+    Returns:
+        Nomes das versões removidas
+    """
+    versoes = listar_versoes(diretorio_persistencia)
+    ativa = next((posicao for posicao, versao in enumerate(versoes) if versao["ativa"]), None)
+    if ativa is None:
+        return []
+
+    removidas = []
+    for versao in versoes[:max(0, ativa - versoes_mantidas)]:
+        diretorio = diretorio_versao(diretorio_persistencia, versao["nome"])
+        with open(os.path.join(diretorio, ARQUIVO_RESERVA), "a") as reserva:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(reserva, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+            shutil.rmtree(diretorio, ignore_errors=True)
+        removidas.append(versao["nome"])
+    return removidas
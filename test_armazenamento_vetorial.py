@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Testes e benchmark dos backends de armazenamento vetorial (ChromaDB e NumPy).
+
+Os mesmos cenários são executados nos dois backends: resultados de busca,
+filtros de metadados, atualizações, remoções e persistência. O benchmark mede
+tempo de abertura, inserção, latência de consulta e recall@10 em relação à
+busca exata.
+
+Uso:
+    python test_armazenamento_vetorial.py
+    pytest test_armazenamento_vetorial.py
+    BENCHMARK_NUM_VETORES=50000 python test_armazenamento_vetorial.py
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from src.knowledge_base.armazenamento_vetorial import (
+    BACKENDS_VETORIAIS, ArmazenamentoNumpy, criar_armazenamento
+)
+
+DIMENSAO_TESTE = 64
+CATEGORIAS = ["Gestão_do_Cliente", "Inovação", "Finanças"]
+
+
+def _chunks(quantidade: int, dimensao: int, semente: int = 0):
+    gerador = np.random.default_rng(semente)
+    vetores = gerador.standard_normal((quantidade, dimensao)).astype(np.float32)
+    ids = [f"chunk-{i}" for i in range(quantidade)]
+    metadados = [
+        {
+            "caminho": f"dados/documentos/arquivo_{i // 10}.pdf",
+            "categoria": CATEGORIAS[i % len(CATEGORIAS)],
+            "carga_horaria": int(i % 40),
+            "chunk_id": i % 10
+        }
+        for i in range(quantidade)
+    ]
+    textos = [f"Texto do chunk {i}" for i in range(quantidade)]
+    return ids, vetores, metadados, textos
+
+
+def _abrir(backend: str, diretorio: str):
+    return criar_armazenamento(backend, os.path.join(diretorio, backend))
+
+
+def test_mesmos_resultados_nos_backends():
+    ids, vetores, metadados, textos = _chunks(500, DIMENSAO_TESTE)
+    consultas = np.random.default_rng(1).standard_normal((5, DIMENSAO_TESTE)).astype(np.float32)
+
+    # Referência: busca exata em float32
+    distancias_exatas = ((consultas[:, None, :] - vetores[None, :, :]) ** 2).sum(axis=2)
+    esperados = np.argsort(distancias_exatas, axis=1)[:, :5]
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        for backend in BACKENDS_VETORIAIS:
+            armazenamento = _abrir(backend, diretorio)
+            armazenamento.add(ids=ids, embeddings=vetores, metadatas=metadados, documents=textos)
+            assert armazenamento.count() == len(ids)
+
+            resultado = armazenamento.query(query_embeddings=consultas.tolist(), n_results=5)
+            for indice, esperado in enumerate(esperados):
+                obtidos = resultado["ids"][indice]
+                assert len(set(obtidos) & {ids[i] for i in esperado}) >= 4, backend
+                assert resultado["documents"][indice][0] == textos[int(obtidos[0].split("-")[1])]
+                np.testing.assert_allclose(
+                    resultado["distances"][indice][0],
+                    distancias_exatas[indice, int(obtidos[0].split("-")[1])],
+                    rtol=1e-2
+                )
+
+
+def test_filtros_e_atualizacoes_nos_backends():
+    ids, vetores, metadados, textos = _chunks(60, DIMENSAO_TESTE)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        for backend in BACKENDS_VETORIAIS:
+            armazenamento = _abrir(backend, diretorio)
+            armazenamento.add(ids=ids, embeddings=vetores, metadatas=metadados, documents=textos)
+
+            filtro = {"$and": [{"categoria": "Inovação"}, {"carga_horaria": {"$lte": 10}}]}
+            resultado = armazenamento.query(query_embeddings=[vetores[0].tolist()], n_results=50, where=filtro)
+            esperados = {
+                chunk_id for chunk_id, meta in zip(ids, metadados)
+                if meta["categoria"] == "Inovação" and meta["carga_horaria"] <= 10
+            }
+            assert set(resultado["ids"][0]) == esperados, backend
+            assert all(meta["categoria"] == "Inovação" for meta in resultado["metadatas"][0])
+
+            por_arquivo = armazenamento.get(where={"caminho": "dados/documentos/arquivo_2.pdf"},
+                                            include=["metadatas", "embeddings"])
+            assert sorted(por_arquivo["ids"]) == sorted(ids[20:30])
+            assert len(por_arquivo["embeddings"]) == 10
+
+            # Atualização só de metadados preserva o vetor
+            armazenamento.update(ids=["chunk-0"], metadatas=[{**metadados[0], "categoria": "Finanças"}])
+            atualizado = armazenamento.get(ids=["chunk-0"], include=["metadatas", "embeddings", "documents"])
+            assert atualizado["metadatas"][0]["categoria"] == "Finanças"
+            assert atualizado["documents"][0] == textos[0]
+            np.testing.assert_allclose(atualizado["embeddings"][0], vetores[0], atol=1e-2)
+
+            # Upsert substitui o vetor
+            novo = -vetores[1]
+            armazenamento.upsert(ids=["chunk-1"], embeddings=[novo.tolist()], metadatas=[metadados[1]],
+                                 documents=["Texto novo"])
+            resultado = armazenamento.query(query_embeddings=[novo.tolist()], n_results=1)
+            assert resultado["ids"][0] == ["chunk-1"]
+            assert resultado["documents"][0] == ["Texto novo"]
+
+            # Remoção por filtro e por ID
+            armazenamento.delete(where={"caminho": "dados/documentos/arquivo_0.pdf"})
+            armazenamento.delete(ids=["chunk-59"])
+            assert armazenamento.count() == 49
+            assert not armazenamento.get(ids=["chunk-5", "chunk-59"])["ids"]
+            restantes = armazenamento.query(query_embeddings=[vetores[3].tolist()], n_results=100)
+            assert len(restantes["ids"][0]) == 49
+            assert "chunk-3" not in restantes["ids"][0]
+
+            # Paginação percorre todos os chunks uma única vez
+            paginados = []
+            for inicio in range(0, armazenamento.count(), 20):
+                paginados += armazenamento.get(offset=inicio, limit=20, include=[])["ids"]
+            assert sorted(paginados) == sorted(set(ids[10:59]))
+
+            armazenamento.limpar()
+            assert armazenamento.count() == 0
+
+
+def test_persistencia_numpy():
+    ids, vetores, metadados, textos = _chunks(100, DIMENSAO_TESTE)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        escrita = ArmazenamentoNumpy(diretorio)
+        escrita.add(ids=ids[:50], embeddings=vetores[:50], metadatas=metadados[:50], documents=textos[:50])
+
+        # Outra instância (ex.: outro processo) enxerga gravações posteriores
+        leitura = ArmazenamentoNumpy(diretorio, em_memoria=False)
+        assert leitura.count() == 50
+        escrita.add(ids=ids[50:], embeddings=vetores[50:], metadatas=metadados[50:], documents=textos[50:])
+        escrita.delete(ids=["chunk-7"])
+        assert leitura.count() == 99
+
+        consulta = [vetores[42].tolist()]
+        assert leitura.query(query_embeddings=consulta, n_results=3)["ids"] == \
+            escrita.query(query_embeddings=consulta, n_results=3)["ids"]
+
+        reaberta = ArmazenamentoNumpy(diretorio)
+        assert reaberta.count() == 99
+        assert reaberta.query(query_embeddings=consulta, n_results=1)["ids"] == [["chunk-42"]]
+        assert reaberta.get(ids=["chunk-42"])["metadatas"][0] == metadados[42]
+
+
+def _gravar_em_outro_processo(diretorio: str, inicio: int, quantidade: int):
+    ids, vetores, metadados, textos = _chunks(inicio + quantidade, DIMENSAO_TESTE)
+    armazenamento = ArmazenamentoNumpy(diretorio)
+    for lote in range(inicio, inicio + quantidade, 10):
+        fim = lote + 10
+        armazenamento.upsert(ids=ids[lote:fim], embeddings=vetores[lote:fim],
+                             metadatas=metadados[lote:fim], documents=textos[lote:fim])
+
+
+def test_gravacao_concorrente_numpy():
+    ids, vetores, _, _ = _chunks(400, DIMENSAO_TESTE)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        # Processos gravando ao mesmo tempo não podem ocupar a mesma linha da matriz
+        processos = [
+            multiprocessing.Process(target=_gravar_em_outro_processo, args=(diretorio, inicio, 100))
+            for inicio in range(0, 400, 100)
+        ]
+        for processo in processos:
+            processo.start()
+        for processo in processos:
+            processo.join()
+            assert processo.exitcode == 0
+
+        gravados = ArmazenamentoNumpy(diretorio).get(include=["embeddings"])
+        assert sorted(gravados["ids"]) == sorted(ids)
+        for chunk_id, vetor in zip(gravados["ids"], gravados["embeddings"]):
+            np.testing.assert_allclose(vetor, vetores[int(chunk_id.split("-")[1])], atol=1e-2)
+
+
+def _recall(obtidos, esperados) -> float:
+    return float(np.mean([len(set(o) & set(e)) / len(e) for o, e in zip(obtidos, esperados)]))
+
+
+def benchmark(num_vetores: int, dimensao: int = 512, num_consultas: int = 200):
+    """Compara os backends com um corpus sintético do tamanho informado."""
+    ids, vetores, metadados, textos = _chunks(num_vetores, dimensao)
+    consultas = vetores[np.random.default_rng(2).choice(num_vetores, num_consultas)] + \
+        np.random.default_rng(3).standard_normal((num_consultas, dimensao)).astype(np.float32) * 0.5
+
+    esperados = []
+    for consulta in consultas:
+        distancias = ((vetores - consulta) ** 2).sum(axis=1)
+        esperados.append([ids[i] for i in np.argsort(distancias)[:10]])
+
+    print(f"📊 Benchmark: {num_vetores} vetores de dimensão {dimensao}, {num_consultas} consultas")
+    with tempfile.TemporaryDirectory() as diretorio:
+        for backend in BACKENDS_VETORIAIS:
+            armazenamento = _abrir(backend, diretorio)
+            inicio = time.perf_counter()
+            for posicao in range(0, num_vetores, 1000):
+                fatia = slice(posicao, posicao + 1000)
+                armazenamento.add(ids=ids[fatia], embeddings=vetores[fatia],
+                                  metadatas=metadados[fatia], documents=textos[fatia])
+            tempo_insercao = time.perf_counter() - inicio
+
+            del armazenamento
+            inicio = time.perf_counter()
+            armazenamento = _abrir(backend, diretorio)
+            armazenamento.count()
+            tempo_abertura = time.perf_counter() - inicio
+
+            armazenamento.query(query_embeddings=[consultas[0].tolist()], n_results=10)
+            latencias, obtidos = [], []
+            for consulta in consultas:
+                inicio = time.perf_counter()
+                resultado = armazenamento.query(query_embeddings=[consulta.tolist()], n_results=10)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                obtidos.append(resultado["ids"][0])
+
+            inicio = time.perf_counter()
+            for consulta in consultas[:50]:
+                armazenamento.query(query_embeddings=[consulta.tolist()], n_results=10,
+                                    where={"categoria": "Inovação"})
+            latencia_filtro = (time.perf_counter() - inicio) / 50 * 1000
+
+            print(f"   {backend:6s} inserção {tempo_insercao:6.1f}s | abertura {tempo_abertura * 1000:7.1f} ms | "
+                  f"consulta p50 {np.percentile(latencias, 50):6.2f} ms, p99 {np.percentile(latencias, 99):6.2f} ms | "
+                  f"com filtro {latencia_filtro:6.2f} ms | recall@10 {_recall(obtidos, esperados):.3f}")
+
+
+if __name__ == "__main__":
+    print("🔄 Testando backends de armazenamento vetorial...")
+    test_mesmos_resultados_nos_backends()
+    test_filtros_e_atualizacoes_nos_backends()
+    test_persistencia_numpy()
+    test_gravacao_concorrente_numpy()
+    print("✅ Backends equivalentes\n")
+
+    benchmark(int(os.getenv("BENCHMARK_NUM_VETORES", "20000")))
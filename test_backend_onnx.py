@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Teste de paridade entre o backend PyTorch e o backend ONNX Runtime de embeddings.
+
+Compara os vetores e o ranking de busca gerados pelo SentenceTransformer
+original com os do modelo exportado para ONNX (float32 e int8).
+
+Uso:
+    python test_backend_onnx.py
+    pytest test_backend_onnx.py
+"""
+
+import os
+import time
+
+import numpy as np
+
+from src.knowledge_base.modelos import MODELO_EMBEDDINGS_PADRAO, obter_modelo
+
+MODELO = os.getenv("MODELO_PARIDADE_ONNX", MODELO_EMBEDDINGS_PADRAO)
+
+DOCUMENTOS = [
+    "Consultoria em gestão financeira: fluxo de caixa, capital de giro e formação de preço de venda.",
+    "Oficina de marketing digital para pequenos negócios: redes sociais, anúncios e presença online.",
+    "Curso de boas práticas de fabricação para agroindústrias de alimentos.",
+    "Consultoria tecnológica em eficiência energética e instalação de energia solar fotovoltaica.",
+    "Palestra sobre formalização do microempreendedor individual (MEI) e obrigações fiscais.",
+    "Programa de inovação com orientação para acesso a editais de fomento e propriedade intelectual.",
+    "Capacitação em atendimento ao cliente e técnicas de vendas para o varejo.",
+    "Ficha técnica de produto: carga horária de 8 horas, modalidade presencial, público empresário.",
+    "Consultoria em segurança do trabalho e adequação às normas regulamentadoras.",
+    "Oficina de planejamento estratégico com análise SWOT e definição de metas.",
+    "Manual de operacionalização da aplicação com regras de contratação de consultores.",
+    "Curso de gestão de estoques e compras para comércio e serviços.",
+]
+
+CONSULTAS = [
+    "como melhorar o fluxo de caixa da empresa",
+    "quero vender mais pelas redes sociais",
+    "energia solar para reduzir custos",
+    "como me formalizar como MEI",
+    "regras para contratar consultor",
+]
+
+
+def _similaridade_cosseno(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def _ranking(modelo) -> np.ndarray:
+    documentos = modelo.encode(DOCUMENTOS, convert_to_numpy=True, normalize_embeddings=True)
+    consultas = modelo.encode(CONSULTAS, convert_to_numpy=True, normalize_embeddings=True)
+    return np.argsort(-(consultas @ documentos.T), axis=1)
+
+
+def _carregar_modelos(backend: str):
+    """Carrega o modelo PyTorch e o do backend ONNX (ou pula o teste sob pytest)."""
+    try:
+        return obter_modelo(MODELO, "torch"), obter_modelo(MODELO, backend)
+    except ImportError as e:
+        import pytest
+        pytest.skip(f"Dependência ausente para o backend ONNX: {e}")
+    except OSError as e:
+        import pytest
+        pytest.skip(f"Modelo {MODELO} indisponível: {e}")
+
+
+def _verificar_paridade(backend: str, similaridade_minima: float, ranking_identico: bool):
+    modelo_torch, modelo_onnx = _carregar_modelos(backend)
+
+    vetores_torch = modelo_torch.encode(DOCUMENTOS, convert_to_numpy=True)
+    vetores_onnx = modelo_onnx.encode(DOCUMENTOS, convert_to_numpy=True)
+    similaridades = _similaridade_cosseno(vetores_torch, vetores_onnx)
+    print(f"   {backend}: similaridade mínima {similaridades.min():.6f}")
+    assert vetores_torch.shape == vetores_onnx.shape
+    assert similaridades.min() >= similaridade_minima
+
+    ranking_torch, ranking_onnx = _ranking(modelo_torch), _ranking(modelo_onnx)
+    if ranking_identico:
+        assert (ranking_torch[:, :3] == ranking_onnx[:, :3]).all()
+    else:
+        # int8: mesmo primeiro resultado e ao menos 2 dos 3 primeiros em comum
+        assert (ranking_torch[:, 0] == ranking_onnx[:, 0]).all()
+        for esperado, obtido in zip(ranking_torch[:, :3], ranking_onnx[:, :3]):
+            assert len(set(esperado) & set(obtido)) >= 2
+
+
+def test_paridade_onnx():
+    _verificar_paridade("onnx", similaridade_minima=0.9999, ranking_identico=True)
+
+
+def test_paridade_onnx_int8():
+    _verificar_paridade("onnx-int8", similaridade_minima=0.98, ranking_identico=False)
+
+
+def _medir_latencia(modelo, repeticoes: int = 20) -> float:
+    modelo.encode([CONSULTAS[0]], convert_to_numpy=True)
+    inicio = time.perf_counter()
+    for consulta in CONSULTAS * (repeticoes // len(CONSULTAS)):
+        modelo.encode([consulta], convert_to_numpy=True)
+    return (time.perf_counter() - inicio) / (repeticoes // len(CONSULTAS) * len(CONSULTAS)) * 1000
+
+
+if __name__ == "__main__":
+    print(f"🔄 Verificando paridade dos backends de embeddings ({MODELO})...")
+    test_paridade_onnx()
+    test_paridade_onnx_int8()
+    print("✅ Rankings equivalentes entre PyTorch e ONNX")
+
+    print("\n⏱️ Latência por consulta:")
+    for backend in ("torch", "onnx", "onnx-int8"):
+        print(f"   {backend}: {_medir_latencia(obter_modelo(MODELO, backend)):.1f} ms")
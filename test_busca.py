@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Testes da busca na base de conhecimento: cache de embeddings das consultas,
+busca ampla em lote, filtros por faceta, busca por código de produto e
+seleção do contexto do LLM.
+
+Usa o modelo determinístico dos testes da ingestão incremental, que registra
+os textos embedados, para contar quantas vezes a consulta passa pelo modelo.
+
+Uso:
+    python test_busca.py
+    pytest test_busca.py
+"""
+
+import tempfile
+import time
+
+import numpy as np
+
+from src.knowledge_base.cache_consultas import CacheEmbeddingsConsulta
+from src.knowledge_base.facetas import extrair_facetas, montar_filtro
+from src.knowledge_base.indice_codigos import distribuir_por_codigo, extrair_codigos
+from src.knowledge_base.selecao_contexto import selecionar_contexto
+from test_ingestao_incremental import CAMINHO_TESTE, TEXTOS, _abrir_base, _chunks, _registrar_modelo
+
+
+def test_cache_embeddings_consulta():
+    gerados = []
+
+    def gerar(textos):
+        gerados.append(list(textos))
+        return np.array([[len(texto), 1.0] for texto in textos], dtype=np.float32)
+
+    cache = CacheEmbeddingsConsulta(capacidade=2, ttl_segundos=0.2)
+    cache.obter("modelo", ["Fluxo de caixa", "Marketing", "  fluxo DE caixa "], gerar)
+    # Consultas iguais após normalização são geradas uma única vez, em um único lote
+    assert gerados == [["Fluxo de caixa", "Marketing"]]
+
+    cache.obter("modelo", ["marketing"], gerar)
+    assert len(gerados) == 1
+    assert cache.estatisticas()["acertos"] == 1
+
+    # Outro modelo não reaproveita o embedding
+    cache.obter("outro", ["marketing"], gerar)
+    assert gerados[-1] == ["marketing"]
+
+    # Capacidade 2: a entrada menos usada ("fluxo de caixa") sai do cache
+    cache.obter("modelo", ["fluxo de caixa"], gerar)
+    assert gerados[-1] == ["fluxo de caixa"]
+
+    # Entrada expirada é gerada de novo
+    time.sleep(0.3)
+    cache.obter("modelo", ["fluxo de caixa"], gerar)
+    assert gerados[-1] == ["fluxo de caixa"]
+    assert len(gerados) == 4
+
+
+def test_consulta_repetida_nao_passa_pelo_modelo():
+    modelo = _registrar_modelo()
+    with tempfile.TemporaryDirectory() as diretorio:
+        base = _abrir_base(diretorio)
+        base.reindexar_arquivo(_chunks(TEXTOS), CAMINHO_TESTE)
+
+        modelo.textos_embedados.clear()
+        primeira = base.buscar("marketing digital", num_resultados=2)
+        assert modelo.textos_embedados == ["marketing digital"]
+
+        segunda = base.buscar("Marketing  digital", num_resultados=2)
+        assert modelo.textos_embedados == ["marketing digital"]
+        assert [r["texto"] for r in segunda] == [r["texto"] for r in primeira]
+
+
+def test_busca_ampla_em_lote():
+    modelo = _registrar_modelo()
+    with tempfile.TemporaryDirectory() as diretorio:
+        base = _abrir_base(diretorio)
+        base.reindexar_arquivo(_chunks(TEXTOS), CAMINHO_TESTE)
+
+        lotes = []
+        encode_original = modelo.encode
+        modelo.encode = lambda textos, **kwargs: lotes.append(list(textos)) or encode_original(textos, **kwargs)
+        consultas = []
+        query_original = base.collection.query
+        base.collection.query = lambda **kwargs: consultas.append(kwargs) or query_original(**kwargs)
+
+        consulta = "marketing para agroindústrias e microempreendedor"
+        resultados = base.buscar_ampla(consulta, num_resultados=3, resultados_por_termo=1)
+
+        # Um único lote de embeddings e uma única consulta à coleção para os três termos
+        assert lotes == [["marketing", "para", "agroindústrias"]]
+        assert len(consultas) == 1
+        assert len(consultas[0]["query_embeddings"]) == 3
+
+        # Mesmos chunks que buscar cada termo separadamente
+        esperados = {base.buscar(termo, num_resultados=1)[0]["texto"] for termo in lotes[0]}
+        assert {resultado["texto"] for resultado in resultados} == esperados
+        assert [resultado["distancia"] for resultado in resultados] == \
+            sorted(resultado["distancia"] for resultado in resultados)
+
+
+def test_facetas_e_filtros():
+    assert extrair_facetas("dados/documentos/Gestão_do_Cliente/FT Oficina Atendimento-GQ13029-3_15h.docx") == {
+        "categoria": "Gestão_do_Cliente", "tipo_documento": "SEBRAETEC",
+        "codigo_produto": "GQ13029-3", "carga_horaria": 15
+    }
+    assert extrair_facetas("dados/documentos/Inovação/MOA Consultoria de Inovação.pdf") == {
+        "categoria": "Inovação", "tipo_documento": "MOA"
+    }
+
+    assert montar_filtro(None) is None
+    assert montar_filtro({"categoria": "Inovação"}) == {"categoria": "Inovação"}
+    assert montar_filtro({"tipo_documento": ["FT", "MOA"], "carga_horaria": {"$lte": 16}}) == {
+        "$and": [{"tipo_documento": {"$in": ["FT", "MOA"]}}, {"carga_horaria": {"$lte": 16}}]
+    }
+    for filtros in ({"arquivo": "x.docx"}, {"carga_horaria": {"$regex": "1"}}, {"carga_horaria": {}}):
+        try:
+            montar_filtro(filtros)
+        except ValueError:
+            pass
+        else:
+            assert False, f"filtro inválido aceito: {filtros}"
+
+
+def test_busca_filtrada_por_faceta():
+    _registrar_modelo()
+    caminhos = {
+        "dados/documentos/Gestão_do_Cliente/FT Oficina Atendimento-GQ13029-3_15h.docx": TEXTOS[:2],
+        "dados/documentos/Inovação/MOA Consultoria de Inovação.pdf": TEXTOS[2:],
+    }
+    with tempfile.TemporaryDirectory() as diretorio:
+        base = _abrir_base(diretorio)
+        for caminho, textos in caminhos.items():
+            chunks = _chunks(textos, caminho)
+            for chunk in chunks:
+                chunk["metadados"].update(extrair_facetas(caminho))
+            base.reindexar_arquivo(chunks, caminho)
+
+        # Sem filtro, o chunk de marketing (Gestão do Cliente) é o mais próximo
+        assert base.buscar("marketing digital", num_resultados=1)[0]["metadados"]["tipo_documento"] == "SEBRAETEC"
+
+        for filtros in ({"tipo_documento": "MOA"}, {"categoria": ["Inovação"]}):
+            for resultados in (base.buscar("marketing digital", num_resultados=4, filtros=filtros),
+                               base.buscar_hibrido("marketing digital", num_resultados=4, filtros=filtros)):
+                assert {r["metadados"]["caminho"] for r in resultados} == \
+                    {"dados/documentos/Inovação/MOA Consultoria de Inovação.pdf"}
+
+        resultados = base.buscar("marketing digital", num_resultados=4, filtros={"carga_horaria": {"$gte": 10}})
+        assert {r["texto"] for r in resultados} == set(TEXTOS[:2])
+
+        try:
+            base.buscar("marketing digital", filtros={"arquivo": "x.docx"})
+        except ValueError:
+            pass
+        else:
+            assert False, "campo de filtro inválido deveria ser recusado"
+
+
+def test_busca_por_codigo_de_produto():
+    modelo = _registrar_modelo()
+    oficina = "dados/documentos/Gestao/FT Oficina Fluxo de Caixa-GQ13020-4.docx"
+    curso = "dados/documentos/Gestao/FT Curso Marketing-GQ13021-4.docx"
+    catalogo = "dados/documentos/Gestao/Catalogo de solucoes.docx"
+    with tempfile.TemporaryDirectory() as diretorio:
+        base = _abrir_base(diretorio)
+        for caminho, textos in ((oficina, [f"Oficina, etapa {n}." for n in range(6)]),
+                                (curso, [f"Curso, módulo {n}." for n in range(6)]),
+                                (catalogo, ["Veja também GQ13022-1 e a oficina GQ13020-4."])):
+            chunks = _chunks(textos, caminho)
+            for chunk in chunks:
+                chunk["metadados"].update(extrair_facetas(caminho))
+            base.reindexar_arquivo(chunks, caminho)
+
+        assert extrair_codigos("compare gq13020-4 com GQ13021 e GQ13020-4") == ["GQ13020-4", "GQ13021"]
+
+        # Chunks do próprio produto, na ordem do documento, sem embedding da consulta
+        modelo.textos_embedados.clear()
+        resultados = base.buscar_por_codigo("O que é o GQ13020-4?", num_resultados=3)
+        assert [r["texto"] for r in resultados] == ["Oficina, etapa 0.", "Oficina, etapa 1.", "Oficina, etapa 2."]
+        assert all(r["metadados"]["caminho"] == oficina for r in resultados)
+        assert modelo.textos_embedados == []
+
+        # Código só citado no texto de outro documento não ativa a busca exata
+        assert base.buscar_por_codigo("O que é o GQ13022-1?") == []
+        assert base.buscar_por_codigo("Qual a carga horária da oficina?") == []
+
+        # Dois códigos: o limite é repartido entre os produtos
+        resultados = base.buscar_por_codigo("GQ13020-4 ou GQ13021 (sem dígito)?", num_resultados=4)
+        assert [r["texto"] for r in resultados] == [
+            "Oficina, etapa 0.", "Oficina, etapa 1.", "Curso, módulo 0.", "Curso, módulo 1."
+        ]
+
+        # Filtros são aplicados antes de repartir o limite
+        resultados = base.buscar_por_codigo("GQ13020-4 ou GQ13021-4", num_resultados=2,
+                                            filtros={"codigo_produto": "GQ13021-4"})
+        assert [r["texto"] for r in resultados] == ["Curso, módulo 0.", "Curso, módulo 1."]
+
+    assert distribuir_por_codigo([["a", "b", "c"], ["b", "d"], []], 4) == ["a", "c", "b", "d"]
+    assert distribuir_por_codigo([["a", "b"], ["c"]]) == ["a", "b", "c"]
+
+
+def test_selecao_de_contexto_com_mmr():
+    embeddings = {
+        "A": [1.0, 0.1, 0.0],
+        "A (cópia)": [1.0, 0.1, 0.0],
+        "B, parecido com A": [0.9, 0.44, 0.0],
+        "C, outro assunto": [0.88, 0.0, 0.47],
+        "D, irrelevante": [0.0, 1.0, 0.0],
+    }
+    candidatos = [{"texto": texto, "embedding": np.array(vetor)} for texto, vetor in embeddings.items()]
+    consulta = np.array([1.0, 0.0, 0.0])
+
+    selecionados, resumo = selecionar_contexto(candidatos, consulta)
+    # Cópia removida, D abaixo do corte e C antes de B (mais diferente de A)
+    assert [documento["texto"] for documento in selecionados] == ["A", "C, outro assunto", "B, parecido com A"]
+    assert all("embedding" not in documento for documento in selecionados)
+    assert resumo == {"candidatos": 5, "selecionados": 3, "descartados_corte": 1, "descartados_redundancia": 1}
+
+    # Só relevância: ordem da similaridade com a consulta
+    selecionados, _ = selecionar_contexto(candidatos, consulta, lambda_mmr=1.0)
+    assert [documento["texto"] for documento in selecionados] == ["A", "B, parecido com A", "C, outro assunto"]
+
+    # Os primeiros candidatos da busca (ex.: vindos do BM25) nunca são cortados
+    selecionados, _ = selecionar_contexto(candidatos[::-1], consulta, num_minimo=2)
+    assert "D, irrelevante" in [documento["texto"] for documento in selecionados]
+
+
+def test_contexto_embeda_a_consulta_uma_vez():
+    modelo = _registrar_modelo()
+    with tempfile.TemporaryDirectory() as diretorio:
+        base = _abrir_base(diretorio)
+        base.reindexar_arquivo(_chunks(TEXTOS), CAMINHO_TESTE)
+        base.cache_consultas.limpar()
+        modelo.textos_embedados.clear()
+
+        selecionados, resumo = base.buscar_contexto("marketing digital para pequenos negócios", num_maximo=2)
+        assert selecionados[0]["texto"] == TEXTOS[1]
+        assert resumo["candidatos"] == len(TEXTOS)
+
+        # A busca híbrida e a seleção usam o mesmo embedding da consulta
+        assert modelo.textos_embedados == ["marketing digital para pequenos negócios"]
+        estatisticas = base.cache_consultas.estatisticas()
+        assert estatisticas["acertos"] + estatisticas["faltas"] == 1
+
+
+if __name__ == "__main__":
+    test_cache_embeddings_consulta()
+    test_consulta_repetida_nao_passa_pelo_modelo()
+    test_busca_ampla_em_lote()
+    test_facetas_e_filtros()
+    test_busca_filtrada_por_faceta()
+    test_busca_por_codigo_de_produto()
+    test_selecao_de_contexto_com_mmr()
+    test_contexto_embeda_a_consulta_uma_vez()
+    print("✅ Testes da busca concluídos")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Testes da montagem do contexto do LLM: orçamento de tokens do prompt e
+compressão do contexto por sentenças.
+
+As contagens esperadas são calculadas com a própria contar_tokens, de modo que
+os testes valem com o tiktoken instalado ou com a estimativa por palavra. Os
+testes do assistente são pulados (sob pytest) sem as dependências dele.
+
+Uso:
+    python test_contexto_llm.py
+    pytest test_contexto_llm.py
+"""
+
+import tempfile
+
+from src.knowledge_base.compressao_contexto import MARCADOR_OMISSAO, comprimir_sentencas, dividir_sentencas
+from src.knowledge_base.orcamento_tokens import (
+    TOKENS_INICIO_RESPOSTA, TOKENS_POR_MENSAGEM, contar_tokens, empacotar_contexto, orcamento_modelo
+)
+from test_ingestao_incremental import CAMINHO_TESTE, TEXTOS, ModeloTeste, _abrir_base, _chunks, _registrar_modelo
+
+PROMPT_SISTEMA = "Você é o Consultor IA do Sebrae."
+CONSULTA = "Pergunta: como melhorar o fluxo de caixa?"
+MOLDURA_HISTORICO = "Histórico da conversa:"
+
+
+def _formatar_chunk(posicao: int, chunk: dict) -> str:
+    return f"Trecho:\n{chunk['texto']}\n"
+
+
+def test_orcamento_por_modelo():
+    assert orcamento_modelo("gpt-4o-mini", 1000) == 12000
+    assert orcamento_modelo("gpt-3.5-turbo", 1000) == 8000
+    # O orçamento configurado é limitado ao que cabe na janela junto com a resposta
+    assert orcamento_modelo("gpt-4", 4000) == 8192 - 4000
+    assert orcamento_modelo("gpt-3.5-turbo", 1000, orcamento=100000) == 16385 - 1000
+    assert orcamento_modelo("modelo-desconhecido", 1000) == 6000
+
+
+def test_empacotamento_no_orcamento():
+    chunks = [
+        {"texto": "Fluxo de caixa projetado.", "metadados": {"num_tokens": 10}},
+        {"texto": "Capítulo inteiro do manual.", "metadados": {"num_tokens": 1000}},
+        {"texto": "Capital de giro.", "metadados": {"num_tokens": 20}},
+    ]
+    historico = ["Pergunta antiga sobre marketing digital e redes sociais. " * 5,
+                 "Pergunta recente sobre capital de giro."]
+
+    fixos = contar_tokens(PROMPT_SISTEMA) + contar_tokens(CONSULTA) + 2 * TOKENS_POR_MENSAGEM + TOKENS_INICIO_RESPOSTA
+    moldura_chunk = contar_tokens(_formatar_chunk(0, {"texto": ""}))
+    custo_chunks = 2 * moldura_chunk + 10 + 20
+    custo_historico = contar_tokens(MOLDURA_HISTORICO) + contar_tokens(historico[1])
+    orcamento = fixos + custo_chunks + custo_historico + 1
+
+    pacote = empacotar_contexto(PROMPT_SISTEMA, CONSULTA, chunks, historico, orcamento,
+                                _formatar_chunk, MOLDURA_HISTORICO)
+
+    # O chunk grande é pulado (o seguinte ainda cabe); o histórico entra do mais recente para o mais antigo
+    assert [chunk["metadados"]["num_tokens"] for chunk in pacote["chunks"]] == [10, 20]
+    assert pacote["historico"] == [historico[1]]
+    tokens = pacote["tokens"]
+    assert tokens["chunks"] == custo_chunks
+    assert tokens["historico"] == custo_historico
+    assert tokens["total"] == orcamento - 1
+    assert tokens["chunks_descartados"] == 1
+    assert tokens["historico_descartado"] == 1
+
+    # Orçamento que só comporta sistema e consulta: nenhum chunk nem histórico
+    pacote = empacotar_contexto(PROMPT_SISTEMA, CONSULTA, chunks, historico, fixos,
+                                _formatar_chunk, MOLDURA_HISTORICO)
+    assert pacote["chunks"] == [] and pacote["historico"] == []
+    assert pacote["tokens"]["total"] == fixos
+
+
+def test_tokens_gravados_na_ingestao():
+    _registrar_modelo()
+    with tempfile.TemporaryDirectory() as diretorio:
+        base = _abrir_base(diretorio)
+        base.reindexar_arquivo(_chunks(TEXTOS), CAMINHO_TESTE)
+        for resultado in base.buscar("fluxo de caixa", num_resultados=len(TEXTOS)):
+            assert resultado["metadados"]["num_tokens"] == contar_tokens(resultado["texto"])
+
+
+def test_compressao_por_sentencas():
+    sentencas = [
+        "Ficha técnica da oficina de gestão financeira para pequenos negócios.",
+        "Público-alvo: empresários que desejam organizar as finanças da empresa.",
+        "O fluxo de caixa registra todas as entradas e saídas de dinheiro do período.",
+        "A carga horária total da oficina é de quatro horas presenciais.",
+        "Os materiais didáticos são entregues pelo instrutor no primeiro encontro.",
+    ]
+    chunk = {"texto": " ".join(sentencas), "metadados": {"caminho": CAMINHO_TESTE, "num_tokens": 999}}
+    curto = {"texto": TEXTOS[0], "metadados": {"caminho": CAMINHO_TESTE}}
+    assert dividir_sentencas(chunk["texto"]) == sentencas
+
+    modelo = ModeloTeste()
+    consulta = modelo.encode(["fluxo de caixa entradas saídas dinheiro"])[0]
+    comprimidos, resumo = comprimir_sentencas([chunk, curto], consulta, modelo.encode, num_sentencas=1, vizinhos=0)
+
+    # Só a sentença mais relevante fica, com os trechos omitidos marcados
+    assert comprimidos[0]["texto"] == MARCADOR_OMISSAO.lstrip() + sentencas[2] + MARCADOR_OMISSAO.rstrip()
+    assert comprimidos[0]["metadados"]["num_tokens"] == contar_tokens(comprimidos[0]["texto"])
+    assert comprimidos[0]["metadados"]["caminho"] == CAMINHO_TESTE
+    # Chunk de uma sentença volta inalterado
+    assert comprimidos[1] is curto
+    # Sentenças de todos os chunks embedadas em um único lote
+    assert modelo.textos_embedados[1:] == sentencas + [TEXTOS[0]]
+    assert resumo["sentencas"] == 6 and resumo["sentencas_mantidas"] == 2
+    assert resumo["caracteres_comprimidos"] < resumo["caracteres_originais"]
+
+
+def _assistente_sem_llm(base):
+    """Assistente com a base de teste e sem chamadas ao LLM (ou pula o teste sob pytest)."""
+    try:
+        from src.assistant import AssistenteSebrae
+    except ImportError as e:
+        import pytest
+        pytest.skip(f"Dependência ausente para o assistente: {e}")
+
+    assistente = AssistenteSebrae.__new__(AssistenteSebrae)
+    assistente.client = object()
+    assistente.base_conhecimento = base
+    assistente.compressao_contexto = True
+    assistente.historico_conversacao = []
+    assistente.contextos = []
+    assistente._buscar_consultores_relacionados = lambda consulta, analise: []
+    assistente._processar_resposta_base_interna = lambda consulta, resultados, analise, historico: (
+        assistente.contextos.append(resultados) or {"resposta": "ok", "fontes": []}
+    )
+    return assistente
+
+
+def test_busca_por_codigo_sem_compressao():
+    _registrar_modelo()
+    caminho = "dados/documentos/Gestao/FT Oficina Fluxo de Caixa-GQ13020-4.docx"
+    textos = [" ".join(f"Etapa {numero} da oficina de fluxo de caixa, com exercícios práticos de gestão."
+                       for numero in range(12))]
+    with tempfile.TemporaryDirectory() as diretorio:
+        base = _abrir_base(diretorio)
+        base.reindexar_arquivo(_chunks(textos, caminho), caminho)
+        assistente = _assistente_sem_llm(base)
+
+        # Busca por código: o documento do produto vai na íntegra
+        resultado = assistente.processar_consulta("Qual a carga horária do GQ13020-4?")
+        assert resultado["codigos_produto"] == ["GQ13020-4"]
+        assert "compressao_contexto" not in resultado
+        assert [chunk["texto"] for chunk in assistente.contextos[-1]] == textos
+
+        # Busca híbrida: o mesmo chunk é comprimido
+        resultado = assistente._processar_consulta_base_dados("carga horária da oficina de fluxo de caixa")
+        assert resultado["compressao_contexto"]["sentencas"] == 12
+        assert len(assistente.contextos[-1][0]["texto"]) < len(textos[0])
+
+
+if __name__ == "__main__":
+    test_orcamento_por_modelo()
+    test_empacotamento_no_orcamento()
+    test_tokens_gravados_na_ingestao()
+    test_compressao_por_sentencas()
+    test_busca_por_codigo_sem_compressao()
+    print("✅ Testes do contexto do LLM concluídos")
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Testes da ingestão incremental: reindexação por chunk, retomada de jobs,
+monitor de documentos e índice BM25 compartilhado entre processos.
+
+Usa um modelo de embeddings determinístico (saco de palavras com hash),
+registrado no registro de modelos com um nome próprio, para que os testes
+rodem sem baixar modelos e contem exatamente quais textos foram embedados.
+
+Uso:
+    python test_ingestao_incremental.py
+    pytest test_ingestao_incremental.py
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+import numpy as np
+from docx import Document
+
+from src.knowledge_base import modelos
+from src.knowledge_base.base_conhecimento import BaseConhecimento
+from src.knowledge_base.processador_documentos import ProcessadorDocumentos
+
+MODELO_TESTE = "modelo-teste-ingestao"
+CAMINHO_TESTE = "dados/documentos/Gestao/FT Teste-GQ13099-4.docx"
+
+TEXTOS = [
+    "Consultoria em gestão financeira com fluxo de caixa e capital de giro.",
+    "Oficina de marketing digital para pequenos negócios e redes sociais.",
+    "Curso de boas práticas de fabricação para agroindústrias de alimentos.",
+    "Palestra sobre formalização do microempreendedor individual.",
+]
+
+
+class ModeloTeste:
+    """Modelo determinístico que registra os textos recebidos."""
+
+    def __init__(self, dimensao: int = 64):
+        self.dimensao = dimensao
+        self.textos_embedados = []
+
+    def encode(self, textos, **kwargs) -> np.ndarray:
+        self.textos_embedados.extend(textos)
+        vetores = np.zeros((len(textos), self.dimensao), dtype=np.float32)
+        for linha, texto in enumerate(textos):
+            for palavra in re.findall(r"\w+", texto.lower()):
+                vetores[linha, int(hashlib.md5(palavra.encode()).hexdigest(), 16) % self.dimensao] += 1
+        return vetores / np.maximum(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12)
+
+
+def _registrar_modelo() -> ModeloTeste:
+    modelo = ModeloTeste()
+    modelos._modelos[modelos._chave_modelo(MODELO_TESTE, "torch")] = modelo
+    return modelo
+
+
+def _abrir_base(diretorio: str) -> BaseConhecimento:
+    return BaseConhecimento(
+        os.path.join(diretorio, "base"), nome_modelo=MODELO_TESTE, diretorio_cache_embeddings=None
+    )
+
+
+def _chunks(textos, caminho: str = CAMINHO_TESTE):
+    return [
+        {"texto": texto, "metadados": {"caminho": caminho, "chunk_id": posicao, "arquivo": os.path.basename(caminho)}}
+        for posicao, texto in enumerate(textos)
+    ]
+
+
+def _textos_gravados(base: BaseConhecimento, caminho: str = CAMINHO_TESTE):
+    gravados = base.collection.get(where={"caminho": caminho}, include=["documents", "metadatas"])
+    por_posicao = sorted(zip(gravados["metadatas"], gravados["documents"]), key=lambda item: item[0]["chunk_id"])
+    return [texto for _, texto in por_posicao]
+
+
+def _embedding_gravado(base: BaseConhecimento, posicao: int) -> np.ndarray:
+    chunk_id = base._gerar_id_chunk({"caminho": CAMINHO_TESTE, "chunk_id": posicao})
+    return np.asarray(base.collection.get(ids=[chunk_id], include=["embeddings"])["embeddings"][0])
+
+
+def _criar_docx(caminho: str, paragrafos):
+    documento = Document()
+    for paragrafo in paragrafos:
+        documento.add_paragraph(paragrafo)
+    documento.save(caminho)
+
+
+def test_reindexacao_por_chunk():
+    modelo = _registrar_modelo()
+    with tempfile.TemporaryDirectory() as diretorio:
+        base = _abrir_base(diretorio)
+        contadores = base.reindexar_arquivo(_chunks(TEXTOS), CAMINHO_TESTE)
+        assert contadores == {"inalterados": 0, "reaproveitados": 0, "embedados": 4, "removidos": 0}
+
+        # Arquivo sem mudanças: nenhum embedding novo
+        modelo.textos_embedados.clear()
+        contadores = base.reindexar_arquivo(_chunks(TEXTOS), CAMINHO_TESTE)
+        assert contadores == {"inalterados": 4, "reaproveitados": 0, "embedados": 0, "removidos": 0}
+        assert modelo.textos_embedados == []
+
+        # Trecho novo no início: os chunks deslocados reaproveitam o embedding anterior
+        novo = "Consultoria tecnológica em eficiência energética e energia solar."
+        embedding_anterior = _embedding_gravado(base, 0)
+        contadores = base.reindexar_arquivo(_chunks([novo] + TEXTOS[:2] + TEXTOS[3:]), CAMINHO_TESTE)
+        assert contadores == {"inalterados": 1, "reaproveitados": 2, "embedados": 1, "removidos": 0}
+        assert modelo.textos_embedados == [novo]
+        assert np.allclose(_embedding_gravado(base, 1), embedding_anterior)
+        assert _textos_gravados(base) == [novo] + TEXTOS[:2] + TEXTOS[3:]
+
+        # Arquivo encurtado: os chunks das posições que deixaram de existir são removidos
+        contadores = base.reindexar_arquivo(_chunks([novo, TEXTOS[0]]), CAMINHO_TESTE)
+        assert contadores == {"inalterados": 2, "reaproveitados": 0, "embedados": 0, "removidos": 2}
+        assert _textos_gravados(base) == [novo, TEXTOS[0]]
+        assert len(base.indice_lexico) == 2
+
+
+def test_reindexacao_interrompida_mantem_chunks():
+    _registrar_modelo()
+    with tempfile.TemporaryDirectory() as diretorio:
+        base = _abrir_base(diretorio)
+        base.reindexar_arquivo(_chunks(TEXTOS), CAMINHO_TESTE)
+
+        def lotes_truncados():
+            yield _chunks(["Texto alterado da primeira posição do arquivo."] + TEXTOS[1:])[:2]
+            raise OSError("leitura interrompida")
+
+        try:
+            base.reindexar_arquivo_em_lotes(lotes_truncados(), CAMINHO_TESTE)
+        except OSError:
+            pass
+        else:
+            assert False, "a interrupção da leitura deveria ser propagada"
+
+        # Nada é removido: as posições não lidas mantêm os chunks anteriores
+        assert _textos_gravados(base) == ["Texto alterado da primeira posição do arquivo."] + TEXTOS[1:]
+        assert len(base.indice_lexico) == 4
+
+
+def test_indexar_arquivo_com_extracao_interrompida():
+    _registrar_modelo()
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "FT Teste-GQ13099-4.docx")
+        _criar_docx(caminho, TEXTOS)
+        base = _abrir_base(diretorio)
+        processador = ProcessadorDocumentos(diretorio_cache=None)
+        num_chunks = processador.indexar_arquivo(caminho, base)
+        assert num_chunks > 0
+        registro = base.controle[caminho]
+        gravados = _textos_gravados(base, caminho)
+
+        def extracao_interrompida(caminho_arquivo, info_arquivo=None, **kwargs):
+            raise OSError("arquivo truncado")
+            yield
+
+        processador.processar_arquivo_em_lotes = extracao_interrompida
+        _criar_docx(caminho, TEXTOS[:1])
+        try:
+            processador.indexar_arquivo(caminho, base)
+        except OSError:
+            pass
+        else:
+            assert False, "o erro de extração deveria ser propagado"
+
+        # Chunks e registro do controle continuam os da última indexação completa
+        assert _textos_gravados(base, caminho) == gravados
+        assert base.controle[caminho] == registro
+        assert not base.arquivo_ja_processado(caminho)
+
+
+def test_arquivo_corrompido_pela_cli_mantem_chunks():
+    from gerenciar_base import processar_diretorio_incremental
+
+    _registrar_modelo()
+    with tempfile.TemporaryDirectory() as diretorio:
+        diretorio_docs = os.path.join(diretorio, "documentos")
+        os.makedirs(diretorio_docs)
+        caminho = os.path.join(diretorio_docs, "FT Teste-GQ13099-4.docx")
+        _criar_docx(caminho, TEXTOS)
+        base = _abrir_base(diretorio)
+        processador = ProcessadorDocumentos(diretorio_cache=None)
+        processar_diretorio_incremental(base, processador, diretorio_docs)
+        registro = base.controle[caminho]
+        gravados = _textos_gravados(base, caminho)
+        assert gravados
+
+        # Arquivo corrompido (ex.: cópia interrompida): a extração falha
+        with open(caminho, "wb") as f:
+            f.write(b"PK\x03\x04 arquivo truncado")
+        processar_diretorio_incremental(base, processador, diretorio_docs)
+
+        # Chunks e registro mantidos; o arquivo segue pendente para a próxima execução
+        assert _textos_gravados(base, caminho) == gravados
+        assert base.controle[caminho] == registro
+        assert not base.arquivo_ja_processado(caminho)
+
+        # Lista vazia (extração que falhou) não apaga os chunks de um arquivo indexado
+        try:
+            base.adicionar_documentos_incrementalmente([], caminho)
+        except ValueError:
+            pass
+        else:
+            assert False, "lista vazia para um arquivo indexado deveria ser recusada"
+        assert _textos_gravados(base, caminho) == gravados
+        assert base.controle[caminho] == registro
+
+
+def test_monitor_nao_repete_arquivo_com_falha():
+    from src.knowledge_base.monitor_documentos import MonitorDocumentos
+
+    _registrar_modelo()
+    with tempfile.TemporaryDirectory() as diretorio:
+        diretorio_docs = os.path.join(diretorio, "documentos")
+        os.makedirs(diretorio_docs)
+        caminho = os.path.join(diretorio_docs, "FT Teste-GQ13099-4.docx")
+        with open(caminho, "wb") as f:
+            f.write(b"PK\x03\x04 arquivo truncado")
+        base = _abrir_base(diretorio)
+        processador = ProcessadorDocumentos(diretorio_cache=None)
+        monitor = MonitorDocumentos(diretorio_docs, base, processador, usar_notificacoes=False)
+
+        indexar_original = processador.indexar_arquivo
+        tentativas = []
+
+        def indexar_e_registrar(caminho_arquivo, base_conhecimento):
+            tentativas.append(caminho_arquivo)
+            return indexar_original(caminho_arquivo, base_conhecimento)
+
+        processador.indexar_arquivo = indexar_e_registrar
+        assert monitor.sincronizar() == 1
+        monitor.processar_pendentes(forcar=True)
+        assert tentativas == [caminho]
+
+        # Mesma assinatura: as próximas varreduras não extraem o arquivo de novo
+        assert monitor.sincronizar() == 0
+        monitor.registrar_evento(caminho, "alterado")
+        monitor.processar_pendentes(forcar=True)
+        assert tentativas == [caminho]
+
+        # Arquivo corrigido: a assinatura muda e ele é indexado
+        _criar_docx(caminho, TEXTOS)
+        assert monitor.sincronizar() == 1
+        monitor.processar_pendentes(forcar=True)
+        assert tentativas == [caminho, caminho]
+        assert base.arquivo_ja_processado(caminho)
+        assert monitor.sincronizar() == 0
+
+
+def test_totais_bm25_gravados_por_outra_conexao():
+    from src.knowledge_base.indice_lexico import IndiceBM25
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho_banco = os.path.join(diretorio, "indice_bm25.sqlite3")
+        leitor = IndiceBM25(caminho_banco)
+        escritor = IndiceBM25(caminho_banco)
+        escritor.indexar(["a", "b"], TEXTOS[:2])
+
+        # Gravação de outra conexão (ex.: o monitor em outro processo)
+        assert len(leitor) == 2
+        assert [chunk_id for chunk_id, _ in leitor.buscar("marketing digital")] == ["b"]
+
+        escritor.indexar(["c", "d"], TEXTOS[2:])
+        referencia = IndiceBM25(caminho_banco)
+        assert leitor.buscar("marketing digital") == referencia.buscar("marketing digital")
+        assert (leitor.total_chunks, leitor.tamanho_medio) == (referencia.total_chunks, referencia.tamanho_medio)
+        for indice in (leitor, escritor, referencia):
+            indice.fechar()
+
+
+def test_retomada_de_job_interrompido():
+    _registrar_modelo()
+    with tempfile.TemporaryDirectory() as diretorio:
+        diretorio_docs = os.path.join(diretorio, "documentos")
+        os.makedirs(diretorio_docs)
+        for numero in range(3):
+            _criar_docx(os.path.join(diretorio_docs, f"FT Oficina {numero}-GQ1302{numero}-4.docx"),
+                        [f"{texto} Documento {numero}." for texto in TEXTOS])
+        base = _abrir_base(diretorio)
+        processador = ProcessadorDocumentos(diretorio_cache=None)
+
+        # Interrompe a ingestão ao registrar o segundo arquivo
+        marcar_original = base.marcar_arquivo_processado
+        marcados = []
+
+        def marcar_e_interromper(caminho, *args, **kwargs):
+            if marcados:
+                raise RuntimeError("ingestão interrompida")
+            marcados.append(caminho)
+            marcar_original(caminho, *args, **kwargs)
+
+        base.marcar_arquivo_processado = marcar_e_interromper
+        try:
+            processador.indexar_diretorio(diretorio_docs, base)
+        except RuntimeError:
+            pass
+        else:
+            assert False, "a interrupção deveria ser propagada"
+        base.marcar_arquivo_processado = marcar_original
+
+        # A próxima ingestão retoma o job e pula o arquivo concluído
+        reindexar_original = base.reindexar_arquivo_em_lotes
+        reindexados = []
+
+        def reindexar_e_registrar(lotes, caminho):
+            reindexados.append(caminho)
+            return reindexar_original(lotes, caminho)
+
+        base.reindexar_arquivo_em_lotes = reindexar_e_registrar
+        processador.indexar_diretorio(diretorio_docs, base)
+        assert len(reindexados) == 2
+        assert marcados[0] not in reindexados
+        assert len(base.controle) == 3
+
+        # Job concluído: uma nova ingestão começa do zero
+        reindexados.clear()
+        processador.indexar_diretorio(diretorio_docs, base)
+        assert len(reindexados) == 3
+
+
+if __name__ == "__main__":
+    test_reindexacao_por_chunk()
+    test_reindexacao_interrompida_mantem_chunks()
+    test_indexar_arquivo_com_extracao_interrompida()
+    test_arquivo_corrompido_pela_cli_mantem_chunks()
+    test_monitor_nao_repete_arquivo_com_falha()
+    test_totais_bm25_gravados_por_outra_conexao()
+    test_retomada_de_job_interrompido()
+    print("✅ Testes da ingestão incremental concluídos")